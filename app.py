@@ -1,6 +1,11 @@
 import streamlit as st
 import requests
 import pandas as pd
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 # ==================================
 # PAGE CONFIG (MUST BE FIRST)
@@ -12,6 +17,76 @@ st.set_page_config(
 )
 
 BACKEND_URL = "http://127.0.0.1:8000"
+# Seconds to wait for the backend before giving up on a call
+HTTP_TIMEOUT = 10
+# Seconds a read response is reused across reruns
+READ_CACHE_TTL = 30
+# Most read responses kept across all browser sessions
+READ_CACHE_SIZE = 1024
+# Progress charts are downsampled server-side to at most this many points
+PROGRESS_MAX_POINTS = 500
+
+# ==================================
+# HTTP CLIENT
+# ==================================
+# TTL cache of GET responses keyed by (session token, path, params), so
+# widget interactions rerun the script without refetching the same data.
+# A user's entries are dropped when they submit a prediction or log out.
+# Sessions that just go away leave theirs behind, so put drops expired
+# entries and evicts the oldest beyond max_size. Every entry lives for the
+# same ttl, so insertion order is expiry order.
+class ReadCache:
+
+    def __init__(self, ttl, max_size=READ_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while self._entries:
+                _, expires_at = next(iter(self._entries.values()))
+                if expires_at > now and len(self._entries) <= self.max_size:
+                    break
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == token]:
+                del self._entries[key]
+
+# One keep-alive connection pool, response cache and fetch executor shared
+# by every browser session of this Streamlit process
+@st.cache_resource
+def http_client():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def read_cache():
+    return ReadCache(READ_CACHE_TTL, READ_CACHE_SIZE)
+
+@st.cache_resource
+def fetch_executor():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
 
 # ==================================
 # SESSION STATE INIT
@@ -19,9 +94,94 @@ BACKEND_URL = "http://127.0.0.1:8000"
 if "student_logged_in" not in st.session_state:
     st.session_state.student_logged_in = False
     st.session_state.student_name = None
+    st.session_state.student_token = None
 
 if "admin_logged_in" not in st.session_state:
     st.session_state.admin_logged_in = False
+    st.session_state.admin_token = None
+
+# Token of whichever session is active
+def current_token():
+    return st.session_state.student_token or st.session_state.admin_token
+
+# Bearer header for whichever session is active
+def auth_headers(token=None):
+    token = token or current_token()
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+# JSON body of a response. A non-2xx response becomes
+# {"error": ..., "status_code": ...}; FastAPI puts the reason in "detail".
+def response_json(response):
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if response.ok:
+        return body
+    reason = body.get("error") or body.get("detail") if isinstance(body, dict) else None
+    if isinstance(reason, list):
+        # Validation errors: one entry per invalid field
+        reason = "; ".join(str(item.get("msg", item)) for item in reason)
+    return {"error": str(reason or response.reason), "status_code": response.status_code}
+
+def api_post(path, payload=None, headers=None):
+    return response_json(http_client().post(
+        f"{BACKEND_URL}{path}", json=payload, headers=headers, timeout=HTTP_TIMEOUT
+    ))
+
+# Cached GET. Takes the token explicitly so it can run on fetch threads,
+# which cannot read st.session_state. Only successful responses are cached.
+def fetch_json(path, params, token):
+    key = (token, path, tuple(sorted((params or {}).items())))
+    cached = read_cache().get(key)
+    if cached is not None:
+        return cached
+
+    res = response_json(http_client().get(
+        f"{BACKEND_URL}{path}", params=params, headers=auth_headers(token), timeout=HTTP_TIMEOUT
+    ))
+    if "error" not in res:
+        read_cache().put(key, res)
+    return res
+
+# Drops the signed-in student or admin from this browser session
+def clear_session():
+    invalidate_reads()
+    st.session_state.student_logged_in = False
+    st.session_state.student_name = None
+    st.session_state.student_token = None
+    st.session_state.admin_logged_in = False
+    st.session_state.admin_token = None
+
+# Stops the page on a failed call. A 401 means the session expired or was
+# revoked, so it is cleared and the login page shown instead.
+def checked(res):
+    if "error" not in res:
+        return res
+    if res.get("status_code") == 401:
+        login_page = "Admin Login" if st.session_state.admin_logged_in else "Student Login"
+        clear_session()
+        st.session_state.login_page = login_page
+        st.session_state.login_notice = "Your session has expired. Please log in again."
+        st.rerun()
+    st.error(res["error"])
+    st.stop()
+
+def api_get(path, params=None):
+    return checked(fetch_json(path, params, current_token()))
+
+# Fetch several endpoints at once: {"name": (path, params)} -> {"name": response}.
+# A page waits for the slowest call rather than the sum of all of them.
+def api_get_many(calls):
+    token = current_token()
+    futures = {
+        name: fetch_executor().submit(fetch_json, path, params, token)
+        for name, (path, params) in calls.items()
+    }
+    return {name: checked(future.result()) for name, future in futures.items()}
+
+def invalidate_reads():
+    read_cache().invalidate(current_token())
 
 # ==================================
 # AUTH GUARDS
@@ -43,9 +203,11 @@ st.sidebar.title("Navigation")
 
 # CASE 1: No one is logged in (PUBLIC)
 if not st.session_state.student_logged_in and not st.session_state.admin_logged_in:
+    pages = ["Project Overview", "Student Login", "Admin Login"]
     menu = st.sidebar.radio(
         "Menu",
-        ["Project Overview", "Student Login", "Admin Login"]
+        pages,
+        index=pages.index(st.session_state.pop("login_page", "Project Overview"))
     )
 
 # CASE 2: Student logged in
@@ -183,6 +345,8 @@ if menu == "Project Overview":
 
 elif menu == "Student Login":
     st.title("👤 Student Login")
+    if "login_notice" in st.session_state:
+        st.warning(st.session_state.pop("login_notice"))
 
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
@@ -191,14 +355,15 @@ elif menu == "Student Login":
 
     with col1:
         if st.button("Login"):
-            res = requests.post(
-                f"{BACKEND_URL}/student/login",
-                json={"username": username, "password": password}
-            ).json()
+            res = api_post(
+                "/student/login",
+                {"username": username, "password": password}
+            )
 
             if "message" in res:
                 st.session_state.student_logged_in = True
                 st.session_state.student_name = res["username"]
+                st.session_state.student_token = res["token"]
                 st.success("Login successful")
                 st.rerun()
             else:
@@ -206,10 +371,10 @@ elif menu == "Student Login":
 
     with col2:
         if st.button("Register"):
-            res = requests.post(
-                f"{BACKEND_URL}/student/register",
-                json={"username": username, "password": password}
-            ).json()
+            res = api_post(
+                "/student/register",
+                {"username": username, "password": password}
+            )
 
             if "message" in res:
                 st.success("Registered successfully. Please login.")
@@ -221,18 +386,21 @@ elif menu == "Student Login":
 # ==================================
 elif menu == "Admin Login":
     st.title("🔐 Admin Login")
+    if "login_notice" in st.session_state:
+        st.warning(st.session_state.pop("login_notice"))
 
     u = st.text_input("Admin Username")
     p = st.text_input("Admin Password", type="password")
 
     if st.button("Login as Admin"):
-        res = requests.post(
-            f"{BACKEND_URL}/admin/login",
-            json={"username": u, "password": p}
-        ).json()
+        res = api_post(
+            "/admin/login",
+            {"username": u, "password": p}
+        )
 
         if "message" in res:
             st.session_state.admin_logged_in = True
+            st.session_state.admin_token = res["token"]
             st.success("Admin login successful")
             st.rerun()
         else:
@@ -270,10 +438,9 @@ elif menu == "Skill Prediction":
             "consistency_score": consistency
         }
 
-        res = requests.post(
-            f"{BACKEND_URL}/predict",
-            json=payload
-        ).json()
+        res = checked(api_post("/predict", payload, headers=auth_headers()))
+        # History and progress now include this prediction
+        invalidate_reads()
 
         st.success(f"Predicted Skill Level: **{res['predicted_skill_level']}**")
 
@@ -285,10 +452,7 @@ elif menu == "My History":
 
     st.title("📜 My History")
 
-    res = requests.get(
-        f"{BACKEND_URL}/history/filter",
-        params={"name": st.session_state.student_name}
-    ).json()
+    res = api_get("/history/filter")
 
     df = pd.DataFrame(res["data"])
     st.dataframe(df, use_container_width=True)
@@ -301,21 +465,18 @@ elif menu == "My Progress":
 
     st.title("📈 My Progress")
 
-    res = requests.get(
-        f"{BACKEND_URL}/progress",
-        params={"name": st.session_state.student_name}
-    ).json()
+    group_by = st.selectbox("Group by", ["Each test", "Day", "Week", "Month"])
+    params = {"max_points": PROGRESS_MAX_POINTS}
+    if group_by != "Each test":
+        params["bucket"] = group_by.lower()
 
-    df = pd.DataFrame(res["progress"])
+    res = api_get("/progress", params)
+    df = pd.DataFrame(res["columns"])
 
     if not df.empty:
         df["date"] = pd.to_datetime(df["date"])
-        df["skill_value"] = df["skill"].map({
-            "Beginner": 1,
-            "Intermediate": 2,
-            "Advanced": 3
-        })
         st.line_chart(df.set_index("date")["skill_value"])
+        st.caption("1 = Beginner, 2 = Intermediate, 3 = Advanced")
 
 # ==================================
 # ADMIN OVERVIEW DASHBOARD
@@ -325,35 +486,30 @@ elif menu == "Admin Overview":
 
     st.title("🛠 Admin Overview Dashboard")
 
-    res = requests.get(f"{BACKEND_URL}/history").json()
-    df = pd.DataFrame(res["data"])
+    dashboard = api_get("/admin/dashboard")
+    kpis = dashboard["kpis"]
 
-    if df.empty:
+    if kpis["total_predictions"] == 0:
         st.info("No data available.")
     else:
         # ---------------- KPIs ----------------
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Predictions", len(df))
-        col2.metric("Total Students", df["name"].nunique())
-        col3.metric("Avg Consistency", round(df["consistency_score"].mean(), 2))
+        col1.metric("Total Predictions", kpis["total_predictions"])
+        col2.metric("Total Students", kpis["total_students"])
+        col3.metric("Avg Consistency", kpis["avg_consistency"])
 
         st.divider()
 
         # ---------------- SKILL DISTRIBUTION ----------------
         st.subheader("🎯 Skill Distribution (Overall)")
 
-        skill_counts = df["predicted_skill"].value_counts()
-
-        donut_df = pd.DataFrame({
-            "Skill": skill_counts.index,
-            "Count": skill_counts.values
-        })
+        skill_counts = dashboard["skill_distribution"]
 
         st.plotly_chart(
             {
                 "data": [{
-                    "labels": donut_df["Skill"],
-                    "values": donut_df["Count"],
+                    "labels": list(skill_counts.keys()),
+                    "values": list(skill_counts.values()),
                     "type": "pie",
                     "hole": 0.4
                 }],
@@ -367,10 +523,14 @@ elif menu == "Admin Overview":
         # ---------------- DIFFICULTY VS SKILL ----------------
         st.subheader("📘 Difficulty vs Skill Outcome")
 
-        pivot = pd.crosstab(
-            df["difficulty_level"],
-            df["predicted_skill"]
+        pivot = (
+            pd.DataFrame(dashboard["difficulty_vs_skill"])
+            .T
+            .fillna(0)
+            .astype(int)
+            .sort_index()
         )
+        pivot.index.name = "difficulty_level"
 
         st.dataframe(pivot, use_container_width=True)
         st.bar_chart(pivot)
@@ -382,11 +542,16 @@ elif menu == "Admin Overview":
             {
                 "data": [
                     {
-                        "y": df[df["predicted_skill"] == skill]["consistency_score"],
                         "type": "box",
-                        "name": skill
+                        "name": skill,
+                        "q1": [stats["q1"]],
+                        "median": [stats["median"]],
+                        "q3": [stats["q3"]],
+                        "lowerfence": [stats["min"]],
+                        "upperfence": [stats["max"]],
+                        "mean": [stats["mean"]]
                     }
-                    for skill in df["predicted_skill"].unique()
+                    for skill, stats in dashboard["consistency_by_skill"].items()
                 ],
                 "layout": {
                     "title": "Consistency Score vs Skill Level",
@@ -399,32 +564,37 @@ elif menu == "Admin Overview":
 
         # ---------------- LEADERBOARD ----------------
         st.subheader("🏆 Leaderboard (Top Consistent Students)")
-        leaderboard = (
-            df.groupby("name")["consistency_score"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(5)
+        leaderboard = pd.DataFrame(dashboard["leaderboard"]).rename(
+            columns={"avg_consistency": "Avg Consistency Score"}
         )
-        st.dataframe(leaderboard.reset_index(name="Avg Consistency Score"))
+        st.dataframe(leaderboard)
 
         # ---------------- MONTHLY TREND ----------------
         st.subheader("📅 Monthly Skill Improvement Trend")
-        df["created_at"] = pd.to_datetime(df["created_at"])
-        df["month"] = df["created_at"].dt.to_period("M").astype(str)
-        monthly = df.groupby("month").size()
-        st.line_chart(monthly)
-
-        # ---------------- CSV EXPORT ----------------
+        monthly = pd.DataFrame(dashboard["monthly_trend"])
+        st.line_chart(monthly.set_index("month")["total"])
+
+        # ---------------- EXPORT ----------------
+        # The browser downloads straight from the streaming export endpoint,
+        # so the full table never passes through Streamlit's memory. It
+        # cannot send the session header, so the links carry a short-lived
+        # signed token instead.
         st.subheader("⬇️ Export Data")
-        st.download_button(
+        link = checked(api_post("/export/link", headers=auth_headers()))
+        col1, col2 = st.columns(2)
+        col1.link_button(
             "Download Predictions CSV",
-            data=df.to_csv(index=False),
-            file_name="predictions.csv",
-            mime="text/csv"
+            f"{BACKEND_URL}/export/predictions?format=csv&token={link['token']}"
         )
+        col2.link_button(
+            "Download Predictions Parquet",
+            f"{BACKEND_URL}/export/predictions?format=parquet&token={link['token']}"
+        )
+
+        df = pd.DataFrame(dashboard["recent_predictions"])
 
         st.divider()
-        st.subheader("📜 All Predictions")
+        st.subheader("📜 Recent Predictions")
         st.dataframe(df, use_container_width=True)
 
 # ==================================
@@ -441,12 +611,13 @@ elif menu == "Student Analytics":
         if not student_name.strip():
             st.warning("Please enter a student name.")
         else:
-            res = requests.get(
-                f"{BACKEND_URL}/history/filter",
-                params={"name": student_name}
-            ).json()
+            student = api_get_many({
+                "history": ("/history/filter", {"name": student_name}),
+                "progress": ("/progress", {"name": student_name,
+                                              "max_points": PROGRESS_MAX_POINTS})
+            })
 
-            df = pd.DataFrame(res["data"])
+            df = pd.DataFrame(student["history"]["data"])
 
             if df.empty:
                 st.info("No data found for this student.")
@@ -457,14 +628,11 @@ elif menu == "Student Analytics":
                 st.subheader("📊 Skill Distribution")
                 st.bar_chart(df["predicted_skill"].value_counts())
 
+                # Full progress series, not just the latest history page
                 st.subheader("📈 Skill Progress")
-                df["created_at"] = pd.to_datetime(df["created_at"])
-                df["skill_value"] = df["predicted_skill"].map({
-                    "Beginner": 1,
-                    "Intermediate": 2,
-                    "Advanced": 3
-                })
-                st.line_chart(df.set_index("created_at")["skill_value"])
+                progress = pd.DataFrame(student["progress"]["columns"])
+                progress["date"] = pd.to_datetime(progress["date"])
+                st.line_chart(progress.set_index("date")["skill_value"])
 
 # ==================================
 # LOGOUTS
@@ -473,11 +641,12 @@ st.sidebar.markdown("---")
 
 if st.session_state.student_logged_in:
     if st.sidebar.button("🚪 Student Logout"):
-        st.session_state.student_logged_in = False
-        st.session_state.student_name = None
+        api_post("/logout", headers=auth_headers())
+        clear_session()
         st.rerun()
 
 if st.session_state.admin_logged_in:
     if st.sidebar.button("🚪 Admin Logout"):
-        st.session_state.admin_logged_in = False
+        api_post("/logout", headers=auth_headers())
+        clear_session()
         st.rerun()
\ No newline at end of file
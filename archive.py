@@ -0,0 +1,593 @@
+import argparse
+import hashlib
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from compact_schema import DECODED_FROM_SQL, SKILL_CODES, CodeTable, local_time
+
+load_dotenv()
+
+# Cold storage for old predictions. The archive job moves rows older than
+# ARCHIVE_AFTER_DAYS out of SQLite into Parquet files under ARCHIVE_DIR,
+# partitioned Hive-style by month and by a hash bucket of the student:
+#
+#     archive/month=2025-03/bucket=07/part-<first id>-<last id>.parquet
+#
+# Each database that held the rows (the application database, or a shard)
+# lists its files in archive_files, written in the same transaction that
+# deletes the rows, so a row is always either hot or listed as cold. The
+# storage backend reads both (storage.ArchivedStorage); the manifest's
+# bucket, id and time ranges decide which files a query opens at all.
+#
+# Summary tables keep counting archived predictions, so analytics are
+# unchanged by archiving and never read Parquet. Neither do bucketed
+# progress charts, which read per-day counts kept in archive_progress.
+#
+#     python archive.py run --older-than-days 365
+#     python archive.py status
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_ROWS = int(os.getenv("ARCHIVE_BATCH_ROWS", "100000"))
+
+# Student hash buckets per month. A per-student query opens one bucket's
+# files; within a file rows are sorted by student, so row group statistics
+# skip the other students.
+ARCHIVE_STUDENT_BUCKETS = 16
+ARCHIVE_ROW_GROUP_ROWS = 16384
+# Parquet footers kept in memory per process
+ARCHIVE_METADATA_CACHE = 4096
+
+ARCHIVE_FILES_TABLE = """
+    CREATE TABLE IF NOT EXISTS archive_files (
+        path TEXT PRIMARY KEY,
+        month TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        row_count INTEGER NOT NULL,
+        min_id INTEGER NOT NULL,
+        max_id INTEGER NOT NULL,
+        min_created_at INTEGER NOT NULL,
+        max_created_at INTEGER NOT NULL,
+        archived_at TEXT,
+        progress_recorded INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+# New prediction ids start above the highest archived one (NEXT_ID_SQL)
+ARCHIVE_FILES_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_archive_files_max_id ON archive_files (max_id)
+"""
+
+# Archived predictions per student, local day (epoch seconds of its
+# midnight) and skill code (0 for none), added in the transaction that
+# lists their files, which are then marked progress_recorded. Bucketed
+# progress charts read these instead of the files.
+ARCHIVE_PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS archive_progress (
+        student_id INTEGER NOT NULL REFERENCES students (id),
+        day INTEGER NOT NULL,
+        skill INTEGER NOT NULL,
+        prediction_count INTEGER NOT NULL,
+        PRIMARY KEY (student_id, day, skill)
+    ) WITHOUT ROWID
+"""
+
+MANIFEST_COLUMNS = ("path, month, bucket, row_count, min_id, max_id, "
+                    "min_created_at, max_created_at")
+
+# Columns of an archive file; created_at stays epoch seconds as in
+# predictions_compact
+ARCHIVE_COLUMNS = [
+    ("id", "int64"),
+    ("name", "string"),
+    ("marks", "int64"),
+    ("accuracy", "int64"),
+    ("time_taken", "int64"),
+    ("attempts", "int64"),
+    ("difficulty_level", "string"),
+    ("topic_coverage", "int64"),
+    ("consistency_score", "int64"),
+    ("predicted_skill", "string"),
+    ("created_at", "int64"),
+    ("model_version", "string"),
+]
+
+
+ARCHIVE_COLUMN_NAMES = [column for column, _ in ARCHIVE_COLUMNS]
+
+# Filter operators and their pyarrow.compute functions
+FILTER_FUNCTIONS = {"==": "equal", "<": "less", ">": "greater"}
+
+
+# Row groups of a file whose min / max statistics leave room for rows
+# matching every filter; groups without statistics have to be read
+def _row_groups(metadata, filters):
+    positions = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+    groups = []
+    for index in range(metadata.num_row_groups):
+        row_group = metadata.row_group(index)
+        for column, op, value in filters:
+            statistics = row_group.column(positions[column]).statistics
+            if statistics is None or not statistics.has_min_max:
+                continue
+            if op == "==" and not statistics.min <= value <= statistics.max:
+                break
+            if op == "<" and not statistics.min < value:
+                break
+            if op == ">" and not statistics.max > value:
+                break
+        else:
+            groups.append(index)
+    return groups
+
+
+def create_archive_files(conn):
+    conn.execute(ARCHIVE_FILES_TABLE)
+    conn.execute(ARCHIVE_FILES_INDEX)
+    columns = {column[1] for column in conn.execute("PRAGMA table_info(archive_files)")}
+    if "progress_recorded" not in columns:
+        conn.execute("ALTER TABLE archive_files "
+                     "ADD COLUMN progress_recorded INTEGER NOT NULL DEFAULT 0")
+    conn.execute(ARCHIVE_PROGRESS_TABLE)
+
+
+def student_bucket(name):
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % ARCHIVE_STUDENT_BUCKETS
+
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([(column, getattr(pa, kind)()) for column, kind in ARCHIVE_COLUMNS])
+
+
+# Whole months are archived, so each month's partitions are written once:
+# the cutoff is the start of the local month older_than_days ago
+def cutoff_epoch(older_than_days=ARCHIVE_AFTER_DAYS, now=None):
+    day = datetime.fromtimestamp((time.time() if now is None else now) - older_than_days * 86400)
+    return int(day.replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+# Predictions per (name, local midnight, predicted_skill) of (name,
+# created_at, predicted_skill) rows
+def count_progress(rows, counts=None):
+    counts = defaultdict(int) if counts is None else counts
+    midnights = {}
+    for name, created_at, skill in rows:
+        day = datetime.fromtimestamp(created_at).date()
+        if day not in midnights:
+            midnights[day] = int(datetime(day.year, day.month, day.day).timestamp())
+        counts[(name, midnights[day], skill)] += 1
+    return counts
+
+
+# Add count_progress() counts to a database's archive_progress
+def add_progress(conn, counts):
+    students = CodeTable("students", "username", "id").resolve(conn, [key[0] for key in counts])
+    skills = CodeTable("skill_levels", "label", "code", SKILL_CODES).resolve(
+        conn, [key[2] for key in counts])
+    conn.executemany("""
+        INSERT INTO archive_progress (student_id, day, skill, prediction_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (student_id, day, skill)
+        DO UPDATE SET prediction_count = prediction_count + excluded.prediction_count
+    """, [(students[name], day, skills[skill] or 0, count)
+          for (name, day, skill), count in counts.items()])
+
+
+# Write rows (in ARCHIVE_COLUMNS order) as one file per month and bucket.
+# File names depend only on the rows, so writing the same batch again
+# replaces its files. Returns their manifest rows and the rows'
+# count_progress().
+def write_partitions(rows, directory=ARCHIVE_DIR):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = archive_schema()
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(local_time(row[10])[:7], student_bucket(row[1]))].append(row)
+
+    manifest, progress = [], defaultdict(int)
+    for (month, bucket), group in sorted(groups.items()):
+        group.sort(key=lambda row: (row[1], row[10], row[0]))
+        ids = [row[0] for row in group]
+        created = [row[10] for row in group]
+        relative = os.path.join(f"month={month}", f"bucket={bucket:02d}",
+                                f"part-{min(ids)}-{max(ids)}.parquet")
+        path = os.path.join(directory, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        columns = list(zip(*group))
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+        # Durable under its final name before the rows leave SQLite
+        pq.write_table(table, path + ".tmp", compression="zstd",
+                       row_group_size=ARCHIVE_ROW_GROUP_ROWS)
+        with open(path + ".tmp", "rb") as handle:
+            os.fsync(handle.fileno())
+        os.replace(path + ".tmp", path)
+
+        manifest.append((relative, month, bucket, len(group), min(ids), max(ids),
+                         min(created), max(created)))
+        count_progress(((row[1], row[10], row[9]) for row in group), progress)
+    return manifest, progress
+
+
+# Move one database's rows created before cutoff (epoch seconds) into the
+# archive, batch by batch. Files are written first; the manifest rows,
+# the progress counts and the deletion then commit together. An interrupted run can be repeated.
+# Returns the number of rows archived.
+def archive_database(pool, cutoff, directory=ARCHIVE_DIR, batch_rows=ARCHIVE_BATCH_ROWS):
+    archived = 0
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT p.id, s.username, p.marks, p.accuracy, p.time_taken, p.attempts,
+                       d.label, p.topic_coverage, p.consistency_score, k.label,
+                       p.created_at, p.model_version
+                FROM {DECODED_FROM_SQL}
+                WHERE p.created_at < ?
+                ORDER BY p.id
+                LIMIT ?
+            """, (cutoff, batch_rows)).fetchall()
+        if not rows:
+            return archived
+
+        manifest, progress = write_partitions(rows, directory)
+        with pool.write_transaction() as conn:
+            conn.executemany(f"""
+                INSERT OR REPLACE INTO archive_files
+                    ({MANIFEST_COLUMNS}, archived_at, progress_recorded)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), 1)
+            """, manifest)
+            add_progress(conn, progress)
+            conn.executemany("DELETE FROM predictions_compact WHERE id = ?",
+                             [(row[0],) for row in rows])
+        archived += len(rows)
+
+
+# Add the files archived before archive_progress existed to it, each in
+# its own transaction. Returns how many files were added.
+def record_missing_progress(pool, directory=ARCHIVE_DIR):
+    import pyarrow.parquet as pq
+
+    with pool.connection() as conn:
+        paths = [path for (path,) in conn.execute(
+            "SELECT path FROM archive_files WHERE progress_recorded = 0")]
+    recorded = 0
+    for path in paths:
+        table = pq.read_table(os.path.join(directory, path),
+                              columns=["name", "created_at", "predicted_skill"])
+        counts = count_progress(zip(*(column.to_pylist() for column in table.columns)))
+        with pool.write_transaction() as conn:
+            # Unless a concurrent run got there first
+            if conn.execute("UPDATE archive_files SET progress_recorded = 1 "
+                            "WHERE path = ? AND progress_recorded = 0", (path,)).rowcount:
+                add_progress(conn, counts)
+                recorded += 1
+    return recorded
+
+
+# Reads over the archive files listed in the given databases' manifests.
+# A store lists the files it archived, and after a rebalance a student's
+# files may be listed by any of them, so every query consults them all.
+class ColdStore:
+
+    def __init__(self, pools, directory=ARCHIVE_DIR):
+        self.pools = list(pools)
+        self.directory = directory
+        self._metadata = {}
+
+    # Manifest rows as dicts, filtered by bucket and by the id range
+    # low < id < high (None for open ends)
+    def files(self, bucket=None, low=None, high=None):
+        conditions, params = [], []
+        if bucket is not None:
+            conditions.append("bucket = ?")
+            params.append(bucket)
+        if low is not None:
+            conditions.append("max_id > ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("min_id < ?")
+            params.append(high)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        found = {}
+        for pool in self.pools:
+            with pool.connection() as conn:
+                for row in conn.execute(f"SELECT {MANIFEST_COLUMNS} FROM archive_files {where}",
+                                        params):
+                    found[row[0]] = dict(zip(MANIFEST_COLUMNS.split(", "), row))
+        return list(found.values())
+
+    # An archive file's rows matching every (column, op, value) filter,
+    # op one of "==", "<" and ">", with the given columns. Footers are
+    # cached (files never change once listed), and row groups whose
+    # min / max statistics rule a filter out are not read.
+    def _read(self, entry, columns, filters=()):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, entry["path"])
+        metadata = self._metadata.get(path)
+        needed = list(dict.fromkeys([*columns, *(column for column, _, _ in filters)]))
+        # A cached footer can rule the whole file out without opening it
+        if metadata is not None and not _row_groups(metadata, filters):
+            return archive_schema().empty_table().select(columns)
+
+        with pq.ParquetFile(path, metadata=metadata) as parquet:
+            if metadata is None:
+                if len(self._metadata) >= ARCHIVE_METADATA_CACHE:
+                    self._metadata.clear()
+                metadata = self._metadata[path] = parquet.metadata
+            table = parquet.read_row_groups(_row_groups(metadata, filters), columns=needed,
+                                            use_threads=False)
+
+        if filters and table.num_rows:
+            mask = None
+            for column, op, value in filters:
+                matches = getattr(pc, FILTER_FUNCTIONS[op])(table.column(column), value)
+                mask = matches if mask is None else pc.and_(mask, matches)
+            table = table.filter(mask)
+        return table.select(columns)
+
+    @staticmethod
+    def _id_filters(name=None, low=None, high=None):
+        filters = []
+        if name is not None:
+            filters.append(("name", "==", name))
+        if low is not None:
+            filters.append(("id", ">", low))
+        if high is not None:
+            filters.append(("id", "<", high))
+        return filters
+
+    # Up to limit rows with low < id < high (for one student when name is
+    # given), as history dicts newest first; the newest rows unless
+    # oldest is set. Files are opened nearest the wanted end first and the
+    # walk stops once no remaining file can reach the page.
+    def history(self, name=None, limit=50, low=None, high=None, oldest=False):
+        import pyarrow as pa
+
+        entries = self.files(None if name is None else student_bucket(name), low, high)
+        if oldest:
+            entries.sort(key=lambda entry: entry["min_id"])
+        else:
+            entries.sort(key=lambda entry: entry["max_id"], reverse=True)
+
+        order = "ascending" if oldest else "descending"
+        filters = self._id_filters(name, low, high)
+        page = None
+        for entry in entries:
+            if page is not None and limit >= 0 and page.num_rows >= limit:
+                edge = page.column("id")[page.num_rows - 1].as_py()
+                if (entry["min_id"] > edge) if oldest else (entry["max_id"] < edge):
+                    break
+            table = self._read(entry, ARCHIVE_COLUMN_NAMES, filters)
+            page = table if page is None else pa.concat_tables([page, table])
+            page = page.sort_by([("id", order)])
+            if limit >= 0:
+                page = page.slice(0, limit)
+
+        if page is None:
+            return []
+        rows = page.to_pylist()
+        if oldest:
+            rows.reverse()
+        for row in rows:
+            row["created_at"] = local_time(row["created_at"])
+        return rows
+
+    # Archived rows as export tuples (the columns of export.EXPORT_COLUMNS,
+    # created_at as local time) in id order, for one student when name is
+    # given and start <= created_at < end. Files are pruned by bucket and
+    # time range; files whose id ranges overlap are sorted together, so
+    # memory holds one such group (about a month) at a time.
+    def export_rows(self, name=None, start=None, end=None):
+        import pyarrow as pa
+
+        entries = [
+            entry for entry in self.files(None if name is None else student_bucket(name))
+            if (start is None or entry["max_created_at"] >= start)
+            and (end is None or entry["min_created_at"] < end)
+        ]
+        entries.sort(key=lambda entry: entry["min_id"])
+
+        filters = self._id_filters(name)
+        if start is not None:
+            filters.append(("created_at", ">", start - 1))
+        if end is not None:
+            filters.append(("created_at", "<", end))
+
+        created_at = ARCHIVE_COLUMN_NAMES.index("created_at")
+        first = 0
+        while first < len(entries):
+            last, last_id = first + 1, entries[first]["max_id"]
+            while last < len(entries) and entries[last]["min_id"] <= last_id:
+                last_id = max(last_id, entries[last]["max_id"])
+                last += 1
+            table = pa.concat_tables([self._read(entry, ARCHIVE_COLUMN_NAMES, filters)
+                                      for entry in entries[first:last]]).sort_by("id")
+            first = last
+            columns = [table.column(column).to_pylist() for column in ARCHIVE_COLUMN_NAMES]
+            columns[created_at] = [local_time(epoch) for epoch in columns[created_at]]
+            yield from zip(*columns)
+
+    # Every archived (created_at, id, predicted_skill) of one student
+    def progress_rows(self, name):
+        filters = [("name", "==", name)]
+        rows = []
+        for entry in self.files(student_bucket(name)):
+            table = self._read(entry, ["created_at", "id", "predicted_skill"], filters)
+            rows.extend(zip(*(table.column(column).to_pylist() for column in table.column_names)))
+        return rows
+
+    # Archived rows with the given ids and columns, as {id: row dict}. Only
+    # files whose id range overlaps the ids are opened.
+    def rows_by_id(self, ids, columns):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        wanted = sorted(set(ids))
+        found = {}
+        if not wanted:
+            return found
+        filters = self._id_filters(low=wanted[0] - 1, high=wanted[-1] + 1)
+        for entry in self.files(low=wanted[0] - 1, high=wanted[-1] + 1):
+            table = self._read(entry, ["id", *columns], filters)
+            table = table.filter(pc.is_in(table.column("id"), pa.array(wanted, pa.int64())))
+            for row in table.to_pylist():
+                found[row["id"]] = row
+        return found
+
+    # True when every file of the bucket is counted in archive_progress
+    def progress_recorded(self, bucket):
+        for pool in self.pools:
+            with pool.connection() as conn:
+                if conn.execute("SELECT 1 FROM archive_files "
+                                "WHERE bucket = ? AND progress_recorded = 0 LIMIT 1",
+                                (bucket,)).fetchone():
+                    return False
+        return True
+
+    # One student's archived (day, predicted_skill, predictions) counts
+    def progress_days(self, name):
+        counts = defaultdict(int)
+        for pool in self.pools:
+            with pool.connection() as conn:
+                for day, skill, count in conn.execute("""
+                    SELECT a.day, k.label, a.prediction_count
+                    FROM archive_progress a
+                    JOIN students s ON s.id = a.student_id
+                    LEFT JOIN skill_levels k ON k.code = a.skill
+                    WHERE s.username = ?
+                """, (name,)):
+                    counts[(day, skill)] += count
+        return [(*key, count) for key, count in counts.items()]
+
+    def contains(self, prediction_id):
+        return any(
+            self._read(entry, ["id"], [("id", "==", prediction_id)]).num_rows
+            for entry in self.files(low=prediction_id - 1, high=prediction_id + 1)
+        )
+
+    # Archived rows aggregated like summaries.REBUILD_QUERIES, for students
+    # where keep(name) is true (all when keep is None)
+    def summary_rows(self, keep=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        skill = defaultdict(lambda: [0, 0])
+        difficulty_skill = defaultdict(int)
+        month_skill = defaultdict(int)
+        skill_consistency = defaultdict(int)
+        student = defaultdict(lambda: [0, 0])
+
+        def groups(table, keys, total=False):
+            aggregates = [([], "count_all")]
+            if total:
+                aggregates.append(("consistency_score", "sum"))
+            return table.group_by(keys).aggregate(aggregates).to_pylist()
+
+        for entry in self.files():
+            table = self._read(entry, ["name", "difficulty_level", "consistency_score",
+                                       "predicted_skill"])
+            if keep is not None:
+                names = [name for name in pc.unique(table.column("name")).to_pylist()
+                         if keep(name)]
+                table = table.filter(pc.is_in(table.column("name"), pa.array(names, pa.string())))
+            if table.num_rows == 0:
+                continue
+            table = table.set_column(2, "consistency_score",
+                                     pc.fill_null(table.column("consistency_score"), 0))
+
+            for row in groups(table, ["predicted_skill"], total=True):
+                skill[row["predicted_skill"]][0] += row["count_all"]
+                skill[row["predicted_skill"]][1] += row["consistency_score_sum"]
+                month_skill[(entry["month"], row["predicted_skill"])] += row["count_all"]
+            for row in groups(table, ["difficulty_level", "predicted_skill"]):
+                difficulty_skill[(row["difficulty_level"], row["predicted_skill"])] += \
+                    row["count_all"]
+            for row in groups(table, ["predicted_skill", "consistency_score"]):
+                skill_consistency[(row["predicted_skill"], row["consistency_score"])] += \
+                    row["count_all"]
+            for row in groups(table, ["name"], total=True):
+                student[row["name"]][0] += row["count_all"]
+                student[row["name"]][1] += row["consistency_score_sum"]
+
+        return {
+            "summary_skill": [(key, *values) for key, values in skill.items()],
+            "summary_difficulty_skill": [(*key, count) for key, count in difficulty_skill.items()],
+            "summary_month_skill": [(*key, count) for key, count in month_skill.items()],
+            "summary_skill_consistency": [(*key, count)
+                                          for key, count in skill_consistency.items()],
+            "summary_student": [(key, *values) for key, values in student.items()],
+        }
+
+    def status(self):
+        entries = self.files()
+        months = sorted({entry["month"] for entry in entries})
+        size = sum(os.path.getsize(os.path.join(self.directory, entry["path"]))
+                   for entry in entries)
+        return {
+            "files": len(entries),
+            "rows": sum(entry["row_count"] for entry in entries),
+            "bytes": size,
+            "months": (months[0], months[-1]) if months else None,
+        }
+
+
+# Command line: python archive.py run [--older-than-days N] | status
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old predictions to Parquet")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS)
+    run_parser.add_argument("--batch-rows", type=int, default=ARCHIVE_BATCH_ROWS)
+    run_parser.add_argument("--vacuum", action="store_true",
+                            help="return the freed pages to the file system afterwards")
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    import storage
+    from db import pool
+    from migrations import migrate
+
+    # The application database must exist; the server creates it
+    if not os.path.exists(pool.path):
+        parser.error(f"{pool.path} does not exist; start the server once first")
+    migrate()
+    backend = storage.open_backend(pool)
+
+    if args.command == "run":
+        # Files archived by an older version get their progress aggregates
+        for database in [pool] + [other for other in storage.prediction_pools(backend)
+                                  if other is not pool]:
+            recorded = record_missing_progress(database, ARCHIVE_DIR)
+            if recorded:
+                print(f"Recorded progress aggregates of {recorded} older files in {database.path}")
+
+        cutoff = cutoff_epoch(args.older_than_days)
+        print(f"Archiving predictions created before {local_time(cutoff)} into {ARCHIVE_DIR}")
+        for database in storage.prediction_pools(backend):
+            started = time.perf_counter()
+            archived = archive_database(database, cutoff, ARCHIVE_DIR, args.batch_rows)
+            if archived and args.vacuum:
+                with database.connection() as conn:
+                    conn.execute("VACUUM")
+            print(f"{archived:>12}  {database.path} ({time.perf_counter() - started:.1f} s)")
+
+    status = backend.cold.status()
+    backend.close()
+    months = f", {status['months'][0]} to {status['months'][1]}" if status["months"] else ""
+    print(f"Archive: {status['rows']} rows in {status['files']} files, "
+          f"{status['bytes'] / 2**20:.1f} MiB{months}")
@@ -0,0 +1,202 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException, Query
+
+load_dotenv()
+
+# Signed session tokens: base64url(JSON payload) "." base64url(HMAC-SHA256).
+# Validating one needs no database access; resolved identities are also
+# cached so repeat requests skip the HMAC and JSON decode as well.
+
+# Set SESSION_SECRET when running several workers or processes so they
+# all accept each other's tokens. Without it every process signs with its
+# own random key and tokens do not survive a restart.
+SESSION_SECRET = (os.getenv("SESSION_SECRET") or secrets.token_hex(32)).encode()
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(8 * 60 * 60)))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+# Lifetime of the signed links handed to the browser for downloads
+LINK_TTL_SECONDS = int(os.getenv("LINK_TTL_SECONDS", "300"))
+
+
+
+# Worker count of the server that imported us: uvicorn/gunicorn --workers N
+# (spawned workers see the parent's argv) or WEB_CONCURRENCY
+def _server_workers():
+    for index, arg in enumerate(sys.argv):
+        if arg == "--workers" and index + 1 < len(sys.argv):
+            value = sys.argv[index + 1]
+        elif arg.startswith("--workers="):
+            value = arg.partition("=")[2]
+        else:
+            continue
+        return int(value) if value.isdigit() else 1
+    value = os.getenv("WEB_CONCURRENCY", "1")
+    return int(value) if value.isdigit() else 1
+
+
+# With several workers and no shared secret, a login only works on the
+# worker that issued it, so requests would fail at random
+if not os.getenv("SESSION_SECRET") and _server_workers() > 1:
+    raise RuntimeError(
+        "SESSION_SECRET must be set when serving with more than one worker; "
+        "otherwise each worker signs sessions with its own random key"
+    )
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(SESSION_SECRET, body.encode(), hashlib.sha256).digest())
+
+
+def issue_token(username: str, role: str, student_id: int = None):
+    expires_at = int(time.time()) + SESSION_TTL_SECONDS
+    payload = {"sub": username, "role": role, "sid": student_id, "exp": expires_at}
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}", expires_at
+
+
+# Short-lived token for one kind of URL the browser opens directly, which
+# cannot send the Authorization header. It carries the session's identity
+# plus a scope, and is never accepted as a session token.
+def issue_link_token(identity: dict, scope: str):
+    expires_at = min(int(time.time()) + LINK_TTL_SECONDS, identity["exp"])
+    payload = {"sub": identity["sub"], "role": identity["role"], "sid": identity.get("sid"),
+               "scope": scope, "exp": expires_at}
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}", expires_at
+
+
+# Check signature and expiry. Returns the payload, or None if invalid.
+def decode_token(token: str):
+    body, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(body)):
+        return None
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if payload.get("exp", 0) <= time.time():
+        return None
+    return payload
+
+
+# Bounded LRU of token -> identity. Entries expire with their token or
+# after max_age seconds, whichever comes first.
+class SessionCache:
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, max_age: int = 300):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, token: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                identity, valid_until = entry
+                if valid_until > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return identity
+                del self._entries[token]
+            if token in self._revoked:
+                return None
+            self.misses += 1
+
+        identity = decode_token(token)
+        if identity is None:
+            return None
+
+        with self._lock:
+            self._entries[token] = (identity, min(identity["exp"], now + self.max_age))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return identity
+
+    # Reject a token for the rest of its lifetime (in this process)
+    def revoke(self, token: str):
+        payload = decode_token(token)
+        now = time.time()
+        with self._lock:
+            self._entries.pop(token, None)
+            if payload is not None:
+                self._revoked[token] = payload["exp"]
+            for expired in [t for t, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[expired]
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked": len(self._revoked),
+        }
+
+
+sessions = SessionCache()
+
+
+def _bearer_token(authorization: str):
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    return token
+
+
+# FastAPI dependency: any signed-in student or admin
+def require_session(authorization: str = Header(None)):
+    identity = sessions.resolve(_bearer_token(authorization))
+    if identity is None or "scope" in identity:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return identity
+
+
+# FastAPI dependency: the session when a bearer token is sent, else None.
+# A token that is sent but invalid is still rejected.
+def optional_session(authorization: str = Header(None)):
+    if authorization is None:
+        return None
+    return require_session(authorization)
+
+
+# FastAPI dependency: admin sessions only
+def require_admin(authorization: str = Header(None)):
+    identity = require_session(authorization)
+    if identity["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin session required")
+    return identity
+
+
+# FastAPI dependency for links the browser opens: a session header, or a
+# link token for this scope in ?token=
+def require_link(scope: str):
+    def dependency(authorization: str = Header(None), token: str = Query(None)):
+        if authorization is not None or token is None:
+            return require_session(authorization)
+        identity = decode_token(token)
+        if identity is None or identity.get("scope") != scope:
+            raise HTTPException(status_code=401, detail="Invalid or expired link")
+        return identity
+    return dependency
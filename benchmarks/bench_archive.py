@@ -0,0 +1,260 @@
+# Hot database size and read latency before and after archiving old
+# predictions to Parquet (archive.py).
+#
+# Builds a database of synthetic predictions spread over a year, runs the
+# history, progress, analytics, label lookups and exports through main's
+# backend, archives everything older than --archive-fraction of the year
+# and runs them again. Every response must be identical: archived rows are read
+# back from Parquet where a query reaches them. With --shards N the
+# archived database is then rebalanced into N shards and checked again,
+# along with each shard's summary tables. Progress charts are also checked
+# without the per-day aggregates (as for files archived before they
+# existed) and after archive.py has filled them in. Finally everything is
+# archived and a new prediction must get an id no archived row has.
+#
+# Run from the repository root:
+#     python benchmarks/bench_archive.py --rows 1m
+#     python benchmarks/bench_archive.py --rows 200k --rows-per-student 200 --shards 4
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_data import HISTORY_DAYS, ROWS_PER_STUDENT, generate, parse_rows  # noqa: E402
+from inference import FEATURE_COLUMNS  # noqa: E402
+
+START = int(np.datetime64("2025-01-01T00:00:00", "s").astype(np.int64))
+
+
+def build(rows, seed, rows_per_student):
+    import main
+
+    students = max(1, rows // rows_per_student)
+    with main.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO students (username, password_hash, created_at) VALUES (?, ?, ?)",
+            ((f"student_{i}", "x", "2025-01-01 00:00:00") for i in range(students))
+        )
+    for _, columns in generate(rows, seed, rows_per_student=rows_per_student):
+        main.insert_prediction_rows(list(zip(
+            columns["name"].tolist(),
+            *(columns[column].tolist() for column in FEATURE_COLUMNS),
+            columns["skill_level"].tolist(),
+            columns["created_at"].tolist(),
+            ["v1"] * len(columns["name"]),
+        )))
+    with main.pool.connection() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    return students
+
+
+# Calls against whatever main.backend currently is
+def queries():
+    import main
+
+    return {
+        "history": lambda *args: main.backend.history(*args),
+        "user_progress": lambda *args: main.backend.user_progress(*args),
+        # (dates, x, y, counts) columns, as lists to compare
+        "progress_series": lambda *args: [np.asarray(column).tolist()
+                                          for column in main.backend.progress_series(*args)],
+        "prediction_exists": lambda *args: main.backend.prediction_exists(*args),
+        "dashboard": lambda *args: main.backend.dashboard(*args),
+        "export": lambda *args: [row for batch in main.backend.export_batches(*args)
+                                 for row in batch],
+    }
+
+
+def workload(students, rows, archived_rows, seed):
+    rng = np.random.default_rng(seed)
+    names = [f"student_{i}" for i in rng.integers(0, students, 100)]
+    recent = [int(i) for i in rng.integers(archived_rows + 100, rows, 100)]
+    old = [int(i) for i in rng.integers(100, max(101, archived_rows), 100)]
+    return [
+        ("history, one student", "history", [(name,) for name in names]),
+        ("history, global recent", "history", [(None, 50, cursor) for cursor in recent]),
+        ("history, global archived", "history", [(None, 50, cursor) for cursor in old]),
+        ("history, after archived", "history", [(None, 50, None, cursor) for cursor in old]),
+        ("progress, full", "user_progress", [(name,) for name in names]),
+        ("progress, weekly", "progress_series", [(name, "week") for name in names]),
+        ("progress, monthly mode", "progress_series", [(name, "month", "mode") for name in names]),
+        ("label lookup, archived", "prediction_exists", [(cursor,) for cursor in old]),
+        ("dashboard", "dashboard", [(5,)]),
+        ("export, everything", "export", [()]),
+        ("export, one student", "export", [(name,) for name in names[:10]]),
+        ("export, date range", "export", [(None, "2025-03-10", "2025-05-20"),
+                                          (names[0], "2025-02-01", "2025-12-31")]),
+    ]
+
+
+def run(calls, cases, repeat):
+    results, timings = {}, {}
+    for label, query, arguments in cases:
+        results[label] = [calls[query](*args) for args in arguments]
+        samples = []
+        for _ in range(repeat):
+            for args in arguments:
+                start = time.perf_counter()
+                calls[query](*args)
+                samples.append(time.perf_counter() - start)
+        timings[label] = statistics.median(samples) * 1e6
+    return results, timings
+
+
+def check(before, after, stage):
+    for label in before:
+        if before[label] != after[label]:
+            raise AssertionError(f"{label}: responses differ {stage}")
+
+
+def check_summaries(backend):
+    import summaries
+
+    for database, archived in summaries.summary_databases(backend):
+        with database.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                mismatched = summaries.verify_summaries(conn, archived)
+            finally:
+                conn.rollback()
+        if mismatched:
+            raise AssertionError(f"{database.path}: summaries out of date: {mismatched}")
+
+
+# Progress responses read from the archive files while the aggregates
+# are missing, then from the aggregates archive.py records for them
+def check_missing_progress(calls, cases, before, directory):
+    import archive
+    import main
+
+    progress_cases = [case for case in cases if case[1] in ("user_progress", "progress_series")]
+    with main.pool.write_transaction() as conn:
+        conn.execute("DELETE FROM archive_progress")
+        conn.execute("UPDATE archive_files SET progress_recorded = 0")
+    missing, _ = run(calls, progress_cases, 1)
+    recorded = archive.record_missing_progress(main.pool, directory)
+    filled, _ = run(calls, progress_cases, 1)
+    expected = {label: before[label] for label in missing}
+    check(expected, missing, "without progress aggregates")
+    check(expected, filled, "after recording progress aggregates")
+    return recorded
+
+
+# Archive every remaining row, then store a new prediction: its id must be
+# above every archived id and head the global history
+def check_new_ids(directory):
+    import archive
+    import main
+    import storage
+
+    cutoff = archive.cutoff_epoch(-40)
+    for database in storage.prediction_pools(main.backend):
+        archive.archive_database(database, cutoff, directory)
+    highest = max(entry["max_id"] for entry in main.backend.cold.files())
+    main.insert_prediction_rows([
+        ("student_0", 70, 75, 30, 2, "medium", 80, 75, "Intermediate", int(time.time()), "v1")
+    ])
+    newest = main.backend.history(None, 1)[0]
+    if newest["id"] <= highest or newest["name"] != "student_0":
+        raise AssertionError(f"new prediction got id {newest['id']}, archived ids reach {highest}")
+
+
+def database_bytes(pool):
+    with pool.connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(pool.path)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="200k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rows-per-student", type=int, default=ROWS_PER_STUDENT)
+    parser.add_argument("--archive-fraction", type=float, default=0.75,
+                        help="archive the whole months before this point of the year")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="then rebalance into this many shards and check again")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    rows = parse_rows(args.rows)
+
+    workdir = tempfile.mkdtemp(prefix="skill-archive-")
+    path = os.path.join(workdir, "predictions.db")
+    os.environ["DB_NAME"] = path
+    os.environ["ARCHIVE_DIR"] = os.path.join(workdir, "archive")
+    os.environ.setdefault("MODEL_REGISTRY_DIR", os.path.join(workdir, "models"))
+    os.chdir(ROOT)
+    try:
+        import archive
+        import main
+        import storage
+
+        started = time.perf_counter()
+        students = build(rows, args.seed, args.rows_per_student)
+        print(f"built {rows} rows for {students} students in {time.perf_counter() - started:.1f} s")
+
+        cutoff = archive.cutoff_epoch(0, START + args.archive_fraction * HISTORY_DAYS * 86400)
+        with main.pool.connection() as conn:
+            archived_rows = conn.execute("SELECT COUNT(*) FROM predictions_compact "
+                                         "WHERE created_at < ?", (cutoff,)).fetchone()[0]
+        cases = workload(students, rows, archived_rows, args.seed)
+        calls = queries()
+
+        size_before = database_bytes(main.pool)
+        before, timings_before = run(calls, cases, args.repeat)
+
+        started = time.perf_counter()
+        moved = archive.archive_database(main.pool, cutoff, os.environ["ARCHIVE_DIR"])
+        archive_s = time.perf_counter() - started
+        with main.pool.connection() as conn:
+            conn.execute("VACUUM")
+        size_after = database_bytes(main.pool)
+        status = main.backend.cold.status()
+
+        after, timings_after = run(calls, cases, args.repeat)
+        check(before, after, "after archiving")
+        check_summaries(main.backend)
+        print(f"parity: every response identical ({sum(len(c[2]) for c in cases)} calls), "
+              "summaries verified with the archived rows")
+
+        print(f"archived {moved} rows into {status['files']} files in {archive_s:.1f} s")
+        print(f"hot database     before: {size_before / 2**20:8.1f} MiB   "
+              f"after: {size_after / 2**20:8.1f} MiB   "
+              f"archive: {status['bytes'] / 2**20:6.1f} MiB")
+        for label in timings_before:
+            print(f"{label:<26} hot only: {timings_before[label]:9.1f} us   "
+                  f"hot + cold: {timings_after[label]:9.1f} us")
+
+        recorded = check_missing_progress(calls, cases, before, os.environ["ARCHIVE_DIR"])
+        print(f"progress unchanged without aggregates and after recording them for "
+              f"{recorded} files")
+
+        if args.shards:
+            started = time.perf_counter()
+            storage.rebalance(main.pool, args.shards, report=lambda line: None)
+            main.backend.close()
+            main.backend = storage.open_backend(main.pool, "sharded")
+            sharded, _ = run(calls, cases, 1)
+            check(before, sharded, f"after rebalancing into {args.shards} shards")
+            check_summaries(main.backend)
+            print(f"rebalanced into {args.shards} shards in {time.perf_counter() - started:.1f} s: "
+                  "responses and per-shard summaries unchanged")
+
+        check_new_ids(os.environ["ARCHIVE_DIR"])
+        print("archived everything: a new prediction still gets an unused id")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+# Per-request cost of identifying the caller under concurrent load:
+# a students-table lookup plus SHA-256 (what /student/login does) versus
+# verifying a signed session token, with and without the session cache.
+#
+# Run from the repository root:
+#     python benchmarks/bench_auth.py --threads 8
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["DB_NAME"] = os.path.join(tempfile.mkdtemp(prefix="skill-auth-"), "auth.db")
+os.environ.setdefault("SESSION_SECRET", "benchmark-secret")
+
+import auth  # noqa: E402
+import db  # noqa: E402
+
+
+STUDENTS = 1000
+
+
+def setup():
+    with db.pool.transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                created_at TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO students (username, password_hash) VALUES (?, ?)",
+            [(f"student_{i}", hashlib.sha256(b"secret").hexdigest())
+             for i in range(STUDENTS)]
+        )
+    return [auth.issue_token(f"student_{i}", "student", i + 1)[0] for i in range(STUDENTS)]
+
+
+def database_lookup(i, tokens):
+    with db.pool.connection() as conn:
+        row = conn.execute(
+            "SELECT id, password_hash FROM students WHERE username = ?",
+            (f"student_{i % STUDENTS}",)
+        ).fetchone()
+    return row[1] == hashlib.sha256(b"secret").hexdigest()
+
+
+def token_uncached(i, tokens):
+    return auth.decode_token(tokens[i % STUDENTS]) is not None
+
+
+def token_cached(i, tokens):
+    return auth.sessions.resolve(tokens[i % STUDENTS]) is not None
+
+
+def run(label, fn, tokens, threads, seconds):
+    counts = []
+    stop = time.perf_counter() + seconds
+
+    def worker(offset):
+        done = 0
+        i = offset
+        while time.perf_counter() < stop:
+            assert fn(i, tokens)
+            i += 7
+            done += 1
+        counts.append(done)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    total = sum(counts)
+    print(f"{label:<22}{total / seconds:>12.0f} ops/s{seconds * threads / total * 1e6:>10.1f} us/op")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    tokens = setup()
+    run("db lookup + sha256", database_lookup, tokens, args.threads, args.seconds)
+    run("token, no cache", token_uncached, tokens, args.threads, args.seconds)
+    run("token, session cache", token_cached, tokens, args.threads, args.seconds)
+
+
+if __name__ == "__main__":
+    main_cli()
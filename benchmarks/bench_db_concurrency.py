@@ -0,0 +1,139 @@
+# Read/write throughput of the main.py data-access functions under
+# concurrency, with a fresh connection per call (the old behaviour)
+# versus the shared WAL connection pool.
+#
+# Run from the repository root:
+#     python benchmarks/bench_db_concurrency.py --writers 4 --readers 8
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+warnings.filterwarnings("ignore")
+
+# Point main.py at a scratch database before it creates its tables
+WORKDIR = tempfile.mkdtemp(prefix="skill-bench-")
+os.environ["DB_NAME"] = os.path.join(WORKDIR, "bootstrap.db")
+
+import db  # noqa: E402
+import main  # noqa: E402
+import storage  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+# Same interface as db.ConnectionPool, but opens and closes a default
+# rollback-journal connection for every call
+class ConnectPerCall:
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    @contextmanager
+    def write_transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                yield conn
+
+    def close(self):
+        pass
+
+
+SAMPLE = SimpleNamespace(
+    name="student_0",
+    marks=78,
+    accuracy=82,
+    time_taken=28,
+    attempts=1,
+    difficulty_level="hard",
+    topic_coverage=85,
+    consistency_score=80,
+)
+
+
+def run(label, pool, writers, readers, seconds, seed_rows):
+    main.pool = pool
+    main.create_students_table()
+    migrate(target_pool=pool)
+    main.backend = storage.SQLiteStorage(pool)
+
+    records = [
+        SimpleNamespace(**{**vars(SAMPLE), "name": f"student_{i % 500}"})
+        for i in range(seed_rows)
+    ]
+    main.save_predictions(records, ["Intermediate"] * seed_rows)
+
+    counts = {"write": 0, "read": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(kind, index):
+        done = 0
+        errors = 0
+        while time.perf_counter() < stop:
+            try:
+                if kind == "write":
+                    main.save_prediction(SAMPLE, "Advanced")
+                else:
+                    main.get_history_filtered(f"student_{index % 500}", 50)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=worker, args=("write", i)) for i in range(writers)]
+    threads += [threading.Thread(target=worker, args=("read", i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    print(f"{label:<18} writes/s: {counts['write'] / seconds:9.1f}   "
+          f"reads/s: {counts['read'] / seconds:9.1f}   "
+          f"locked errors: {counts['errors']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    run("connect per call", ConnectPerCall(os.path.join(WORKDIR, "before.db")),
+        args.writers, args.readers, args.seconds, args.seed_rows)
+    run("WAL pool", db.ConnectionPool(os.path.join(WORKDIR, "after.db")),
+        args.writers, args.readers, args.seconds, args.seed_rows)
+
+
+if __name__ == "__main__":
+    main_cli()
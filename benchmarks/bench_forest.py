@@ -0,0 +1,155 @@
+# Parity check and latency benchmark for the compiled RandomForest engine.
+#
+# Fits the notebook's RandomForestClassifier(n_estimators=100, max_depth=8)
+# on test_data.csv (or loads --forest), compiles it, and checks the
+# compiled arrays, loaded memory-mapped, against rf_model.predict on every
+# row of test_data.csv, row by row, and on random out-of-range inputs.
+# Fails if the compiled engine is slower than sklearn on a 10,000-row batch.
+#
+# Run from the repository root:
+#     python benchmarks/bench_forest.py
+#     python benchmarks/bench_forest.py --forest artifacts/rf_model.pkl
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from forest import CompiledForest  # noqa: E402
+from inference import FEATURE_COLUMNS  # noqa: E402
+
+warnings.filterwarnings("ignore")
+
+
+def load_features(difficulty_encoder):
+    df = pd.read_csv(os.path.join(ROOT, "test_data.csv"))
+    X = df[FEATURE_COLUMNS].copy()
+    X["difficulty_level"] = difficulty_encoder.transform(X["difficulty_level"])
+    return df, X.to_numpy(dtype=np.float64), df["skill_level"]
+
+
+def check_parity(forest, compiled, df, X):
+    expected = forest.predict(X)
+    actual = compiled.predict_matrix(X)
+    mismatches = int((expected != actual).sum())
+    if mismatches:
+        raise AssertionError(f"{mismatches} of {len(X)} predictions differ")
+
+    difference = np.abs(forest.predict_proba(X) - compiled.predict_proba(X)).max()
+    if difference > 1e-12:
+        raise AssertionError(f"Probabilities differ by up to {difference}")
+
+    # Large batches may use bitvector evaluation instead of the traversal
+    if not np.array_equal(compiled.predict_proba(X), compiled._chunk_proba(X)):
+        raise AssertionError("Batch evaluation differs from the tree traversal")
+
+    for row, single_expected in zip(df[FEATURE_COLUMNS].itertuples(index=False), expected):
+        if compiled.predict_one(*row) != single_expected:
+            raise AssertionError(f"Single-row prediction differs for {row}")
+
+    # Values outside the training range and on split thresholds
+    rng = np.random.default_rng(0)
+    random_rows = rng.normal(50, 40, size=(100_000, len(FEATURE_COLUMNS)))
+    random_rows[:, FEATURE_COLUMNS.index("difficulty_level")] = rng.integers(0, 3, size=100_000)
+    thresholds = compiled.threshold[np.isfinite(compiled.threshold)]
+    random_rows[:1000] = rng.choice(thresholds, size=(1000, len(FEATURE_COLUMNS)))
+    mismatches = int((forest.predict(random_rows) != compiled.predict_matrix(random_rows)).sum())
+    if mismatches:
+        raise AssertionError(f"{mismatches} of {len(random_rows)} random predictions differ")
+
+    return len(X), len(random_rows)
+
+
+def time_per_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--forest", help="Fitted RandomForest pickle (default: fit one)")
+    args = parser.parse_args()
+
+    difficulty_encoder = joblib.load(os.path.join(ROOT, "difficulty_encoder.pkl"))
+    df, X, y = load_features(difficulty_encoder)
+
+    if args.forest:
+        forest = joblib.load(args.forest)
+    else:
+        forest = RandomForestClassifier(n_estimators=100, max_depth=8, random_state=42).fit(X, y)
+
+    workdir = tempfile.mkdtemp(prefix="skill-forest-")
+    try:
+        pickle_path = os.path.join(workdir, "rf_model.pkl")
+        joblib.dump(forest, pickle_path)
+
+        start = time.perf_counter()
+        CompiledForest.from_sklearn(forest, difficulty_encoder).save(os.path.join(workdir, "forest"))
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        compiled = CompiledForest.load(os.path.join(workdir, "forest"))
+        mmap_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        joblib.load(pickle_path)
+        unpickle_ms = (time.perf_counter() - start) * 1000
+
+        rows, random_rows = check_parity(forest, compiled, df, X)
+        print(f"parity: {rows} rows (batch and single) and {random_rows} random rows match")
+        print(f"trees: {len(compiled.roots)}   nodes: {len(compiled.feature)}   "
+              f"max depth: {compiled.max_depth}   compile: {compile_ms:.1f} ms")
+        print(f"artifact    pickle: {os.path.getsize(pickle_path) / 1024:8.1f} KiB   "
+              f"arrays: {directory_size(os.path.join(workdir, 'forest')) / 1024:8.1f} KiB")
+        print(f"load        pickle: {unpickle_ms:8.2f} ms    mmap: {mmap_ms:8.2f} ms")
+
+        sample = {
+            "marks": 78,
+            "accuracy": 82,
+            "time_taken": 28,
+            "attempts": 1,
+            "difficulty_level": "hard",
+            "topic_coverage": 85,
+            "consistency_score": 80,
+        }
+        encoded = np.array([[78, 82, 28, 1, difficulty_encoder.transform(["hard"])[0], 85, 80]],
+                           dtype=np.float64)
+
+        before = time_per_call(lambda: forest.predict(encoded), 200)
+        after = time_per_call(lambda: compiled.predict_one(**sample), 5000)
+        print(f"single row  sklearn: {before:9.1f} us   compiled: {after:8.1f} us   "
+              f"speedup: {before / after:6.1f}x")
+
+        for size in (100, 10_000):
+            batch = np.random.default_rng(1).integers(1, 100, size=(size, 7)).astype(np.float64)
+            batch[:, 4] %= 3
+            repeat = max(5, 200_000 // size)
+            before = time_per_call(lambda: forest.predict(batch), repeat)
+            after = time_per_call(lambda: compiled.predict_matrix(batch), repeat)
+            print(f"{size:>6} rows  sklearn: {before:9.1f} us   compiled: {after:8.1f} us   "
+                  f"speedup: {before / after:6.1f}x")
+        if after > before:
+            raise AssertionError(f"Compiled engine is slower than sklearn on {size} rows")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
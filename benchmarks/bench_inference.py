@@ -0,0 +1,113 @@
+# Parity check and latency benchmark for the fused inference path.
+#
+# Run from the repository root:
+#     python benchmarks/bench_inference.py
+
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inference import FEATURE_COLUMNS, FusedLogisticModel  # noqa: E402
+
+warnings.filterwarnings("ignore")
+
+
+def load_pipeline():
+    model = joblib.load(os.path.join(ROOT, "skill_model.pkl"))
+    scaler = joblib.load(os.path.join(ROOT, "scaler.pkl"))
+    difficulty_encoder = joblib.load(os.path.join(ROOT, "difficulty_encoder.pkl"))
+    return model, scaler, difficulty_encoder
+
+
+# The fused model must agree with scaler + model on every row of test_data.csv
+def check_parity(model, scaler, difficulty_encoder, fused):
+    df = pd.read_csv(os.path.join(ROOT, "test_data.csv"))
+    X = df[FEATURE_COLUMNS].copy()
+    X["difficulty_level"] = difficulty_encoder.transform(X["difficulty_level"])
+
+    expected = model.predict(scaler.transform(X))
+    actual = fused.predict_matrix(X.to_numpy(dtype=np.float64))
+
+    mismatches = int((expected != actual).sum())
+    if mismatches:
+        raise AssertionError(f"{mismatches} of {len(df)} predictions differ")
+
+    # Single-row path must agree too
+    for row in df[FEATURE_COLUMNS].itertuples(index=False):
+        single = fused.predict_one(*row)
+        single_expected = model.predict(scaler.transform(pd.DataFrame(
+            [[*row[:4], difficulty_encoder.transform([row[4]])[0], *row[5:]]],
+            columns=FEATURE_COLUMNS
+        )))[0]
+        if single != single_expected:
+            raise AssertionError(f"Single-row prediction differs for {row}")
+
+    return len(df)
+
+
+def time_per_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    model, scaler, difficulty_encoder = load_pipeline()
+    fused = FusedLogisticModel.from_pipeline(model, scaler, difficulty_encoder)
+
+    rows = check_parity(model, scaler, difficulty_encoder, fused)
+    print(f"parity: {rows} rows match")
+
+    sample = {
+        "marks": 78,
+        "accuracy": 82,
+        "time_taken": 28,
+        "attempts": 1,
+        "difficulty_level": "hard",
+        "topic_coverage": 85,
+        "consistency_score": 80,
+    }
+
+    # The pandas + sklearn steps the /predict endpoint used to run
+    def pipeline_single():
+        input_df = pd.DataFrame([sample])
+        input_df["difficulty_level"] = difficulty_encoder.transform(
+            input_df["difficulty_level"]
+        )
+        return model.predict(scaler.transform(input_df))[0]
+
+    def fused_single():
+        return fused.predict_one(**sample)
+
+    before = time_per_call(pipeline_single, 500)
+    after = time_per_call(fused_single, 20000)
+    print(f"single row  pipeline: {before:9.1f} us   fused: {after:7.2f} us   "
+          f"speedup: {before / after:7.1f}x")
+
+    batch = np.random.default_rng(0).integers(1, 100, size=(10000, 7)).astype(np.float64)
+    batch[:, 4] %= 3
+
+    def pipeline_batch():
+        return model.predict(scaler.transform(pd.DataFrame(batch, columns=FEATURE_COLUMNS)))
+
+    def fused_batch():
+        return fused.predict_matrix(batch)
+
+    before = time_per_call(pipeline_batch, 20)
+    after = time_per_call(fused_batch, 200)
+    print(f"10k batch   pipeline: {before:9.1f} us   fused: {after:7.1f} us   "
+          f"speedup: {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Overhead of the /metrics instrumentation: cost of one histogram
+# observation, and sequential /predict latency through uvicorn with
+# METRICS_ENABLED=0 versus 1 (alternating rounds to cancel drift).
+#
+# Run from the repository root:
+#     python benchmarks/bench_metrics.py --rounds 5 --requests 2000
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_suite import SAMPLE_INPUT, free_port, start_server  # noqa: E402
+from load_test import Connection  # noqa: E402
+import metrics  # noqa: E402
+
+
+def observe_cost(repeat=200_000):
+    child = metrics.Histogram("bench_seconds", "benchmark only").labels()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        child.observe(0.0012)
+    return (time.perf_counter() - start) / repeat * 1e9
+
+
+async def sequential(port, requests):
+    connection = Connection("127.0.0.1", port)
+    try:
+        for _ in range(100):
+            await connection.request("POST", "/predict", SAMPLE_INPUT)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await connection.request("POST", "/predict", SAMPLE_INPUT)
+        return (time.perf_counter() - start) / requests * 1000
+    finally:
+        connection.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"histogram observe: {observe_cost():.0f} ns")
+
+    workdir = tempfile.mkdtemp(prefix="skill-metrics-")
+    latencies = {"0": [], "1": []}
+    try:
+        for _ in range(args.rounds):
+            for enabled in ("0", "1"):
+                env = dict(
+                    os.environ,
+                    METRICS_ENABLED=enabled,
+                    DB_NAME=os.path.join(workdir, "metrics.db"),
+                    MODEL_REGISTRY_DIR=os.path.join(workdir, "models"),
+                    PYTHONPATH=ROOT,
+                )
+                port = free_port()
+                server = start_server(env, port)
+                try:
+                    latencies[enabled].append(asyncio.run(sequential(port, args.requests)))
+                finally:
+                    server.terminate()
+                    server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    disabled = statistics.median(latencies["0"])
+    enabled = statistics.median(latencies["1"])
+    print(f"/predict metrics off: {disabled:.3f} ms   on: {enabled:.3f} ms   "
+          f"overhead: {(enabled / disabled - 1) * 100:+.1f}%")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,84 @@
+# Cost of profiler.CallProfiler per call and a check that overlapping
+# sampled calls succeed. From Python 3.12 a second cProfile started while
+# one is active raises ValueError, so concurrent request threads must not
+# profile at the same time: the overlapping calls run unprofiled.
+#
+# Run from the repository root:
+#     python benchmarks/bench_profiler.py --threads 8 --calls 2000
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from profiler import CallProfiler  # noqa: E402
+
+
+def work(n=2000):
+    return sum(i * i for i in range(n))
+
+
+# Every thread enters a sampled call while the others are inside theirs
+def check_overlap(threads):
+    call_profiler = CallProfiler()
+
+    def overlapping():
+        time.sleep(0.2)
+        return work()
+
+    call_profiler.start(1.0)
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(lambda _: call_profiler.call(overlapping), range(threads)))
+    finally:
+        stats = call_profiler.stop()
+    if results != [work()] * threads:
+        raise AssertionError("overlapping profiled calls returned wrong results")
+    if call_profiler.profiled + call_profiler.skipped != threads or not call_profiler.skipped:
+        raise AssertionError(f"{threads} overlapping calls: {call_profiler.profiled} profiled, "
+                             f"{call_profiler.skipped} skipped")
+    if stats is None:
+        raise AssertionError("no call was profiled")
+    return call_profiler.profiled, call_profiler.skipped
+
+
+def call_cost(threads, calls, fraction):
+    call_profiler = CallProfiler()
+    if fraction:
+        call_profiler.start(fraction)
+    samples = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call_profiler.call(work)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(threads) as pool:
+        samples = list(pool.map(timed, range(calls)))
+    call_profiler.stop()
+    return statistics.median(samples) * 1e6, call_profiler.profiled, call_profiler.skipped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    profiled, skipped = check_overlap(args.threads)
+    print(f"{args.threads} overlapping sampled calls succeeded: "
+          f"{profiled} profiled, {skipped} run unprofiled")
+
+    for fraction in (0, 0.1, 1.0):
+        median_us, profiled, skipped = call_cost(args.threads, args.calls, fraction)
+        print(f"fraction {fraction:<4}  median call {median_us:8.1f} us   "
+              f"profiled {profiled:5d}   unprofiled overlaps {skipped:5d}")
+
+
+if __name__ == "__main__":
+    main()
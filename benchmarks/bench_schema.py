@@ -0,0 +1,242 @@
+# Before/after comparison of the compact predictions schema (version 6).
+#
+# Builds a version 5 database (text names, text timestamps, text labels)
+# of synthetic predictions, measures its size and the latency of the
+# per-student and global read paths, converts it with
+# compact_schema.migrate_online, and measures again through main's own
+# functions. Every response is also checked to be identical before and
+# after the conversion.
+#
+# Run from the repository root:
+#     python benchmarks/bench_schema.py --rows 1m
+#     python benchmarks/bench_schema.py --rows 1m --rows-per-student 500
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_data import ROWS_PER_STUDENT, generate, parse_rows  # noqa: E402
+from inference import FEATURE_COLUMNS  # noqa: E402
+
+# The schema main.py created before version 6
+LEGACY_TABLES = [
+    """
+    CREATE TABLE predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        marks INTEGER,
+        accuracy INTEGER,
+        time_taken INTEGER,
+        attempts INTEGER,
+        difficulty_level TEXT,
+        topic_coverage INTEGER,
+        consistency_score INTEGER,
+        predicted_skill TEXT,
+        created_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TEXT
+    )
+    """,
+]
+
+HISTORY_COLUMNS = ("id, name, marks, accuracy, time_taken, attempts, difficulty_level, "
+                   "topic_coverage, consistency_score, predicted_skill, created_at, model_version")
+
+LEGACY_BUCKET_SQL = {
+    "week": "date(created_at, 'weekday 0', '-6 days')",
+}
+
+LEGACY_SKILL_VALUE_SQL = ("CASE predicted_skill WHEN 'Beginner' THEN 1 "
+                          "WHEN 'Intermediate' THEN 2 WHEN 'Advanced' THEN 3 END")
+
+
+def build_legacy(rows, seed, rows_per_student):
+    import migrations
+    import summaries
+    from db import pool
+    from compact_schema import local_time
+
+    with pool.transaction() as conn:
+        for ddl in LEGACY_TABLES:
+            conn.execute(ddl)
+    migrations.migrate(target_version=migrations.COMPACT_SCHEMA_VERSION - 1)
+
+    students = max(1, rows // rows_per_student)
+    with pool.transaction() as conn:
+        # Every fifth student has an account; the rest only have predictions
+        conn.executemany(
+            "INSERT INTO students (username, password_hash, created_at) VALUES (?, ?, ?)",
+            ((f"student_{i}", "x", "2025-01-01 00:00:00") for i in range(0, students, 5))
+        )
+    for _, columns in generate(rows, seed, rows_per_student=rows_per_student):
+        created_at = [local_time(epoch) for epoch in columns["created_at"].tolist()]
+        with pool.transaction() as conn:
+            conn.executemany(f"""
+                INSERT INTO predictions (
+                    name, {", ".join(FEATURE_COLUMNS)}, predicted_skill, created_at, model_version
+                ) VALUES ({", ".join("?" * 11)})
+            """, zip(
+                columns["name"].tolist(),
+                *(columns[column].tolist() for column in FEATURE_COLUMNS),
+                columns["skill_level"].tolist(),
+                created_at,
+                ["v1"] * len(created_at),
+            ))
+    with pool.transaction() as conn:
+        summaries.rebuild_summaries(conn)
+    with pool.connection() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    return students
+
+
+# The read paths as main.py ran them against the version 5 schema: a
+# pooled connection per call, timed by the same metrics wrapper
+def legacy_queries():
+    from db import pool
+    from metrics import db_operation
+
+    @db_operation("legacy_history")
+    def history(name, limit=50, before_id=None):
+        conditions, params = [], []
+        if name:
+            conditions.append("name = ?")
+            params.append(name)
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with pool.connection() as conn:
+            rows = conn.execute(f"SELECT {HISTORY_COLUMNS} FROM predictions {where} "
+                                f"ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(zip(HISTORY_COLUMNS.split(", "), row)) for row in rows]
+
+    @db_operation("legacy_user_progress")
+    def user_progress(name):
+        with pool.connection() as conn:
+            rows = conn.execute("SELECT id, created_at, predicted_skill FROM predictions "
+                                "WHERE name = ? ORDER BY created_at, id", (name,)).fetchall()
+        return [{"id": row[0], "date": row[1], "skill": row[2]} for row in rows]
+
+    @db_operation("legacy_progress_series")
+    def weekly_series(name):
+        bucket = LEGACY_BUCKET_SQL["week"]
+        with pool.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT {bucket} AS bucket, AVG({LEGACY_SKILL_VALUE_SQL}), COUNT(*)
+                FROM predictions WHERE name = ? GROUP BY bucket ORDER BY bucket
+            """, (name,)).fetchall()
+        return {"date": [row[0] for row in rows],
+                "skill_value": [round(row[1], 3) for row in rows],
+                "predictions": [row[2] for row in rows]}
+
+    return {"history": history, "user_progress": user_progress, "weekly_series": weekly_series}
+
+
+def compact_queries():
+    import main
+
+    def weekly_series(name):
+        return main.get_progress_series(name, "week")["columns"]
+
+    return {
+        "history": main.get_history_filtered,
+        "user_progress": main.get_user_progress,
+        "weekly_series": weekly_series,
+    }
+
+
+def workload(students, rows, seed):
+    rng = np.random.default_rng(seed)
+    names = [f"student_{i}" for i in rng.integers(0, students, 200)]
+    cursors = [int(i) for i in rng.integers(100, rows, 200)]
+    return [
+        ("history, one student", "history", [(name,) for name in names]),
+        ("history, global page", "history", [(None, 50, cursor) for cursor in cursors]),
+        ("progress, full", "user_progress", [(name,) for name in names]),
+        ("progress, weekly", "weekly_series", [(name,) for name in names]),
+    ]
+
+
+def run(queries, cases, repeat):
+    results, timings = {}, {}
+    for label, query, calls in cases:
+        results[label] = [queries[query](*args) for args in calls]
+        samples = []
+        for _ in range(repeat):
+            for args in calls:
+                start = time.perf_counter()
+                queries[query](*args)
+                samples.append(time.perf_counter() - start)
+        timings[label] = statistics.median(samples) * 1e6
+    return results, timings
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="200k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rows-per-student", type=int, default=ROWS_PER_STUDENT)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    rows = parse_rows(args.rows)
+
+    workdir = tempfile.mkdtemp(prefix="skill-schema-")
+    path = os.path.join(workdir, "predictions.db")
+    os.environ["DB_NAME"] = path
+    os.environ.setdefault("MODEL_REGISTRY_DIR", os.path.join(workdir, "models"))
+    os.chdir(ROOT)
+    try:
+        import compact_schema
+        from db import pool
+
+        started = time.perf_counter()
+        students = build_legacy(rows, args.seed, args.rows_per_student)
+        print(f"built {rows} rows for {students} students in {time.perf_counter() - started:.1f} s")
+        cases = workload(students, rows, args.seed)
+
+        size_before = os.path.getsize(path)
+        before, timings_before = run(legacy_queries(), cases, args.repeat)
+
+        started = time.perf_counter()
+        compact_schema.migrate_online()
+        migrate_s = time.perf_counter() - started
+        with pool.connection() as conn:
+            conn.execute("VACUUM")
+        size_after = os.path.getsize(path)
+
+        after, timings_after = run(compact_queries(), cases, args.repeat)
+        for label in before:
+            if before[label] != after[label]:
+                raise AssertionError(f"{label}: responses differ after the conversion")
+        print(f"parity: every response identical ({sum(len(c[2]) for c in cases)} calls)")
+
+        print(f"migrate_online: {migrate_s:.1f} s")
+        print(f"database size     v5: {size_before / 2**20:8.1f} MiB   "
+              f"compact: {size_after / 2**20:8.1f} MiB   "
+              f"({size_after / size_before:.0%})")
+        for label in timings_before:
+            print(f"{label:<22} v5: {timings_before[label]:8.1f} us   "
+                  f"compact: {timings_after[label]:8.1f} us   "
+                  f"speedup: {timings_before[label] / timings_after[label]:5.2f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
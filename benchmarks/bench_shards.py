@@ -0,0 +1,234 @@
+# Write throughput of the storage backends: the single application
+# database versus predictions hash-sharded over 1..N SQLite files.
+#
+# Several writer processes (like serve.py workers) each commit one
+# prediction per transaction, as /predict does in write-through mode, for
+# random students. With one database every commit queues on the same
+# write lock; with shards, commits for students in different shards run
+# in parallel. Ends with a check that a global history page and the
+# analytics totals match what was written, and, with several shards,
+# that a row written after a large batch on another shard sorts after it
+# and that a write-behind flush retried after one shard failed stores
+# every row once.
+#
+# Run from the repository root:
+#     python benchmarks/bench_shards.py --shards 1,2,4,8 --writers 8
+#     python benchmarks/bench_shards.py --synchronous FULL
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUDENTS = 10_000
+
+
+def sample_row(rng):
+    return (
+        f"student_{rng.randrange(STUDENTS)}",
+        rng.randint(0, 100),
+        rng.randint(0, 100),
+        rng.randint(1, 120),
+        rng.randint(1, 5),
+        rng.choice(("easy", "medium", "hard")),
+        rng.randint(0, 100),
+        rng.randint(0, 100),
+        rng.choice(("Beginner", "Intermediate", "Advanced")),
+        int(time.time()),
+        "v1",
+    )
+
+
+def open_store(paths):
+    import storage
+    from db import ConnectionPool
+
+    if paths is None:
+        return storage.SQLiteStorage(ConnectionPool(os.environ["DB_NAME"], 2))
+    return storage.ShardedStorage(paths, pool_size=2)
+
+
+def writer(paths, start, seconds, batch_rows, seed, counts):
+    store = open_store(paths)
+    rng = random.Random(seed)
+    written = 0
+    while time.time() < start:
+        time.sleep(0.001)
+    stop = start + seconds
+    while time.time() < stop:
+        store.insert_predictions([sample_row(rng) for _ in range(batch_rows)])
+        written += batch_rows
+    store.close()
+    counts.put(written)
+
+
+def prepare(workdir, shards):
+    import storage
+    from db import pool
+    from migrations import migrate
+
+    with pool.transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, marks INTEGER,
+                accuracy INTEGER, time_taken INTEGER, attempts INTEGER, difficulty_level TEXT,
+                topic_coverage INTEGER, consistency_score INTEGER, predicted_skill TEXT,
+                created_at TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL, created_at TEXT
+            )
+        """)
+    migrate()
+    if shards is None:
+        return None
+    paths = [os.path.join(workdir, f"shard{index}.db") for index in range(shards)]
+    for path in paths:
+        storage.open_shard(path).close()
+    return paths
+
+
+def measure(shards, writers, seconds, batch_rows, synchronous):
+    workdir = tempfile.mkdtemp(prefix="skill-shards-")
+    env = {"DB_NAME": os.path.join(workdir, "app.db"), "DB_SYNCHRONOUS": synchronous}
+    os.environ.update(env)
+    try:
+        context = multiprocessing.get_context("spawn")
+        # Schema setup in a child so this process never imports db with a
+        # stale DB_NAME
+        with context.Pool(1) as setup:
+            paths = setup.apply(prepare, (workdir, shards))
+
+        counts = context.Queue()
+        start = time.time() + 2
+        processes = [
+            context.Process(target=writer, args=(paths, start, seconds, batch_rows, seed, counts))
+            for seed in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        written = sum(counts.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        with context.Pool(1) as check:
+            check.apply(verify, (paths, written))
+            if paths and len(paths) > 1:
+                check.apply(verify_id_order, (paths,))
+        if paths and len(paths) > 1:
+            # A short busy timeout so the locked shard fails quickly
+            os.environ["DB_BUSY_TIMEOUT_MS"] = "200"
+            try:
+                with context.Pool(1) as check:
+                    check.apply(verify_partial_flush, (paths,))
+            finally:
+                del os.environ["DB_BUSY_TIMEOUT_MS"]
+        return written / seconds
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def verify(paths, written):
+    store = open_store(paths)
+    try:
+        kpis = store.kpis()
+        if kpis["total_predictions"] != written:
+            raise AssertionError(f"{kpis['total_predictions']} predictions stored, {written} written")
+        page = store.history(None, 100)
+        ids = [row["id"] for row in page]
+        if ids != sorted(ids, reverse=True) or len(set(ids)) != len(ids):
+            raise AssertionError("global history page is not in id order")
+    finally:
+        store.close()
+
+
+# A big batch on one shard must not take ids a later row on another shard
+# sorts below: the later row heads the global history and after_id
+# polling from the batch finds it
+def verify_id_order(paths):
+    import storage
+
+    store = open_store(paths)
+    try:
+        rng = random.Random(0)
+        names = {}
+        while len(names) < 2:
+            name = f"student_{rng.randrange(STUDENTS)}"
+            names.setdefault(storage.shard_index(name, len(paths)), name)
+        first, second = names.values()
+        store.insert_predictions([(first, *sample_row(rng)[1:]) for _ in range(5000)])
+        last = store.history(first, 1)[0]["id"]
+        time.sleep(0.5)
+        store.insert_predictions([(second, *sample_row(rng)[1:])])
+        newest = store.history(None, 1)[0]
+        polled = store.history(None, 50, None, last)
+        if newest["name"] != second or [row["name"] for row in polled] != [second]:
+            raise AssertionError("a row written after a batch on another shard sorts before it")
+    finally:
+        store.close()
+
+
+# A write-behind batch spanning every shard, with one shard locked by
+# another writer during the first attempt: the retry writes only that
+# shard's rows, so each row is stored once
+def verify_partial_flush(paths):
+    from write_behind import WriteBehindWriter
+
+    store = open_store(paths)
+    try:
+        before = store.kpis()["total_predictions"]
+        rng = random.Random(1)
+        rows = [sample_row(rng) for _ in range(200)]
+
+        blocker = sqlite3.connect(paths[0])
+        blocker.execute("BEGIN IMMEDIATE")
+        writer = WriteBehindWriter(store.insert_predictions, flush_ms=10)
+        writer.start()
+        writer.offer(rows)
+        while not writer.flush_errors:
+            time.sleep(0.01)
+        blocker.rollback()
+        blocker.close()
+        writer.stop()
+
+        stored = store.kpis()["total_predictions"] - before
+        if stored != len(rows) or writer.flushed_rows != len(rows) or writer.dropped_rows:
+            raise AssertionError(f"{len(rows)} rows flushed with a failed shard, {stored} stored")
+    finally:
+        store.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-rows", type=int, default=1,
+                        help="rows per transaction (1 = /predict in write-through mode)")
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    print(f"{args.writers} writer processes, {args.batch_rows} row(s) per commit, "
+          f"synchronous={args.synchronous}")
+    print(f"{'backend':<12} {'rows/s':>10} {'vs single':>10}")
+    single = measure(None, args.writers, args.seconds, args.batch_rows, args.synchronous)
+    print(f"{'single':<12} {single:10.0f} {1:9.2f}x")
+    for shards in (int(n) for n in args.shards.split(",")):
+        rate = measure(shards, args.writers, args.seconds, args.batch_rows, args.synchronous)
+        print(f"{f'{shards} shards':<12} {rate:10.0f} {rate / single:9.2f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
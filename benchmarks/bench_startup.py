@@ -0,0 +1,113 @@
+# Cold-start benchmark: time from launching uvicorn to the first ready
+# probe and the first /predict response, for each model artifact format.
+#
+# Run from the repository root:
+#     python benchmarks/bench_startup.py --runs 3
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARTIFACTS = ["skill_model.pkl", "scaler.pkl", "difficulty_encoder.pkl"]
+
+SAMPLE = {
+    "name": "cold-start",
+    "marks": 78,
+    "accuracy": 82,
+    "time_taken": 28,
+    "attempts": 1,
+    "difficulty_level": "hard",
+    "topic_coverage": 85,
+    "consistency_score": 80,
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_ready(port, deadline):
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    raise RuntimeError("server never became ready")
+
+
+def measure(workdir, artifact_format):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        DB_NAME=os.path.join(workdir, "startup.db"),
+        MODEL_ARTIFACT_FORMAT=artifact_format,
+    )
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_ready(port, time.time() + 60)
+        ready = time.perf_counter() - started
+
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/predict",
+            data=json.dumps(SAMPLE).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        first_response = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+    return ready, first_response
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="skill-startup-")
+    try:
+        for artifact in ARTIFACTS:
+            shutil.copy(os.path.join(ROOT, artifact), workdir)
+        # First start registers v1 and creates the database; not measured
+        measure(workdir, "npz")
+
+        print(f"{'artifact':<10}{'ready s':>10}{'first /predict s':>18}")
+        for artifact_format in ("pickle", "npz"):
+            results = [measure(workdir, artifact_format) for _ in range(args.runs)]
+            ready = statistics.median(r[0] for r in results)
+            first = statistics.median(r[1] for r in results)
+            print(f"{artifact_format:<10}{ready:>10.3f}{first:>18.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,299 @@
+# End-to-end benchmark suite on synthetic databases of increasing size.
+#
+# For every scale a pristine database is generated once with
+# synthetic_data.py and cached in --data-dir; each run works on a fresh
+# copy. Measured per scale:
+#
+#   predict_single       sequential POST /predict over one keep-alive connection
+#   predict_concurrent   POST /predict from --concurrency clients
+#   save_prediction      main.save_prediction rows/s (one commit per row)
+#   save_predictions     main.save_predictions rows/s (500-row batches)
+#   history_filtered     main.get_history_filtered(name, 50)
+#   user_progress        main.get_user_progress(name)
+#   skill_distribution   main.get_skill_distribution()
+#   admin_dashboard      main.admin_dashboard()
+#
+# Results go to a JSON file so two commits can be compared:
+#     python benchmarks/bench_suite.py --scales 10k,1m --output before.json
+#     python benchmarks/bench_suite.py --scales 10k,1m --output after.json
+#     python benchmarks/bench_suite.py --compare before.json after.json
+#
+# 10m is supported but not in the default scales: generating it takes
+# several minutes and about 1.5 GB of disk.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+from synthetic_data import ROWS_PER_STUDENT, parse_rows  # noqa: E402
+
+
+SAMPLE_INPUT = {
+    "name": "bench",
+    "marks": 78,
+    "accuracy": 82,
+    "time_taken": 28,
+    "attempts": 1,
+    "difficulty_level": "hard",
+    "topic_coverage": 85,
+    "consistency_score": 80,
+}
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "runs": count,
+        "mean_ms": round(sum(latencies) / count * 1000, 4),
+        "p50_ms": round(latencies[count // 2] * 1000, 4),
+        "p99_ms": round(latencies[min(count - 1, int(count * 0.99))] * 1000, 4),
+    }
+
+
+def time_calls(fn, repeat):
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def throughput(fn, rows_per_call, seconds):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    elapsed = time.perf_counter() - start
+    return {"rows_per_s": round(calls * rows_per_call / elapsed, 1), "calls": calls}
+
+
+# Runs in a child process per scale so main binds to that database
+def measure_in_process(rows, repeat, seconds):
+    import main
+
+    students = max(1, rows // ROWS_PER_STUDENT)
+    rng = random.Random(0)
+
+    def random_name():
+        return f"student_{rng.randrange(students)}"
+
+    record = main.SkillInput(**SAMPLE_INPUT)
+    version = main.registry.current().version
+    batch = [record] * 500
+
+    results = {
+        "history_filtered": time_calls(
+            lambda: main.get_history_filtered(random_name(), 50), repeat),
+        "user_progress": time_calls(
+            lambda: main.get_user_progress(random_name()), repeat),
+        "skill_distribution": time_calls(main.get_skill_distribution, repeat),
+        "admin_dashboard": time_calls(main.admin_dashboard, max(10, repeat // 10)),
+        "save_prediction": throughput(
+            lambda: main.save_prediction(record, "Advanced", version), 1, seconds),
+        "save_predictions": throughput(
+            lambda: main.save_predictions(batch, ["Advanced"] * 500, version), 500, seconds),
+    }
+    main.pool.close()
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env, port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+def measure_http(env, repeat, seconds, concurrency):
+    from load_test import Connection, drive
+
+    port = free_port()
+    server = start_server(env, port)
+    try:
+        async def sequential():
+            connection = Connection("127.0.0.1", port)
+            latencies = []
+            try:
+                await connection.request("POST", "/predict", SAMPLE_INPUT)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    await connection.request("POST", "/predict", SAMPLE_INPUT)
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            return summarize(latencies)
+
+        single = asyncio.run(sequential())
+        concurrent = asyncio.run(drive(port, "/predict", concurrency, seconds, []))
+    finally:
+        server.terminate()
+        server.wait()
+
+    concurrent["concurrency"] = concurrency
+    for key in ("rps", "p50_ms", "p99_ms"):
+        concurrent[key] = round(concurrent[key], 4)
+    return {"predict_single": single, "predict_concurrent": concurrent}
+
+
+def ensure_database(data_dir, label, rows):
+    path = os.path.join(data_dir, f"predictions_{label}.db")
+    if not os.path.exists(path):
+        print(f"Generating {label} rows ...", file=sys.stderr)
+        subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, "synthetic_data.py"),
+             "--rows", str(rows), "--db", path],
+            check=True,
+            env=dict(os.environ, MODEL_REGISTRY_DIR=os.path.join(data_dir, "models")),
+        )
+    return path
+
+
+def run_scale(data_dir, label, args):
+    rows = parse_rows(label)
+    pristine = ensure_database(data_dir, label, rows)
+
+    workdir = tempfile.mkdtemp(prefix=f"skill-bench-{label}-", dir=data_dir)
+    try:
+        database = os.path.join(workdir, "predictions.db")
+        shutil.copyfile(pristine, database)
+        env = dict(
+            os.environ,
+            DB_NAME=database,
+            MODEL_REGISTRY_DIR=os.path.join(data_dir, "models"),
+            PYTHONPATH=ROOT,
+        )
+
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure-rows", str(rows),
+             "--repeat", str(args.repeat), "--seconds", str(args.seconds)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+        )
+        results = json.loads(child.stdout.strip().splitlines()[-1])
+        results.update(measure_http(env, args.repeat, args.seconds, args.concurrency))
+        results["rows"] = rows
+        results["db_bytes"] = os.path.getsize(pristine)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+# Print every shared metric with its ratio; latencies are better when
+# lower, throughputs when higher
+def compare(before_path, after_path, threshold):
+    with open(before_path) as f:
+        before = flatten(json.load(f)["scales"])
+    with open(after_path) as f:
+        after = flatten(json.load(f)["scales"])
+
+    regressions = 0
+    print(f"{'metric':<48}{'before':>14}{'after':>14}{'ratio':>9}")
+    for key in sorted(before.keys() & after.keys()):
+        if not key.endswith(("_ms", "rows_per_s", "rps")) or not before[key]:
+            continue
+        ratio = after[key] / before[key]
+        worse = ratio > 1 + threshold if key.endswith("_ms") else ratio < 1 - threshold
+        regressions += worse
+        flag = "  REGRESSION" if worse else ""
+        print(f"{key:<48}{before[key]:>14.3f}{after[key]:>14.3f}{ratio:>9.2f}{flag}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="10k,1m")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "skill-bench"))
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change reported as a regression by --compare")
+    parser.add_argument("--measure-rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    if args.measure_rows is not None:
+        sys.path.insert(0, ROOT)
+        results = measure_in_process(args.measure_rows, args.repeat, args.seconds)
+        print(json.dumps(results))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {"repeat": args.repeat, "seconds": args.seconds,
+                     "concurrency": args.concurrency},
+        "scales": {},
+    }
+    for label in args.scales.split(","):
+        print(f"Measuring {label} ...", file=sys.stderr)
+        report["scales"][label] = run_scale(args.data_dir, label, args)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["scales"], indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,133 @@
+# Memory of multi-worker serving: per-worker RSS and PSS, and the total
+# PSS of all serving processes, for uvicorn --workers N versus serve.py
+# with and without preloading, at several worker counts.
+#
+# Linux only (reads /proc). Run from the repository root:
+#     python benchmarks/bench_workers.py --workers 1,2,4
+#     MODEL_TYPE=forest python benchmarks/bench_workers.py
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_suite import SAMPLE_INPUT, free_port  # noqa: E402
+import process_memory  # noqa: E402
+
+MODES = {
+    "uvicorn": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ],
+    "serve-no-preload": lambda port, workers: [
+        sys.executable, "serve.py", "--port", str(port), "--workers", str(workers), "--no-preload",
+    ],
+    "serve": lambda port, workers: [
+        sys.executable, "serve.py", "--port", str(port), "--workers", str(workers),
+    ],
+}
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+# uvicorn --workers 1 serves from the launched process itself
+def serving_pids(pid):
+    return process_memory.worker_pids(pid) or [pid]
+
+
+def wait_ready(process, port, workers):
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if request(port, "GET", "/ready") == 200 \
+                    and len(serving_pids(process.pid)) >= workers:
+                break
+        except OSError:
+            pass
+        time.sleep(0.2)
+    else:
+        raise RuntimeError("server did not become ready")
+
+    # Fresh connections are spread over the workers, so every worker has
+    # imported main and served predictions before it is measured
+    for _ in range(100 * workers):
+        request(port, "POST", "/predict", SAMPLE_INPUT)
+    time.sleep(1)
+
+
+def server_env(workdir):
+    return dict(
+        os.environ,
+        DB_NAME=os.path.join(workdir, "workers.db"),
+        MODEL_REGISTRY_DIR=os.path.join(workdir, "models"),
+        PREDICTION_CACHE_SIZE="0",
+        SESSION_SECRET=os.getenv("SESSION_SECRET", "bench-workers"),
+    )
+
+
+def measure(mode, workers, workdir):
+    port = free_port()
+    process = subprocess.Popen(MODES[mode](port, workers), cwd=ROOT, env=server_env(workdir),
+                               stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(process, port, workers)
+        workers = serving_pids(process.pid)
+        supervisor = process.pid if workers != [process.pid] else None
+        return process_memory.memory_report(supervisor, workers)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    if not process_memory.AVAILABLE:
+        sys.exit("Needs Linux /proc")
+
+    workdir = tempfile.mkdtemp(prefix="skill-workers-")
+    try:
+        # Register the bootstrap version up front so no measured server
+        # pays for the one-off export
+        subprocess.run([sys.executable, "-c", "import model_registry; model_registry.preload()"],
+                       cwd=ROOT, env=server_env(workdir), check=True, stderr=subprocess.DEVNULL)
+        print(f"{'mode':<18} {'workers':>7} {'worker rss MiB':>15} {'worker pss MiB':>15} "
+              f"{'total pss MiB':>14} {'sum of rss MiB':>15}")
+        for workers in (int(n) for n in args.workers.split(",")):
+            for mode in args.modes.split(","):
+                report = measure(mode, workers, workdir)
+                worker_rows = [p for p in report["processes"] if p["role"] == "worker"]
+                rss = sum(p["rss_bytes"] for p in worker_rows) / len(worker_rows) / 2**20
+                pss = sum(p["pss_bytes"] for p in worker_rows) / len(worker_rows) / 2**20
+                print(f"{mode:<18} {len(worker_rows):>7} {rss:15.1f} {pss:15.1f} "
+                      f"{report['total_pss_bytes'] / 2**20:14.1f} "
+                      f"{report['total_rss_bytes'] / 2**20:15.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,208 @@
+# Load test /predict and /history against a local uvicorn in each
+# serving mode and report requests/sec and p50/p99 latency.
+#
+# Run from the repository root:
+#     python benchmarks/load_test.py --concurrency 64 --seconds 10
+#
+# The client is a minimal keep-alive HTTP/1.1 implementation on asyncio
+# streams so the harness needs nothing beyond the standard library.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARTIFACTS = ["skill_model.pkl", "scaler.pkl", "difficulty_encoder.pkl"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def random_payload():
+    return {
+        "name": f"student_{random.randint(0, 19)}",
+        "marks": random.randint(0, 100),
+        "accuracy": random.randint(0, 100),
+        "time_taken": random.randint(1, 120),
+        "attempts": random.randint(1, 5),
+        "difficulty_level": random.choice(["easy", "medium", "hard"]),
+        "topic_coverage": random.randint(0, 100),
+        "consistency_score": random.randint(0, 100),
+    }
+
+
+class Connection:
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            + "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items())
+            + "\r\n"
+        ).encode()
+        self.writer.write(head + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode().partition(":")
+            if key.lower() == "content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def post_json(port, path, body):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+# /history/filter needs a session; sign in a handful of students
+def login_students(port, count=20):
+    tokens = []
+    for i in range(count):
+        credentials = {"username": f"student_{i}", "password": "load-test"}
+        post_json(port, "/student/register", credentials)
+        tokens.append(post_json(port, "/student/login", credentials)["token"])
+    return tokens
+
+
+async def drive(port, path, concurrency, seconds, tokens):
+    latencies = []
+    failures = 0
+    stop = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal failures
+        connection = Connection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < stop:
+                if path == "/predict":
+                    method, target, body = "POST", "/predict", random_payload()
+                    headers = None
+                else:
+                    method, body = "GET", None
+                    target = "/history/filter?limit=50"
+                    headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+                start = time.perf_counter()
+                status = await connection.request(method, target, body, headers)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    failures += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def start_server(mode, workdir, port, extra_env):
+    env = dict(os.environ, SERVING_MODE=mode, DB_NAME=os.path.join(workdir, f"{mode}.db"))
+    env.update(extra_env)
+    env["PYTHONPATH"] = ROOT
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=workdir,
+        env=env,
+    )
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"uvicorn did not start in {mode} mode")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="threadpool,async")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--db-workers", default=os.getenv("DB_WORKERS", "4"))
+    parser.add_argument("--inference-workers", default=os.getenv("INFERENCE_WORKERS", "2"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="skill-load-")
+    for artifact in ARTIFACTS:
+        shutil.copy(os.path.join(ROOT, artifact), workdir)
+
+    extra_env = {"DB_WORKERS": args.db_workers, "INFERENCE_WORKERS": args.inference_workers}
+
+    print(f"{'mode':<12}{'endpoint':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    try:
+        for mode in args.modes.split(","):
+            port = free_port()
+            server = start_server(mode, workdir, port, extra_env)
+            try:
+                tokens = login_students(port)
+                # /predict first so /history has rows to read
+                for path in ("/predict", "/history/filter"):
+                    result = asyncio.run(
+                        drive(port, path, args.concurrency, args.seconds, tokens)
+                    )
+                    print(f"{mode:<12}{path:<18}{result['rps']:>10.1f}"
+                          f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                          f"{result['failures']:>8}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+# Synthetic students and predictions at production scale.
+#
+# Each row first draws a skill level with the class frequencies of
+# test_data.csv, then draws every feature from the empirical distribution
+# of that column within that class. Per-column distributions (and their
+# relationship with the label) therefore match test_data.csv at any size.
+#
+# Run from the repository root:
+#     python benchmarks/synthetic_data.py --rows 1m --db /tmp/predictions_1m.db
+#     python benchmarks/synthetic_data.py --rows 10k --csv /tmp/train_10k.csv
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FEATURE_COLUMNS = [
+    "marks", "accuracy", "time_taken", "attempts",
+    "difficulty_level", "topic_coverage", "consistency_score",
+]
+
+# test_data.csv has five tests per student
+ROWS_PER_STUDENT = 5
+HISTORY_DAYS = 365
+BATCH_ROWS = 200_000
+
+
+def parse_rows(text):
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+class Profile:
+
+    def __init__(self, csv_path=os.path.join(ROOT, "test_data.csv")):
+        df = pd.read_csv(csv_path)
+        counts = df["skill_level"].value_counts()
+        self.classes = np.array(counts.index, dtype=object)
+        self.class_weights = (counts / counts.sum()).to_numpy()
+        self.values = {
+            label: {column: group[column].to_numpy() for column in FEATURE_COLUMNS}
+            for label, group in df.groupby("skill_level")
+        }
+
+    # One batch of synthetic tests as a dict of column arrays
+    def sample(self, rows, rng):
+        labels = rng.choice(len(self.classes), size=rows, p=self.class_weights)
+        columns = {column: np.empty(rows, dtype=object if column == "difficulty_level" else np.int64)
+                   for column in FEATURE_COLUMNS}
+        for code, label in enumerate(self.classes):
+            mask = labels == code
+            count = int(mask.sum())
+            for column in FEATURE_COLUMNS:
+                pool_values = self.values[label][column]
+                columns[column][mask] = pool_values[rng.integers(0, len(pool_values), count)]
+        columns["skill_level"] = self.classes[labels]
+        return columns
+
+
+# Yield (first_row_index, columns) batches. Students are interleaved over
+# time and created_at (epoch seconds) increases with the row index like
+# real inserts.
+def generate(rows, seed=42, batch_rows=BATCH_ROWS, profile=None,
+             rows_per_student=ROWS_PER_STUDENT):
+    profile = profile or Profile()
+    rng = np.random.default_rng(seed)
+    students = max(1, rows // rows_per_student)
+    start = np.datetime64("2025-01-01T00:00:00", "s").astype(np.int64)
+    seconds_per_row = HISTORY_DAYS * 86400 / max(rows, 1)
+
+    for first in range(0, rows, batch_rows):
+        count = min(batch_rows, rows - first)
+        columns = profile.sample(count, rng)
+        index = np.arange(first, first + count)
+        columns["student_id"] = rng.integers(0, students, count)
+        columns["name"] = np.char.add("student_", columns["student_id"].astype(str))
+        columns["created_at"] = start + (index * seconds_per_row).astype(np.int64)
+        yield first, columns
+
+
+def write_csv(path, rows, seed=42):
+    header = True
+    for first, columns in generate(rows, seed):
+        frame = pd.DataFrame({
+            "user_id": columns["student_id"],
+            "test_id": np.arange(first + 1, first + 1 + len(columns["name"])),
+            **{column: columns[column] for column in FEATURE_COLUMNS},
+            "skill_level": columns["skill_level"],
+        })
+        frame.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+
+# Build a predictions database with the application's schema, indexes and
+# summary tables, writing through main.insert_prediction_rows. Imports
+# main in-process, so DB_NAME and MODEL_REGISTRY_DIR are pointed at
+# scratch locations first.
+def build_database(path, rows, seed=42):
+    if os.path.exists(path):
+        os.remove(path)
+    scratch = os.path.dirname(os.path.abspath(path))
+    os.environ["DB_NAME"] = path
+    os.environ.setdefault("MODEL_REGISTRY_DIR", os.path.join(scratch, "models"))
+    sys.path.insert(0, ROOT)
+    previous_cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import main
+    finally:
+        os.chdir(previous_cwd)
+    password_hash = hashlib.sha256(b"benchmark").hexdigest()
+    students = max(1, rows // ROWS_PER_STUDENT)
+    model_version = main.registry.current().version
+
+    with main.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO students (username, password_hash, created_at) VALUES (?, ?, ?)",
+            ((f"student_{i}", password_hash, "2025-01-01 00:00:00") for i in range(students))
+        )
+
+    for _, columns in generate(rows, seed):
+        main.insert_prediction_rows(list(zip(
+            columns["name"].tolist(),
+            *(columns[column].tolist() for column in FEATURE_COLUMNS),
+            columns["skill_level"].tolist(),
+            columns["created_at"].tolist(),
+            [model_version] * len(columns["name"]),
+        )))
+
+    with main.pool.connection() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    main.pool.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10k", help="e.g. 10k, 1m, 10m")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Write a predictions database")
+    parser.add_argument("--csv", help="Write a training CSV shaped like test_data.csv")
+    args = parser.parse_args()
+
+    if not args.db and not args.csv:
+        parser.error("Give --db and/or --csv")
+
+    rows = parse_rows(args.rows)
+    if args.csv:
+        started = time.perf_counter()
+        write_csv(args.csv, rows, args.seed)
+        print(f"Wrote {rows} rows to {args.csv} in {time.perf_counter() - started:.1f} s")
+    if args.db:
+        started = time.perf_counter()
+        build_database(args.db, rows, args.seed)
+        print(f"Wrote {rows} rows to {args.db} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,420 @@
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+from db import pool
+
+# Compact storage for predictions (schema version 6).
+#
+# predictions_compact keeps one row per prediction as integers only:
+# students.id instead of the free-text name, epoch seconds instead of a
+# "%Y-%m-%d %H:%M:%S" string, and small codes for difficulty and skill
+# (1 = easy/Beginner, 2 = medium/Intermediate, 3 = hard/Advanced, the
+# same numbers progress charts plot). It is a WITHOUT ROWID table
+# clustered on (student_id, created_at, id), so one student's history is
+# contiguous on disk in time order.
+#
+# Names that predictions were made for without a registered account get
+# a students row with a NULL password_hash. Such a username cannot be
+# registered, so nobody can sign up as it and read its history.
+#
+# predictions becomes a view that decodes the compact rows back to the
+# old columns, with an INSTEAD OF INSERT trigger, so summaries, exports,
+# the online trainer and servers still running the old code keep working
+# while the hot paths in main.py read predictions_compact directly.
+#
+# New databases are created in this schema directly. Existing ones are
+# converted online with
+#     python compact_schema.py migrate
+# which copies rows in short batches while the server keeps writing, then
+# switches over in one brief transaction. The server only converts a
+# database at startup when that fits in one batch, and otherwise refuses
+# to start until the command has run.
+
+MIGRATE_BATCH_ROWS = int(os.getenv("MIGRATE_BATCH_ROWS", "20000"))
+MIGRATE_PAUSE_MS = float(os.getenv("MIGRATE_PAUSE_MS", "20"))
+
+DIFFICULTY_CODES = {"easy": 1, "medium": 2, "hard": 3}
+SKILL_CODES = {"Beginner": 1, "Intermediate": 2, "Advanced": 3}
+
+# Local "%Y-%m-%d %H:%M:%S" for an epoch column, as the API has always shown it
+LOCAL_TIME_SQL = "datetime({}, 'unixepoch', 'localtime')"
+# Epoch seconds for a local "%Y-%m-%d %H:%M:%S" string or "YYYY-MM-DD" date
+EPOCH_SQL = "CAST(strftime('%s', {}, 'utc') AS INTEGER)"
+
+COMPACT_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS difficulty_levels (
+        code INTEGER PRIMARY KEY,
+        label TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS skill_levels (
+        code INTEGER PRIMARY KEY,
+        label TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS predictions_compact (
+        student_id INTEGER NOT NULL REFERENCES students (id),
+        created_at INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        marks INTEGER,
+        accuracy INTEGER,
+        time_taken INTEGER,
+        attempts INTEGER,
+        difficulty INTEGER,
+        topic_coverage INTEGER,
+        consistency_score INTEGER,
+        skill INTEGER,
+        model_version TEXT,
+        PRIMARY KEY (student_id, created_at, id)
+    ) WITHOUT ROWID
+    """,
+    # Global history pages, label lookups and the online trainer's cursor
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_compact_id
+    ON predictions_compact (id)
+    """,
+    # One student's history newest first by id
+    """
+    CREATE INDEX IF NOT EXISTS idx_predictions_compact_student_id
+    ON predictions_compact (student_id, id)
+    """,
+]
+
+# The old predictions columns, decoded from predictions_compact p
+DECODED_COLUMNS_SQL = f"""
+    p.id AS id,
+    s.username AS name,
+    p.marks AS marks,
+    p.accuracy AS accuracy,
+    p.time_taken AS time_taken,
+    p.attempts AS attempts,
+    d.label AS difficulty_level,
+    p.topic_coverage AS topic_coverage,
+    p.consistency_score AS consistency_score,
+    k.label AS predicted_skill,
+    {LOCAL_TIME_SQL.format("p.created_at")} AS created_at,
+    p.model_version AS model_version
+"""
+
+DECODED_FROM_SQL = """
+    predictions_compact p
+    JOIN students s ON s.id = p.student_id
+    LEFT JOIN difficulty_levels d ON d.code = p.difficulty
+    LEFT JOIN skill_levels k ON k.code = p.skill
+"""
+
+# The next free prediction id: above every stored and every archived
+# one, so ids are never handed out again after archive.py has moved the
+# newest rows out of predictions_compact
+NEXT_ID_SQL = """
+    SELECT MAX(COALESCE((SELECT MAX(id) FROM predictions_compact), 0),
+               COALESCE((SELECT MAX(max_id) FROM archive_files), 0)) + 1
+"""
+
+PREDICTIONS_VIEW = f"""
+    CREATE VIEW predictions AS
+    SELECT {DECODED_COLUMNS_SQL}
+    FROM {DECODED_FROM_SQL}
+"""
+
+# Inserts in the old shape, from old servers during a rolling upgrade and
+# from ad-hoc tools
+PREDICTIONS_INSERT_TRIGGER = f"""
+    CREATE TRIGGER predictions_insert INSTEAD OF INSERT ON predictions
+    BEGIN
+        INSERT OR IGNORE INTO students (username) VALUES (NEW.name);
+        INSERT OR IGNORE INTO difficulty_levels (label)
+            SELECT NEW.difficulty_level WHERE NEW.difficulty_level IS NOT NULL;
+        INSERT OR IGNORE INTO skill_levels (label)
+            SELECT NEW.predicted_skill WHERE NEW.predicted_skill IS NOT NULL;
+        INSERT INTO predictions_compact (
+            student_id, created_at, id, marks, accuracy, time_taken, attempts,
+            difficulty, topic_coverage, consistency_score, skill, model_version
+        ) VALUES (
+            (SELECT id FROM students WHERE username = NEW.name),
+            CASE WHEN typeof(NEW.created_at) = 'integer' THEN NEW.created_at
+                 ELSE COALESCE({EPOCH_SQL.format("NEW.created_at")},
+                               CAST(strftime('%s', 'now') AS INTEGER)) END,
+            COALESCE(NEW.id, ({NEXT_ID_SQL})),
+            NEW.marks, NEW.accuracy, NEW.time_taken, NEW.attempts,
+            (SELECT code FROM difficulty_levels WHERE label = NEW.difficulty_level),
+            NEW.topic_coverage, NEW.consistency_score,
+            (SELECT code FROM skill_levels WHERE label = NEW.predicted_skill),
+            NEW.model_version
+        );
+    END
+"""
+
+
+def local_time(epoch):
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def table_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+# students.password_hash becomes nullable so names without an account can
+# have an id. Rebuilds the (small) students table once.
+def allow_unregistered_students(conn):
+    columns = conn.execute("PRAGMA table_info(students)").fetchall()
+    if not any(column[1] == "password_hash" and column[3] for column in columns):
+        return
+    conn.execute("""
+        CREATE TABLE students_nullable (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT,
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO students_nullable (id, username, password_hash, created_at)
+        SELECT id, username, password_hash, created_at FROM students
+    """)
+    conn.execute("DROP TABLE students")
+    conn.execute("ALTER TABLE students_nullable RENAME TO students")
+
+
+def create_compact_tables(conn):
+    from archive import create_archive_files
+
+    allow_unregistered_students(conn)
+    for ddl in COMPACT_TABLES:
+        conn.execute(ddl)
+    # Read by NEXT_ID_SQL
+    create_archive_files(conn)
+    conn.executemany("INSERT OR IGNORE INTO difficulty_levels (code, label) VALUES (?, ?)",
+                     [(code, label) for label, code in DIFFICULTY_CODES.items()])
+    conn.executemany("INSERT OR IGNORE INTO skill_levels (code, label) VALUES (?, ?)",
+                     [(code, label) for label, code in SKILL_CODES.items()])
+
+
+# The compact tables and the predictions view over them, for a database
+# that has no predictions table yet
+def create_compact_schema(conn):
+    create_compact_tables(conn)
+    if table_type(conn, "predictions") is None:
+        conn.execute(PREDICTIONS_VIEW)
+        conn.execute(PREDICTIONS_INSERT_TRIGGER)
+
+
+# Copy up to batch_rows rows of the old predictions table that are not in
+# predictions_compact yet, in id order. Returns the number copied.
+def copy_batch(conn, batch_rows):
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions_compact").fetchone()[0]
+    batch = f"SELECT * FROM predictions WHERE id > {int(last_id)} ORDER BY id LIMIT {int(batch_rows)}"
+
+    conn.execute(f"""
+        INSERT OR IGNORE INTO students (username)
+        SELECT DISTINCT name FROM ({batch})
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO difficulty_levels (label)
+        SELECT DISTINCT difficulty_level FROM ({batch}) WHERE difficulty_level IS NOT NULL
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO skill_levels (label)
+        SELECT DISTINCT predicted_skill FROM ({batch}) WHERE predicted_skill IS NOT NULL
+    """)
+    cursor = conn.execute(f"""
+        INSERT INTO predictions_compact (
+            student_id, created_at, id, marks, accuracy, time_taken, attempts,
+            difficulty, topic_coverage, consistency_score, skill, model_version
+        )
+        SELECT s.id, COALESCE({EPOCH_SQL.format("b.created_at")}, 0), b.id, b.marks, b.accuracy,
+               b.time_taken, b.attempts, d.code, b.topic_coverage, b.consistency_score,
+               k.code, b.model_version
+        FROM ({batch}) b
+        JOIN students s ON s.username = b.name
+        LEFT JOIN difficulty_levels d ON d.label = b.difficulty_level
+        LEFT JOIN skill_levels k ON k.label = b.predicted_skill
+    """)
+    return cursor.rowcount
+
+
+# Replace the old table with the decoding view. Call with the write lock
+# held, after the last copy_batch.
+def switch_to_compact(conn):
+    conn.execute("DROP TABLE predictions")
+    conn.execute(PREDICTIONS_VIEW)
+    conn.execute(PREDICTIONS_INSERT_TRIGGER)
+
+
+# Migration 6: the whole conversion in the caller's transaction, which
+# blocks writers while it runs, so only for tables of up to one batch
+def compact_predictions(conn):
+    if table_type(conn, "predictions") != "table":
+        create_compact_schema(conn)
+        return
+    rows = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM predictions "
+                        f"LIMIT {MIGRATE_BATCH_ROWS + 1})").fetchone()[0]
+    if rows > MIGRATE_BATCH_ROWS:
+        raise RuntimeError(
+            f"predictions has more than {MIGRATE_BATCH_ROWS} rows in the old schema; "
+            "convert it with `python compact_schema.py migrate` before starting the server"
+        )
+    create_compact_tables(conn)
+    while copy_batch(conn, MIGRATE_BATCH_ROWS):
+        pass
+    switch_to_compact(conn)
+
+
+def _in_immediate_transaction(conn, fn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn(conn)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Online conversion: each batch holds the write lock only briefly, and
+# the final switch copies whatever arrived meanwhile. Safe to interrupt
+# and re-run. Returns the number of rows copied.
+def migrate_online(batch_rows=MIGRATE_BATCH_ROWS, pause_ms=MIGRATE_PAUSE_MS, progress=None):
+    from migrations import COMPACT_SCHEMA_VERSION, get_schema_version, migrate
+
+    migrate(target_pool=pool, target_version=COMPACT_SCHEMA_VERSION - 1)
+    copied = 0
+    with pool.connection() as conn:
+        if get_schema_version(conn) >= COMPACT_SCHEMA_VERSION:
+            return copied
+        _in_immediate_transaction(conn, create_compact_tables)
+
+        while True:
+            rows = _in_immediate_transaction(conn, lambda c: copy_batch(c, batch_rows))
+            copied += rows
+            if progress is not None:
+                progress(copied)
+            if rows < batch_rows:
+                break
+            time.sleep(pause_ms / 1000)
+
+        def finish(c):
+            nonlocal copied
+            while True:
+                rows = copy_batch(c, batch_rows)
+                copied += rows
+                if not rows:
+                    break
+            switch_to_compact(c)
+            c.execute(f"PRAGMA user_version = {COMPACT_SCHEMA_VERSION}")
+
+        _in_immediate_transaction(conn, finish)
+        conn.execute("ANALYZE")
+    return copied
+
+
+# Label <-> integer id tables (students, difficulty_levels, skill_levels).
+# Writers resolve labels inside their transaction, creating missing rows,
+# and remember the ids only after the commit, so a rolled-back insert
+# never leaves a cached id behind.
+class CodeTable:
+
+    def __init__(self, table, label_column, code_column, known=None):
+        self.table = table
+        self.label_column = label_column
+        self.code_column = code_column
+        self._codes = dict(known or {})
+        self._labels = {code: label for label, code in self._codes.items()}
+        self._lock = threading.Lock()
+
+    def cached(self, label):
+        return self._codes.get(label)
+
+    # Code for a label without creating it, or None
+    def lookup(self, conn, label):
+        code = self._codes.get(label)
+        if code is None:
+            row = conn.execute(
+                f"SELECT {self.code_column} FROM {self.table} WHERE {self.label_column} = ?",
+                (label,)
+            ).fetchone()
+            if row is not None:
+                code = row[0]
+                self.remember({label: code})
+        return code
+
+    # Codes for every label, creating missing rows. Call inside a write
+    # transaction and pass the result to remember() after it commits.
+    def resolve(self, conn, labels):
+        codes = {}
+        missing = []
+        for label in set(labels):
+            if label is None:
+                codes[None] = None
+                continue
+            code = self._codes.get(label)
+            if code is None:
+                missing.append(label)
+            else:
+                codes[label] = code
+        if missing:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} ({self.label_column}) VALUES (?)",
+                [(label,) for label in missing]
+            )
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                codes.update(conn.execute(
+                    f"SELECT {self.label_column}, {self.code_column} FROM {self.table} "
+                    f"WHERE {self.label_column} IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return codes
+
+    def remember(self, codes):
+        with self._lock:
+            for label, code in codes.items():
+                if label is not None:
+                    self._codes[label] = code
+                    self._labels[code] = label
+
+    # Label for a code read back from predictions_compact
+    def label(self, conn, code):
+        if code is None:
+            return None
+        label = self._labels.get(code)
+        if label is None:
+            row = conn.execute(
+                f"SELECT {self.label_column} FROM {self.table} WHERE {self.code_column} = ?",
+                (code,)
+            ).fetchone()
+            if row is not None:
+                label = row[0]
+                self.remember({label: code})
+        return label
+
+
+
+# Command line: python compact_schema.py migrate [--batch-rows N] [--vacuum]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert predictions to the compact schema")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate")
+    migrate_parser.add_argument("--batch-rows", type=int, default=MIGRATE_BATCH_ROWS)
+    migrate_parser.add_argument("--pause-ms", type=float, default=MIGRATE_PAUSE_MS)
+    migrate_parser.add_argument("--vacuum", action="store_true",
+                                help="Return the old table's pages to the OS afterwards "
+                                     "(rewrites the file and blocks writers while it runs)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    copied = migrate_online(args.batch_rows, args.pause_ms,
+                            progress=lambda n: print(f"\rCopied {n} rows", end="", flush=True))
+    print(f"\rCopied {copied} rows in {time.perf_counter() - started:.1f} s; "
+          f"predictions is now the compact schema")
+    if args.vacuum:
+        with pool.connection() as conn:
+            conn.execute("VACUUM")
+        print("Vacuumed")
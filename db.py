@@ -0,0 +1,121 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from metrics import CONNECTIONS_OPENED
+
+load_dotenv()
+
+DB_NAME = os.getenv("DB_NAME", "ogpredictions.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL is durable in WAL mode except for the last commits on power loss
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_STATEMENT_CACHE_SIZE = 256
+
+
+# Open a connection tuned for concurrent readers and writers
+def open_connection(path: str = DB_NAME) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    CONNECTIONS_OPENED.inc()
+    return conn
+
+
+# Every connection of a pool stayed busy for the whole busy timeout
+class PoolExhausted(RuntimeError):
+    pass
+
+
+# Bounded pool of long-lived connections shared by all request threads.
+# Reusing connections keeps the parsed schema and prepared statements warm.
+class ConnectionPool:
+
+    def __init__(self, path: str = DB_NAME, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return open_connection(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise PoolExhausted(
+                f"All {self.size} connections to {self.path} stayed busy for "
+                f"{DB_BUSY_TIMEOUT_MS} ms"
+            ) from None
+
+    def _release(self, conn: sqlite3.Connection):
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    # Commit on success, roll back on error
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    # Like transaction(), but takes the write lock up front so values read
+    # inside it (e.g. the next id) cannot change before the writes commit
+    @contextmanager
+    def write_transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                yield conn
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+pool = ConnectionPool()
@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from compact_schema import DECODED_COLUMNS_SQL, DECODED_FROM_SQL, EPOCH_SQL
+from db import open_connection, pool
+
+# Streaming exports of the predictions table. Rows are pulled from SQLite
+# with fetchmany and encoded one batch at a time, so memory stays bounded
+# by EXPORT_BATCH_SIZE no matter how large the table is. Rows are decoded
+# from the compact schema to the columns below.
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "marks",
+    "accuracy",
+    "time_taken",
+    "attempts",
+    "difficulty_level",
+    "topic_coverage",
+    "consistency_score",
+    "predicted_skill",
+    "created_at",
+    "model_version",
+]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+# Build the WHERE clause for the name and inclusive date range filters.
+# Raises ValueError for dates that are not YYYY-MM-DD.
+def build_filters(name: str = None, start_date: str = None, end_date: str = None):
+    conditions = []
+    params = []
+
+    if name:
+        conditions.append("p.student_id = (SELECT id FROM students WHERE username = ?)")
+        params.append(name)
+
+    # Dates are local days; rows store epoch seconds
+    if start_date:
+        conditions.append(f"p.created_at >= {EPOCH_SQL.format('?')}")
+        params.append(date.fromisoformat(start_date).isoformat())
+
+    if end_date:
+        conditions.append(f"p.created_at < {EPOCH_SQL.format('?')}")
+        params.append((date.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+# The same inclusive date range as epoch seconds, start <= created_at <
+# end, with None for open ends. Raises ValueError like build_filters.
+def epoch_range(start_date: str = None, end_date: str = None):
+    start = end = None
+    if start_date:
+        start = int(datetime.combine(date.fromisoformat(start_date), datetime.min.time())
+                    .timestamp())
+    if end_date:
+        end = int(datetime.combine(date.fromisoformat(end_date) + timedelta(days=1),
+                                   datetime.min.time()).timestamp())
+    return start, end
+
+
+# Yield lists of row tuples from the database at path (default: the
+# application database). Exports use their own connection so a slow
+# download never holds one of the pooled request connections.
+def iter_row_batches(where: str, params, batch_size: int = EXPORT_BATCH_SIZE, path: str = None):
+    conn = open_connection(path or pool.path)
+    try:
+        cursor = conn.execute(f"""
+            SELECT {DECODED_COLUMNS_SQL}
+            FROM {DECODED_FROM_SQL}
+            {where}
+            ORDER BY p.id
+        """, params)
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows
+        )
+
+
+# Write-only file object that hands back whatever Parquet bytes were
+# written since the last drain
+class _ChunkSink(io.RawIOBase):
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_parquet(batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("marks", pa.int64()),
+        ("accuracy", pa.int64()),
+        ("time_taken", pa.int64()),
+        ("attempts", pa.int64()),
+        ("difficulty_level", pa.string()),
+        ("topic_coverage", pa.int64()),
+        ("consistency_score", pa.int64()),
+        ("predicted_skill", pa.string()),
+        ("created_at", pa.string()),
+        ("model_version", pa.string()),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        # One row group per fetched batch
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+# Encode row batches, e.g. from a storage backend's export_batches()
+def stream_predictions(export_format: str, batches):
+    if export_format == "csv":
+        return stream_csv(batches)
+    if export_format == "ndjson":
+        return stream_ndjson(batches)
+    return stream_parquet(batches)
@@ -0,0 +1,355 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from inference import FEATURE_COLUMNS
+
+# RandomForestClassifier compiled to flat node arrays.
+#
+# Every tree's nodes are renumbered so that the two children of a node are
+# adjacent (right == left + 1) and concatenated into one set of arrays:
+# feature, threshold, left, value, plus roots holding each tree's first
+# node. Leaves point at themselves with an infinite threshold, so a batch
+# is evaluated for all trees at once by stepping every (row, tree) cursor
+# max_depth times:
+#
+#     node = left[node] + (x[feature[node]] > threshold[node])
+#
+# Class probabilities are then averaged over trees in tree order, exactly
+# as sklearn does, so predictions match rf_model.predict bit for bit.
+# Batches are processed in chunks that keep the cursors cache-resident.
+#
+# Larger batches of small trees (at most 64 leaves each) skip the traversal
+# (bitvector evaluation, as in QuickScorer). Leaves are numbered left to
+# right in each tree, and a split that sends a row right rules out the
+# leaves of its left subtree. All splits are evaluated for a chunk of rows
+# at once, each tree's ruled-out leaf bits are OR-ed together, and the
+# row's leaf is the lowest bit left: the count of trailing ones plus one.
+# Per row this is one comparison per split plus a few integer operations
+# per tree, instead of max_depth dependent gathers per tree.
+#
+# Arrays are stored as plain .npy files and opened with mmap_mode="r", so
+# every uvicorn worker on a host maps the same page-cache copy.
+
+ARRAY_NAMES = ("feature", "threshold", "left", "value", "roots")
+METADATA_FILE = "forest.json"
+CHUNK_ROWS = 2048
+# Bitvector evaluation from this batch size up; the traversal has less
+# fixed cost for a few rows
+BITVECTOR_MIN_ROWS = 16
+# Rows per chunk keep the (splits, rows) comparisons about this size
+BITVECTOR_CHUNK_BYTES = 512 << 10
+# Trees whose split counts differ by at most this factor share a bucket
+BUCKET_PADDING = 1.25
+# Bitvectors compare every split and the traversal takes max_depth steps
+# per tree; past this many splits per tree and step the traversal wins
+BITVECTOR_SPLITS_PER_STEP = 2
+WORD_TYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+# sklearn compares float32 inputs with float64 thresholds. Rounding each
+# threshold down to the nearest float32 gives the same decisions with a
+# float32 comparison.
+def float32_thresholds(thresholds):
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+# New node order for one tree with each node's children adjacent
+def adjacent_children_order(children_left, children_right):
+    order = [0]
+    new_left = {}
+    position = 0
+    while position < len(order):
+        node = order[position]
+        if children_left[node] != -1:
+            new_left[node] = len(order)
+            order.append(children_left[node])
+            order.append(children_right[node])
+        position += 1
+    return np.asarray(order), new_left
+
+
+# In-order leaf range [first, end) under every node of one tree, keyed by
+# node. Leaves are the nodes with an infinite threshold.
+def leaf_ranges(left, threshold, root):
+    ranges = {}
+
+    def visit(node, first):
+        if np.isinf(threshold[node]):
+            end = first + 1
+        else:
+            middle = visit(left[node], first)
+            end = visit(left[node] + 1, middle)
+        ranges[node] = (first, end)
+        return end
+
+    visit(root, 0)
+    return ranges
+
+
+class CompiledForest:
+
+    def __init__(self, arrays, classes, difficulty_classes, max_depth, n_features):
+        # Plain ndarray views, so memory-mapped arrays skip np.memmap's
+        # per-operation wrapping
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.left = np.asarray(arrays["left"])
+        self.value = np.asarray(arrays["value"])
+        self.roots = np.asarray(arrays["roots"])
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.classes = np.asarray(classes)
+        self.class_labels = [str(label) for label in self.classes]
+        self.difficulty_classes = [str(level) for level in difficulty_classes]
+        self.difficulty_lookup = {
+            level: float(code) for code, level in enumerate(self.difficulty_classes)
+        }
+        self._local = threading.local()
+        self._bitvector = None
+        self._bitvector_lock = threading.Lock()
+
+    @classmethod
+    def from_sklearn(cls, forest, difficulty_encoder):
+        features, thresholds, lefts, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            order, new_left = adjacent_children_order(tree.children_left, tree.children_right)
+            is_leaf = tree.children_left[order] == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature[order]).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+            lefts.append(np.asarray([
+                offset + new_left.get(node, position) for position, node in enumerate(order)
+            ], dtype=np.int32))
+
+            # Per-node class probabilities, as DecisionTreeClassifier.predict_proba
+            value = tree.value[order, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            values.append(value / totals)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += len(order)
+
+        arrays = {
+            "feature": np.concatenate(features),
+            "threshold": float32_thresholds(np.concatenate(thresholds)),
+            "left": np.concatenate(lefts),
+            "value": np.concatenate(values),
+            "roots": np.asarray(roots, dtype=np.int32),
+        }
+        return cls(arrays, forest.classes_, difficulty_encoder.classes_,
+                   max_depth, forest.n_features_in_)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, METADATA_FILE), "w") as f:
+            json.dump({
+                "classes": self.class_labels,
+                "difficulty_classes": self.difficulty_classes,
+                "max_depth": self.max_depth,
+                "n_features": self.n_features,
+                "n_trees": int(len(self.roots)),
+                "n_nodes": int(len(self.feature)),
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"),
+                          mmap_mode="r" if mmap else None, allow_pickle=False)
+            for name in ARRAY_NAMES
+        }
+        return cls(arrays, metadata["classes"], metadata["difficulty_classes"],
+                   metadata["max_depth"], metadata["n_features"])
+
+    @staticmethod
+    def artifact_paths(directory):
+        return [os.path.join(directory, METADATA_FILE)] + [
+            os.path.join(directory, f"{name}.npy") for name in ARRAY_NAMES
+        ]
+
+    # Mean class probabilities over all trees for a (rows, features) matrix
+    def predict_proba(self, features):
+        features = np.asarray(features, dtype=np.float32)
+        rows = features.shape[0]
+        proba = np.empty((rows, self.value.shape[1]), dtype=np.float64)
+        tables = self._bitvector_tables() if rows >= BITVECTOR_MIN_ROWS else None
+        if tables is not None:
+            columns = features.T
+            chunk_rows = tables["chunk_rows"]
+            for start in range(0, rows, chunk_rows):
+                end = start + chunk_rows
+                self._chunk_proba_bitvector(tables, columns[:, start:end], proba[start:end])
+            return proba
+        for start in range(0, rows, CHUNK_ROWS):
+            proba[start:start + CHUNK_ROWS] = self._chunk_proba(features[start:start + CHUNK_ROWS])
+        return proba
+
+    # Split and leaf tables of the bitvector evaluation, built on first
+    # use; None when a tree has more than 64 leaves or the traversal is
+    # cheaper
+    def _bitvector_tables(self):
+        if self._bitvector is None:
+            with self._bitvector_lock:
+                if self._bitvector is None:
+                    self._bitvector = self._build_bitvector_tables() or False
+        return self._bitvector or None
+
+    def _build_bitvector_tables(self):
+        n_trees = len(self.roots)
+        ends = list(self.roots[1:]) + [len(self.feature)]
+        trees = []
+        for root, end in zip(self.roots, ends):
+            ranges = leaf_ranges(self.left, self.threshold, int(root))
+            splits = [node for node in range(int(root), int(end))
+                      if not np.isinf(self.threshold[node])]
+            leaves = sorted((ranges[node][0], node) for node in ranges
+                            if np.isinf(self.threshold[node]))
+            # A split's mask is the leaves of its left subtree
+            masks = []
+            for node in splits:
+                first, stop = ranges[int(self.left[node])]
+                masks.append((1 << stop) - (1 << first))
+            trees.append((splits, masks, [node for _, node in leaves]))
+
+        max_leaves = max(len(leaves) for _, _, leaves in trees)
+        if max_leaves > 64:
+            return None
+        word = next(kind for kind in WORD_TYPES if np.iinfo(kind).bits >= max_leaves)
+
+        # Trees bucketed by split count, padded to the largest count in the
+        # bucket with splits that never fire. Within a bucket, split j of
+        # every tree is one contiguous block of rows.
+        split_counts = np.array([max(1, len(splits)) for splits, _, _ in trees])
+        order = np.argsort(split_counts, kind="stable")
+        buckets = []
+        for tree in order:
+            if not buckets or split_counts[tree] > split_counts[buckets[-1][0]] * BUCKET_PADDING:
+                buckets.append([])
+            buckets[-1].append(tree)
+        features, thresholds, masks, groups = [], [], [], []
+        for bucket in buckets:
+            count = int(split_counts[bucket[-1]])
+            groups.append((len(features), count, len(bucket)))
+            for j in range(count):
+                for tree in bucket:
+                    splits, tree_masks, _ = trees[tree]
+                    if j < len(splits):
+                        features.append(int(self.feature[splits[j]]))
+                        thresholds.append(self.threshold[splits[j]])
+                        masks.append(tree_masks[j])
+                    else:
+                        features.append(0)
+                        thresholds.append(np.inf)
+                        masks.append(0)
+
+        if len(masks) > BITVECTOR_SPLITS_PER_STEP * n_trees * self.max_depth:
+            return None
+
+        # Leaf class probabilities by (tree, trailing ones + 1), per class
+        stride = max_leaves + 1
+        leaf_values = np.zeros((self.value.shape[1], n_trees * stride), dtype=np.float64)
+        for tree, (_, _, leaves) in enumerate(trees):
+            leaf_values[:, tree * stride + 1:tree * stride + 1 + len(leaves)] = self.value[leaves].T
+
+        return {
+            "feature": np.asarray(features, dtype=np.intp),
+            "threshold": np.asarray(thresholds, dtype=np.float32)[:, None],
+            "mask": np.asarray(masks, dtype=word)[:, None],
+            "groups": groups,
+            "grouped_trees": np.argsort(order),
+            "word": word,
+            "tree_offsets": (np.arange(n_trees, dtype=np.intp) * stride)[:, None],
+            "leaf_values": leaf_values,
+            "chunk_rows": max(BITVECTOR_MIN_ROWS, BITVECTOR_CHUNK_BYTES // len(masks)),
+        }
+
+    # Fills proba for a (features, rows) chunk
+    def _chunk_proba_bitvector(self, tables, columns, proba):
+        columns = np.ascontiguousarray(columns)
+        rows = columns.shape[1]
+        ruled_out = np.take(columns, tables["feature"], axis=0) > tables["threshold"]
+        ruled_out = ruled_out * tables["mask"]
+
+        # Per tree, in bucket order: OR of its splits' masks
+        grouped = np.empty((len(self.roots), rows), dtype=tables["word"])
+        tree = 0
+        for first_split, count, members in tables["groups"]:
+            block = ruled_out[first_split:first_split + count * members].reshape(count, members, rows)
+            np.bitwise_or.reduce(block, axis=0, out=grouped[tree:tree + members])
+            tree += members
+        ruled_out = grouped[tables["grouped_trees"]]
+
+        leaves = np.bitwise_count(ruled_out ^ (ruled_out + 1)) + tables["tree_offsets"]
+        # Summing over the leading tree axis adds trees in order, like sklearn
+        for label, values in enumerate(tables["leaf_values"]):
+            proba[:, label] = np.take(values, leaves).sum(axis=0)
+        proba /= len(self.roots)
+
+    def _chunk_proba(self, features):
+        flat = np.ascontiguousarray(features).ravel()
+        row_offsets = (np.arange(features.shape[0], dtype=np.int32) * self.n_features)[:, None]
+
+        # One cursor per (tree, row); np.take gathers faster than fancy indexing
+        nodes = np.repeat(self.roots[:, None], features.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_right = np.take(flat, np.take(self.feature, nodes) + row_offsets.T) > np.take(self.threshold, nodes)
+            nodes = np.take(self.left, nodes)
+            nodes += go_right
+
+        # Reducing over the leading tree axis adds trees one at a time, in
+        # order, like sklearn's accumulation
+        proba = np.take(self.value, nodes, axis=0).sum(axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict_indexes(self, features):
+        return self.predict_proba(features).argmax(axis=1)
+
+    def predict_matrix(self, features):
+        return self.classes[self.predict_indexes(features)]
+
+    def predict_one(self, marks, accuracy, time_taken, attempts,
+                    difficulty_level, topic_coverage, consistency_score):
+        local = self._local
+        if not hasattr(local, "row"):
+            local.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float64)
+        local.row[0] = (
+            marks,
+            accuracy,
+            time_taken,
+            attempts,
+            self.difficulty_lookup[difficulty_level],
+            topic_coverage,
+            consistency_score,
+        )
+        return self.class_labels[int(self.predict_indexes(local.row)[0])]
+
+    def predict_records(self, records):
+        features = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float64)
+        for i, data in enumerate(records):
+            features[i] = (
+                data.marks,
+                data.accuracy,
+                data.time_taken,
+                data.attempts,
+                self.difficulty_lookup[data.difficulty_level],
+                data.topic_coverage,
+                data.consistency_score,
+            )
+        return [self.class_labels[i] for i in self.predict_indexes(features)]
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Feature order the scaler and model were trained with
+FEATURE_COLUMNS = [
+    "marks",
+    "accuracy",
+    "time_taken",
+    "attempts",
+    "difficulty_level",
+    "topic_coverage",
+    "consistency_score",
+]
+
+
+# Logistic regression with the scaler folded into its weights.
+# predict(scale(x)) == argmax(x @ W + b), so a request is one small matmul.
+class FusedLogisticModel:
+
+    def __init__(self, weights, bias, classes, difficulty_classes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = np.ascontiguousarray(bias, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.class_labels = [str(label) for label in self.classes]
+        self.difficulty_classes = [str(level) for level in difficulty_classes]
+        self.difficulty_lookup = {
+            level: float(code) for code, level in enumerate(self.difficulty_classes)
+        }
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, model, scaler, difficulty_encoder):
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = np.asarray(model.intercept_, dtype=np.float64)
+
+        mean = getattr(scaler, "mean_", None)
+        scale = getattr(scaler, "scale_", None)
+        mean = np.zeros(coef.shape[1]) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(coef.shape[1]) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        # (x - mean) / scale @ coef.T + intercept
+        #   == x @ (coef / scale).T + (intercept - coef @ (mean / scale))
+        weights = (coef / scale).T
+        bias = intercept - coef @ (mean / scale)
+
+        # Binary models expose a single decision column; expand it so argmax works
+        if weights.shape[1] == 1:
+            weights = np.hstack([-weights, weights])
+            bias = np.concatenate([-bias, bias])
+
+        return cls(weights, bias, model.classes_, difficulty_encoder.classes_)
+
+    # Compact, pickle-free artifact: loading it needs only numpy
+    def save_npz(self, path):
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            classes=np.asarray(self.class_labels),
+            difficulty_classes=np.asarray(self.difficulty_classes),
+        )
+
+    @classmethod
+    def load_npz(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["weights"],
+                data["bias"],
+                data["classes"],
+                data["difficulty_classes"],
+            )
+
+    # Per-thread scratch buffers so concurrent requests never share memory
+    def _buffers(self):
+        local = self._local
+        if not hasattr(local, "row"):
+            local.row = np.empty((1, self.weights.shape[0]), dtype=np.float64)
+            local.scores = np.empty((1, self.weights.shape[1]), dtype=np.float64)
+        return local.row, local.scores
+
+    def predict_one(self, marks, accuracy, time_taken, attempts,
+                    difficulty_level, topic_coverage, consistency_score):
+        row, scores = self._buffers()
+        row[0] = (
+            marks,
+            accuracy,
+            time_taken,
+            attempts,
+            self.difficulty_lookup[difficulty_level],
+            topic_coverage,
+            consistency_score,
+        )
+        np.matmul(row, self.weights, out=scores)
+        scores += self.bias
+        return self.class_labels[int(scores[0].argmax())]
+
+    def predict_matrix(self, features):
+        return self.classes[self.predict_indexes(features)]
+
+    def predict_records(self, records):
+        features = np.empty((len(records), self.weights.shape[0]), dtype=np.float64)
+        for i, data in enumerate(records):
+            features[i] = (
+                data.marks,
+                data.accuracy,
+                data.time_taken,
+                data.attempts,
+                self.difficulty_lookup[data.difficulty_level],
+                data.topic_coverage,
+                data.consistency_score,
+            )
+        return [self.class_labels[i] for i in self.predict_indexes(features)]
+
+    def predict_indexes(self, features):
+        scores = features @ self.weights
+        scores += self.bias
+        return scores.argmax(axis=1)
+
+
+# Hash of the artifact files a model was loaded from, so anything keyed
+# on it is invalidated automatically when different files are loaded
+def artifact_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# Thread-safe LRU cache of predictions keyed by feature vector
+class PredictionCache:
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
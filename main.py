@@ -1,13 +1,33 @@
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import Literal
-import joblib
-import pandas as pd
+import asyncio
+import json
 import sqlite3
 from datetime import datetime
 import hashlib
 import os
+import time
 from dotenv import load_dotenv
+from db import PoolExhausted, pool
+from migrations import migrate
+import storage
+import export
+from inference import PredictionCache
+import model_registry
+from model_registry import ModelRegistry
+import serving
+from serving import run_db, run_inference
+from write_behind import PERSISTENCE_MODE, WriteBehindWriter
+from auth import issue_link_token, issue_token, optional_session, require_admin, require_link, require_session, sessions
+import metrics
+from metrics import db_operation, stage
+import process_memory
+import profiler
+import progress
 
 load_dotenv()
 
@@ -19,55 +39,50 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-DB_NAME = "ogpredictions.db"
-
-def create_table():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            marks INTEGER,
-            accuracy INTEGER,
-            time_taken INTEGER,
-            attempts INTEGER,
-            difficulty_level TEXT,
-            topic_coverage INTEGER,
-            consistency_score INTEGER,
-            predicted_skill TEXT,
-            created_at TEXT
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-
-
 def create_students_table():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TEXT
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    with pool.transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                created_at TEXT
+            )
+        """)
+
+
+# Warm the request path before reporting ready; on shutdown drain queued
+# writes, then release worker threads and database connections
+@asynccontextmanager
+async def lifespan(app):
+    await warm_up()
+    yield
+    if writer is not None:
+        await run_in_threadpool(writer.stop)
+    serving.shutdown()
+    backend.close()
+    pool.close()
 
 
 # Create FastAPI app
-app = FastAPI(title="AI Skill Predictor API")
-# sqlite database setup
-create_table()
+app = FastAPI(title="AI Skill Predictor API", lifespan=lifespan)
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Every pooled connection busy past DB_BUSY_TIMEOUT_MS: tell the client to
+# retry instead of failing with an opaque 500
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted(request: Request, exc: PoolExhausted):
+    return JSONResponse({"error": "Database busy, try again shortly"}, status_code=503,
+                        headers={"Retry-After": "1"})
+
 # students table setup
 create_students_table()
+# predictions schema: created directly on a new database, otherwise
+# versioned schema changes (indexes, ...)
+migrate()
+# where predictions are stored (STORAGE_BACKEND)
+backend = storage.open_backend(pool)
 
 # Admin authentication schema
 class AdminAuth(BaseModel):
@@ -78,202 +93,118 @@ class AdminAuth(BaseModel):
 @app.post("/admin/login")
 def admin_login(data: AdminAuth):
     if data.username == ADMIN_USERNAME and data.password == ADMIN_PASSWORD:
-        return {"message": "Admin login successful"}
+        token, expires_at = issue_token(data.username, "admin")
+        return {
+            "message": "Admin login successful",
+            "token": token,
+            "expires_at": expires_at
+        }
     return {"error": "Invalid admin credentials"}
 
+# Function to pick whose data a session may read: students only ever see
+# their own, admins may ask for any student by name
+def session_student(identity, name: str = None):
+    if identity["role"] == "admin":
+        return name
+    return identity["sub"]
+
 # Function to save prediction to database
-def save_prediction(data, predicted_skill):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO predictions (
-            name,
-            marks,
-            accuracy,
-            time_taken,
-            attempts,
-            difficulty_level,
-            topic_coverage,
-            consistency_score,
-            predicted_skill,
-            created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        data.name,
-        data.marks,
-        data.accuracy,
-        data.time_taken,
-        data.attempts,
-        data.difficulty_level,
-        data.topic_coverage,
-        data.consistency_score,
-        predicted_skill,
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ))
+def save_prediction(data, predicted_skill, model_version=None):
+    save_predictions([data], [predicted_skill], model_version)
+
+# Function to turn validated inputs and their predictions into table rows.
+# created_at is epoch seconds.
+def prediction_rows(records, predicted_skills, model_version=None):
+    created_at = int(time.time())
+
+    return [
+        (
+            data.name,
+            data.marks,
+            data.accuracy,
+            data.time_taken,
+            data.attempts,
+            data.difficulty_level,
+            data.topic_coverage,
+            data.consistency_score,
+            str(predicted_skill),
+            created_at,
+            model_version
+        )
+        for data, predicted_skill in zip(records, predicted_skills)
+    ]
+
+# Function to save a batch of predictions in a single transaction
+def save_predictions(records, predicted_skills, model_version=None):
+    insert_prediction_rows(prediction_rows(records, predicted_skills, model_version))
+
+# Function to insert prediction rows through the storage backend, which
+# keeps the analytics summary tables in step in the same transaction
+@db_operation("insert_predictions")
+def insert_prediction_rows(rows):
+    try:
+        backend.insert_predictions(rows)
+    except storage.PartialInsertError as error:
+        predictions_written.inc(len(rows) - len(error.rows))
+        raise
+    predictions_written.inc(len(rows))
+
+predictions_written = metrics.ROWS_WRITTEN.labels("predictions")
+
+# Background group-commit writer, only used in write-behind mode
+writer = None
+if PERSISTENCE_MODE == "write_behind":
+    writer = WriteBehindWriter(insert_prediction_rows)
+    writer.start()
+
+# Function to persist predictions from a request handler. In write-behind
+# mode the rows are queued and the request returns immediately; when the
+# queue is full it falls back to a synchronous commit.
+@stage("persist")
+async def persist_predictions(records, predicted_skills, model_version=None):
+    rows = prediction_rows(records, predicted_skills, model_version)
+    if writer is not None and writer.offer(rows):
+        return
+    await run_db(insert_prediction_rows, rows)
 
-    conn.commit()
-    conn.close()
 
 # Endpoint to get prediction history
-def get_history(limit: int = 50):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            id,
-            name,
-            marks,
-            accuracy,
-            time_taken,
-            attempts,
-            difficulty_level,
-            topic_coverage,
-            consistency_score,
-            predicted_skill,
-            created_at
-        FROM predictions
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    history = []
-    for row in rows:
-        history.append({
-            "id": row[0],
-            "name": row[1],
-            "marks": row[2],
-            "accuracy": row[3],
-            "time_taken": row[4],
-            "attempts": row[5],
-            "difficulty_level": row[6],
-            "topic_coverage": row[7],
-            "consistency_score": row[8],
-            "predicted_skill": row[9],
-            "created_at": row[10],
-        })
-
-    return history
+def get_history(limit: int = 50, before_id: int = None, after_id: int = None):
+    return get_history_filtered(None, limit, before_id, after_id)
 
 # Endpoint to get prediction history filtered by name
-def get_history_filtered(name: str = None, limit: int = 50):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    if name:
-        cursor.execute("""
-            SELECT
-                id,
-                name,
-                marks,
-                accuracy,
-                time_taken,
-                attempts,
-                difficulty_level,
-                topic_coverage,
-                consistency_score,
-                predicted_skill,
-                created_at
-            FROM predictions
-            WHERE name = ?
-            ORDER BY id DESC
-            LIMIT ?
-        """, (name, limit))
-    else:
-        cursor.execute("""
-            SELECT
-                id,
-                name,
-                marks,
-                accuracy,
-                time_taken,
-                attempts,
-                difficulty_level,
-                topic_coverage,
-                consistency_score,
-                predicted_skill,
-                created_at
-            FROM predictions
-            ORDER BY id DESC
-            LIMIT ?
-        """, (limit,))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    history = []
-    for row in rows:
-        history.append({
-            "id": row[0],
-            "name": row[1],
-            "marks": row[2],
-            "accuracy": row[3],
-            "time_taken": row[4],
-            "attempts": row[5],
-            "difficulty_level": row[6],
-            "topic_coverage": row[7],
-            "consistency_score": row[8],
-            "predicted_skill": row[9],
-            "created_at": row[10],
-        })
-
-    return history
+@db_operation("get_history_filtered")
+def get_history_filtered(name: str = None, limit: int = 50,
+                         before_id: int = None, after_id: int = None):
+    return backend.history(name, limit, before_id, after_id)
 
 # Endpoint to get user progress over time
-def get_user_progress(name: str):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            created_at,
-            predicted_skill
-        FROM predictions
-        WHERE name = ?
-        ORDER BY created_at ASC
-    """, (name,))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    progress = []
-    for row in rows:
-        progress.append({
-            "date": row[0],
-            "skill": row[1]
-        })
-
-    return progress
+@db_operation("get_user_progress")
+def get_user_progress(name: str, limit: int = None,
+                      before_id: int = None, after_id: int = None):
+    return backend.user_progress(name, limit, before_id, after_id)
 
 
 # Endpoint to get skill distribution for visualization
+@db_operation("get_skill_distribution")
 def get_skill_distribution():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT predicted_skill, COUNT(*) 
-        FROM predictions
-        GROUP BY predicted_skill
-    """)
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    distribution = {}
-    for skill, count in rows:
-        distribution[skill] = count
-
-    return distribution
-
-# Load ML pipeline
-model = joblib.load("skill_model.pkl")
-scaler = joblib.load("scaler.pkl")
-difficulty_encoder = joblib.load("difficulty_encoder.pkl")
+    return backend.skill_counts()
+
+# Load ML pipeline from the versioned model registry. The scaler is folded
+# into the model at load time so requests skip pandas and sklearn.
+# MODEL_TYPE=forest serves the version's compiled RandomForest instead.
+# Workers forked by serve.py adopt the registry their parent preloaded.
+if model_registry.preloaded is not None:
+    registry = model_registry.preloaded
+else:
+    registry = ModelRegistry()
+    registry.bootstrap(*model_registry.BOOTSTRAP_ARTIFACTS)
+
+# Repeated submissions of the same inputs skip the model entirely.
+# Keys include the model fingerprint, so activating another version never
+# serves a stale prediction.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
 
 # Student authentication schema
 class StudentAuth(BaseModel):
@@ -292,111 +223,493 @@ class SkillInput(BaseModel):
     consistency_score: int = Field(..., ge=0, le=100)
 
 
+# Function to predict skill levels for many inputs with one model call
+@stage("inference_batch")
+def predict_skills(records, bundle):
+    return bundle.model.predict_records(records)
+
+# Function to parse a batch body sent as a JSON array or as NDJSON
+@stage("parse_batch")
+def parse_batch_body(body: bytes, content_type: str):
+    items = []
+    errors = []
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        lines = [line for line in body.decode("utf-8").splitlines() if line.strip()]
+        for index, line in enumerate(lines):
+            try:
+                items.append((index, json.loads(line)))
+            except json.JSONDecodeError as e:
+                errors.append({"index": index, "error": f"Invalid JSON: {e.msg}"})
+        return items, errors
+
+    try:
+        payload = json.loads(body or b"null")
+    except json.JSONDecodeError as e:
+        return None, [{"index": None, "error": f"Invalid JSON: {e.msg}"}]
+
+    if not isinstance(payload, list):
+        return None, [{"index": None, "error": "Expected a JSON array of records"}]
+
+    return list(enumerate(payload)), errors
+
+
 @app.get("/")
 def home():
     return {"message": "AI Skill Predictor API is running"}
 
+# Set once a synthetic prediction and a database read have gone through
+# the same code paths real requests use
+ready = False
+
+async def warm_up():
+    global ready
+    sample = SkillInput(
+        name="warm-up",
+        marks=70,
+        accuracy=75,
+        time_taken=30,
+        attempts=2,
+        difficulty_level="medium",
+        topic_coverage=80,
+        consistency_score=75
+    )
+    await run_inference(predict_one, sample, registry.current())
+    await run_db(get_skill_distribution)
+    ready = True
+
+# Readiness probe for load balancers and scale-to-zero platforms
+@app.get("/ready")
+def readiness():
+    if not ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "model_version": registry.active.version}
+
+
+# Function to predict one skill level with the active model
+@stage("inference")
+def predict_one(data, bundle):
+    key = (
+        bundle.fingerprint,
+        data.marks,
+        data.accuracy,
+        data.time_taken,
+        data.attempts,
+        data.difficulty_level,
+        data.topic_coverage,
+        data.consistency_score
+    )
+    predicted_skill = prediction_cache.get(key)
+    if predicted_skill is None:
+        predicted_skill = bundle.model.predict_one(*key[1:])
+        prediction_cache.put(key, predicted_skill)
+    return predicted_skill
 
 @app.post("/predict")
-def predict_skill(data: SkillInput):
-
-    # Convert input to DataFrame
-    input_df = pd.DataFrame([{
-        "marks": data.marks,
-        "accuracy": data.accuracy,
-        "time_taken": data.time_taken,
-        "attempts": data.attempts,
-        "difficulty_level": data.difficulty_level,
-        "topic_coverage": data.topic_coverage,
-        "consistency_score": data.consistency_score
-    }])
-
-    # Encode difficulty level
-    input_df["difficulty_level"] = difficulty_encoder.transform(
-        input_df["difficulty_level"]
-    )
+async def predict_skill(data: SkillInput, identity: dict = Depends(optional_session)):
+    # Students only predict for themselves; admins and callers without a
+    # session name the student in the body
+    if identity is not None and identity["role"] != "admin" and data.name != identity["sub"]:
+        return JSONResponse({"error": "name must match the signed-in student"}, status_code=403)
 
-    # Scale data
-    input_scaled = scaler.transform(input_df)
+    # Pin the model for this request so a concurrent swap cannot split it
+    bundle = registry.current()
 
-    # Predict
-    prediction = model.predict(input_scaled)
-    predicted_skill = prediction[0]
+    # Encode, scale and predict in one fused step
+    predicted_skill = await run_inference(predict_one, data, bundle)
     # Save to database
-    save_prediction(data, predicted_skill)
+    await persist_predictions([data], [predicted_skill], bundle.version)
     
     return {
          "name": data.name,
         "predicted_skill_level": predicted_skill
     }
 
+# Function to validate batch items, collecting errors for the bad ones
+@stage("validate_batch")
+def validate_batch(items, errors):
+    records = []
+    indexes = []
+    for index, item in items:
+        try:
+            records.append(SkillInput.model_validate(item))
+            indexes.append(index)
+        except ValidationError as e:
+            errors.append({
+                "index": index,
+                "error": e.errors(include_url=False, include_context=False)
+            })
+    return records, indexes
+
+# Endpoint for scoring many students in one request
+@app.post("/predict/batch")
+async def predict_skill_batch(request: Request):
+    body = await request.body()
+    items, errors = parse_batch_body(body, request.headers.get("content-type", ""))
+
+    if items is None:
+        return {"error": errors[0]["error"]}
+
+    records, indexes = validate_batch(items, errors)
+
+    results = []
+    if records:
+        bundle = registry.current()
+        predicted_skills = await run_inference(predict_skills, records, bundle)
+        await persist_predictions(records, predicted_skills, bundle.version)
+
+        for index, data, predicted_skill in zip(indexes, records, predicted_skills):
+            results.append({
+                "index": index,
+                "name": data.name,
+                "predicted_skill_level": str(predicted_skill)
+            })
+
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "count": len(results),
+        "failed": len(errors),
+        "results": results,
+        "errors": errors
+    }
+
+# Function to build the cursors a client passes back for the adjacent pages
+def page_cursors(rows):
+    return {
+        "next_before_id": rows[-1]["id"] if rows else None,
+        "prev_after_id": rows[0]["id"] if rows else None
+    }
+
+# Every student's predictions, newest first
 @app.get("/history")
-def fetch_history(limit: int = 50):
+async def fetch_history(limit: int = 50, before_id: int = None, after_id: int = None,
+                        identity: dict = Depends(require_admin)):
+    if before_id is not None and after_id is not None:
+        return {"error": "Use either before_id or after_id, not both"}
+
+    data = await run_db(get_history, limit, before_id, after_id)
     return {
-        "count": limit,
-        "data": get_history(limit)
+        "count": len(data),
+        **page_cursors(data),
+        "data": data
     }
 
+# Prometheus scrape endpoint: latency histograms per route, prediction
+# stage and database helper, plus row, connection, cache and queue counters
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+metrics.Gauge("skill_prediction_cache_hits_total", "Prediction cache hits",
+              lambda: prediction_cache.hits, kind="counter")
+metrics.Gauge("skill_prediction_cache_misses_total", "Prediction cache misses",
+              lambda: prediction_cache.misses, kind="counter")
+metrics.Gauge("skill_prediction_cache_entries", "Prediction cache entries",
+              lambda: prediction_cache.stats()["size"])
+metrics.Gauge("skill_write_queue_depth", "Rows waiting in the write-behind queue",
+              lambda: writer.pending_rows if writer is not None else 0)
+if process_memory.AVAILABLE:
+    metrics.Gauge("skill_process_resident_bytes", "Resident set size of this worker",
+                  lambda: process_memory.read_memory(os.getpid())["rss_bytes"])
+    metrics.Gauge("skill_process_proportional_bytes", "Proportional set size of this worker",
+                  lambda: process_memory.read_memory(os.getpid())["pss_bytes"])
+
+# Endpoint exposing the write-behind queue state
+@app.get("/metrics/writer")
+def writer_metrics():
+    if writer is None:
+        return {"mode": PERSISTENCE_MODE, "queue_depth": 0}
+    return writer.stats()
+
+# Endpoint exposing prediction cache counters
+@app.get("/metrics/cache")
+def cache_metrics():
+    return {"model_fingerprint": registry.active.fingerprint, **prediction_cache.stats()}
+
 @app.get("/analytics/skills")
-def skill_analytics():
-    return get_skill_distribution()
+async def skill_analytics():
+    return await run_db(get_skill_distribution)
+
+@app.get("/analytics/kpis")
+def kpi_analytics(identity: dict = Depends(require_admin)):
+    return backend.kpis()
+
+@app.get("/analytics/difficulty")
+def difficulty_analytics(identity: dict = Depends(require_admin)):
+    return backend.difficulty_skill_counts()
+
+@app.get("/analytics/monthly")
+def monthly_analytics(identity: dict = Depends(require_admin)):
+    return backend.monthly_counts()
+
+@app.get("/analytics/leaderboard")
+def leaderboard_analytics(limit: int = 5, identity: dict = Depends(require_admin)):
+    return backend.leaderboard(limit)
+
+# Endpoint with everything the admin overview page renders
+@app.get("/admin/dashboard")
+@db_operation("admin_dashboard")
+def admin_dashboard(leaderboard_limit: int = 5, recent_limit: int = 50,
+                    identity: dict = Depends(require_admin)):
+    dashboard = backend.dashboard(leaderboard_limit)
+    dashboard["recent_predictions"] = get_history(recent_limit)
+    return dashboard
+
+# Endpoint to profile the live server for a bounded window.
+# mode=sample returns collapsed stacks of every thread (flamegraph input);
+# mode=cprofile profiles a fraction of the database and inference calls
+# made by requests and returns a pstats dump or, with format=text, the
+# top functions by cumulative time.
+@app.post("/admin/profile")
+async def profile_server(seconds: float = 10, mode: Literal["sample", "cprofile"] = "sample",
+                         format: Literal["collapsed", "pstats", "text"] = None,
+                         fraction: float = 1.0, interval_ms: float = 5,
+                         include_idle: bool = False,
+                         identity: dict = Depends(require_admin)):
+    if not 0 < seconds <= profiler.PROFILE_MAX_SECONDS:
+        return {"error": f"seconds must be between 0 and {profiler.PROFILE_MAX_SECONDS:g}"}
+    if not 0 < fraction <= 1:
+        return {"error": "fraction must be between 0 and 1"}
+    format = format or ("collapsed" if mode == "sample" else "pstats")
+    if (mode == "sample") != (format == "collapsed"):
+        return {"error": "mode=sample returns collapsed stacks; mode=cprofile returns pstats or text"}
+
+    if not profiler.try_begin():
+        return {"error": "A profile is already running"}
+    try:
+        if mode == "sample":
+            sampler = profiler.SamplingProfiler(max(interval_ms, 1) / 1000, include_idle)
+            stacks = await run_in_threadpool(sampler.run, seconds)
+            return PlainTextResponse(profiler.render_collapsed(stacks),
+                                     headers={"X-Profile-Samples": str(sampler.samples)})
+
+        profiler.call_profiler.start(fraction)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stats = profiler.call_profiler.stop()
+    finally:
+        profiler.end()
+
+    if stats is None:
+        return {"error": "No calls were profiled in the window"}
+    if format == "text":
+        return PlainTextResponse(profiler.render_pstats_text(stats))
+    return Response(
+        profiler.dump_pstats(stats),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="profile.pstats"'}
+    )
+
+# RSS and PSS of every serving process. Under serve.py or uvicorn
+# --workers this covers the supervisor and all of its workers, whichever
+# worker answers; PSS adds up to their real combined footprint.
+@app.get("/admin/memory")
+def memory_usage(identity: dict = Depends(require_admin)):
+    if not process_memory.AVAILABLE:
+        return {"error": "Memory reporting needs Linux /proc"}
+    return {"pid": os.getpid(), **process_memory.memory_report()}
+
+# Endpoints to list, activate and roll back model versions
+@app.get("/admin/models")
+def list_models(identity: dict = Depends(require_admin)):
+    return registry.describe()
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(version: str, identity: dict = Depends(require_admin)):
+    try:
+        # Loading and warming happen off the event loop; traffic keeps
+        # flowing on the old version until the swap
+        bundle = await run_in_threadpool(registry.activate, version)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"message": "Model activated", "active": bundle.version}
+
+@app.post("/admin/models/rollback")
+async def rollback_model(identity: dict = Depends(require_admin)):
+    try:
+        bundle = await run_in_threadpool(registry.rollback)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"message": "Model rolled back", "active": bundle.version}
+
+# Ground-truth skill level for a stored prediction; the online trainer
+# (online_training.py) learns from these
+class SkillLabel(BaseModel):
+    actual_skill: Literal["Beginner", "Intermediate", "Advanced"]
+
+@app.post("/admin/predictions/{prediction_id}/label")
+def label_prediction(prediction_id: int, data: SkillLabel,
+                     identity: dict = Depends(require_admin)):
+    if not backend.prediction_exists(prediction_id):
+        return {"error": "Prediction not found"}
+    with pool.transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO prediction_labels (prediction_id, actual_skill, labelled_at) "
+            "VALUES (?, ?, ?)",
+            (prediction_id, data.actual_skill, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+    metrics.ROWS_WRITTEN.labels("prediction_labels").inc()
+    return {"message": "Label recorded", "label_id": cursor.lastrowid}
 
 @app.get("/history/filter")
-def fetch_history_filtered(name: str = None, limit: int = 50):
+async def fetch_history_filtered(name: str = None, limit: int = 50,
+                                 before_id: int = None, after_id: int = None,
+                                 identity: dict = Depends(require_session)):
+    if before_id is not None and after_id is not None:
+        return {"error": "Use either before_id or after_id, not both"}
+
+    name = session_student(identity, name)
+    data = await run_db(get_history_filtered, name, limit, before_id, after_id)
     return {
         "name": name,
-        "count": limit,
-        "data": get_history_filtered(name, limit)
+        "count": len(data),
+        **page_cursors(data),
+        "data": data
+    }
+
+# Signed download link for the export endpoint, valid for LINK_TTL_SECONDS,
+# so a browser can fetch the file without the Authorization header
+@app.post("/export/link")
+def export_link(identity: dict = Depends(require_session)):
+    token, expires_at = issue_link_token(identity, "export")
+    return {"token": token, "expires_at": expires_at}
+
+# Endpoint for full exports of the predictions table. Students can only
+# export their own predictions.
+@app.get("/export/predictions")
+def export_predictions(format: str = "csv", name: str = None,
+                       start_date: str = None, end_date: str = None,
+                       identity: dict = Depends(require_link("export"))):
+    if format not in export.EXPORT_FORMATS:
+        return {"error": f"Unsupported format, use one of {', '.join(export.EXPORT_FORMATS)}"}
+
+    name = session_student(identity, name)
+
+    try:
+        stream = export.stream_predictions(
+            format, backend.export_batches(name, start_date, end_date)
+        )
+    except ValueError:
+        return {"error": "Dates must be in YYYY-MM-DD format"}
+
+    media_type, extension = export.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="predictions.{extension}"'}
+    )
+
+# Function to build a columnar progress series, bucketed and/or
+# downsampled so heavy users do not produce unbounded payloads
+@db_operation("get_progress_series")
+def get_progress_series(name: str, bucket: str = None, agg: str = "mean",
+                        max_points: int = None):
+    dates, x, y, counts = backend.progress_series(name, bucket, agg)
+
+    total = len(dates)
+    if max_points is not None and total > max_points:
+        keep = progress.lttb(x, y, max_points)
+        dates = [dates[i] for i in keep]
+        y = y[keep]
+        counts = counts[keep]
+
+    return {
+        "points": len(dates),
+        "total_points": total,
+        "columns": {
+            "date": dates,
+            "skill_value": [round(value, 3) for value in y.tolist()],
+            "predictions": counts.tolist()
+        }
     }
 
 @app.get("/progress")
-def user_progress(name: str):
+async def user_progress(name: str = None, limit: int = None,
+                        before_id: int = None, after_id: int = None,
+                        bucket: Literal["day", "week", "month"] = None,
+                        agg: Literal["mean", "mode"] = "mean",
+                        max_points: int = None,
+                        identity: dict = Depends(require_session)):
+    if before_id is not None and after_id is not None:
+        return {"error": "Use either before_id or after_id, not both"}
+
+    name = session_student(identity, name)
+    if not name:
+        return {"error": "name is required"}
+
+    # Bucketed or downsampled series come back as numeric columns
+    if bucket is not None or max_points is not None:
+        if limit is not None or before_id is not None or after_id is not None:
+            return {"error": "bucket and max_points cannot be combined with paging"}
+        if max_points is not None and max_points < 3:
+            return {"error": "max_points must be at least 3"}
+        series = await run_db(get_progress_series, name, bucket, agg, max_points)
+        return {
+            "name": name,
+            "bucket": bucket,
+            "agg": agg if bucket else None,
+            "skill_levels": {value: skill for skill, value in progress.SKILL_VALUES.items()},
+            **series
+        }
+
+    progress_rows = await run_db(get_user_progress, name, limit, before_id, after_id)
     return {
         "name": name,
-        "progress": get_user_progress(name)
+        "count": len(progress_rows),
+        "next_after_id": progress_rows[-1]["id"] if progress_rows else None,
+        "prev_before_id": progress_rows[0]["id"] if progress_rows else None,
+        "progress": progress_rows
     }
 
-# Endpoint for student registration
+# Endpoint for student registration. A name that already has predictions
+# but no account (a students row without a password) is claimed.
 @app.post("/student/register")
 def register_student(data: StudentAuth):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
+    password_hash = hash_password(data.password)
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        cursor.execute("""
-            INSERT INTO students (username, password_hash, created_at)
-            VALUES (?, ?, ?)
-        """, (
-            data.username,
-            hash_password(data.password),
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        ))
-        conn.commit()
+        # A name that already has predictions but no account is taken too:
+        # registering it would hand its history to whoever signs up first
+        with pool.transaction() as conn:
+            conn.execute("""
+                INSERT INTO students (username, password_hash, created_at)
+                VALUES (?, ?, ?)
+            """, (data.username, password_hash, created_at))
         return {"message": "Student registered successfully"}
 
     except sqlite3.IntegrityError:
         return {"error": "Username already exists"}
 
-    finally:
-        conn.close()
-
 # Endpoint for student login
 @app.post("/student/login")
 def login_student(data: StudentAuth):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT password_hash FROM students WHERE username = ?
-    """, (data.username,))
+        cursor.execute("""
+            SELECT id, password_hash FROM students WHERE username = ?
+        """, (data.username,))
 
-    row = cursor.fetchone()
-    conn.close()
+        row = cursor.fetchone()
 
-    if not row:
+    # Rows without a password are names that only have predictions
+    if not row or row[1] is None:
         return {"error": "User not found"}
 
-    if row[0] != hash_password(data.password):
+    if row[1] != hash_password(data.password):
         return {"error": "Invalid password"}
 
-    return {"message": "Login successful", "username": data.username}
+    token, expires_at = issue_token(data.username, "student", row[0])
+    return {
+        "message": "Login successful",
+        "username": data.username,
+        "token": token,
+        "expires_at": expires_at
+    }
+
+# Endpoint to end a student or admin session
+@app.post("/logout")
+def logout(identity: dict = Depends(require_session), authorization: str = Header(None)):
+    sessions.revoke(authorization.partition(" ")[2])
+    return {"message": "Logged out", "username": identity["sub"]}
@@ -0,0 +1,259 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# In-process latency histograms and counters, rendered in the Prometheus
+# text exposition format at /metrics.
+#
+# Recording is a bisect over the bucket bounds plus three increments under
+# an uncontended lock, roughly a microsecond. With METRICS_ENABLED=0 the
+# decorators return the wrapped function unchanged and the request
+# middleware is not installed, so the cost is zero.
+#
+# Each worker process keeps its own values; Prometheus sums them when
+# every worker is scraped.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Seconds, from 50 us (cache hits, summary reads) to 10 s (lock waits)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_metrics = []
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramChild:
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+class _CounterChild:
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _Metric:
+
+    child_class = None
+    kind = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _new_child(self):
+        return self.child_class()
+
+    # Child for one combination of label values. Hot paths should look
+    # children up once and keep them.
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, label_names)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, values, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, values, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter(_Metric):
+
+    kind = "counter"
+    child_class = _CounterChild
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.label_names, values)
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+# Value read at scrape time, e.g. a queue depth or cache size. kind can be
+# "counter" for totals another component already keeps.
+class Gauge:
+
+    def __init__(self, name, documentation, read, kind="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.kind = kind
+        _metrics.append(self)
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {_format_value(self.read())}",
+        ]
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram(
+    "skill_request_seconds", "HTTP request latency by route", ["method", "endpoint"]
+)
+RESPONSES = Counter(
+    "skill_http_responses_total", "HTTP responses by route and status", ["method", "endpoint", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "skill_stage_seconds", "Latency of each stage of the prediction path", ["stage"]
+)
+DB_SECONDS = Histogram(
+    "skill_db_seconds", "Latency of database helpers", ["operation"]
+)
+ROWS_WRITTEN = Counter(
+    "skill_rows_written_total", "Rows inserted by table", ["table"]
+)
+CONNECTIONS_OPENED = Counter(
+    "skill_db_connections_opened_total", "SQLite connections opened"
+).labels()
+
+
+# Decorator recording a function's wall time in a histogram child.
+# Works for plain and async functions.
+def timed(child):
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def stage(name):
+    return timed(STAGE_SECONDS.labels(name))
+
+
+def db_operation(name):
+    return timed(DB_SECONDS.labels(name))
+
+
+# ASGI middleware timing every HTTP request under its route template
+# (/admin/models/{version}/activate, not the concrete path), so label
+# cardinality stays bounded
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method, endpoint).observe(elapsed)
+            RESPONSES.labels(method, endpoint, str(status)).inc()
@@ -0,0 +1,156 @@
+from archive import create_archive_files
+from compact_schema import (
+    PREDICTIONS_INSERT_TRIGGER,
+    compact_predictions,
+    create_compact_schema,
+    table_type,
+)
+from db import pool
+from summaries import create_summary_tables, rebuild_summaries
+
+# Versioned schema changes applied in order at startup.
+# PRAGMA user_version stores the last version applied to a database file.
+
+
+def add_student_indexes(conn):
+    # Serves WHERE name = ? ORDER BY id for history pages
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_name_id
+        ON predictions (name, id)
+    """)
+    # Serves WHERE name = ? ORDER BY created_at for progress
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_name_created_at
+        ON predictions (name, created_at)
+    """)
+
+
+def add_summary_tables(conn):
+    create_summary_tables(conn)
+    rebuild_summaries(conn)
+
+
+def add_model_version(conn):
+    conn.execute("ALTER TABLE predictions ADD COLUMN model_version TEXT")
+
+
+# Ground-truth skill levels recorded after the fact. Append-only, so the
+# online trainer can stream new labels with an id cursor.
+def add_prediction_labels(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_labels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prediction_id INTEGER NOT NULL REFERENCES predictions (id),
+            actual_skill TEXT NOT NULL,
+            labelled_at TEXT
+        )
+    """)
+
+
+# Shard files of STORAGE_BACKEND=sharded in shard order; empty while every
+# prediction is in this database
+def add_storage_shards(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_shards (
+            shard INTEGER PRIMARY KEY,
+            path TEXT NOT NULL
+        )
+    """)
+
+
+# Parquet files archive.py has moved this database's old predictions to
+def add_archive_files(conn):
+    create_archive_files(conn)
+
+
+# New ids used to start above the highest stored id only, which archiving
+# can lower; they now also start above the highest archived id
+def allocate_ids_above_archive(conn):
+    create_archive_files(conn)
+    conn.execute("DROP TRIGGER IF EXISTS predictions_insert")
+    conn.execute(PREDICTIONS_INSERT_TRIGGER)
+
+
+# Per-file daily progress aggregates of archived predictions; files
+# archived before this are filled in by the next archive.py run
+def add_archive_progress(conn):
+    create_archive_files(conn)
+
+
+MIGRATIONS = [
+    (1, "Index predictions by student name", add_student_indexes),
+    (2, "Add incrementally maintained summary tables", add_summary_tables),
+    (3, "Add consistency histogram per skill", add_summary_tables),
+    (4, "Record the model version behind each prediction", add_model_version),
+    (5, "Store ground-truth labels for predictions", add_prediction_labels),
+    (6, "Store predictions in the compact integer schema", compact_predictions),
+    (7, "Record the shard files of the sharded storage backend", add_storage_shards),
+    (8, "Record archived Parquet files", add_archive_files),
+    (9, "Never reuse the ids of archived predictions", allocate_ids_above_archive),
+    (10, "Aggregate archived predictions per student and day", add_archive_progress),
+]
+
+COMPACT_SCHEMA_VERSION = 6
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# A new database gets the latest schema directly instead of the original
+# predictions table and every conversion since. Needs the students table.
+def create_schema(conn):
+    create_compact_schema(conn)
+    create_summary_tables(conn)
+    add_prediction_labels(conn)
+    add_storage_shards(conn)
+    add_archive_files(conn)
+
+
+# Apply every migration newer than the database's current version, up to
+# target_version when given. Each one runs in its own IMMEDIATE
+# transaction so concurrent workers starting together apply it exactly
+# once.
+def migrate(target_pool=None, target_version=None):
+    target_pool = target_pool or pool
+    applied = []
+
+    with target_pool.connection() as conn:
+        if target_version is None and get_schema_version(conn) == 0:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) == 0 and table_type(conn, "predictions") is None:
+                    create_schema(conn)
+                    version = MIGRATIONS[-1][0]
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    applied.append((version, "Create the current schema"))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        for version, description, apply in MIGRATIONS:
+            if target_version is not None and version > target_version:
+                break
+            if get_schema_version(conn) >= version:
+                continue
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) < version:
+                    apply(conn)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    applied.append((version, description))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    return applied
+
+
+if __name__ == "__main__":
+    import main  # noqa: F401  creates the base tables and migrates
+
+    with pool.connection() as conn:
+        print(f"Schema version: {get_schema_version(conn)}")
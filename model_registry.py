@@ -0,0 +1,415 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from forest import CompiledForest
+from inference import FEATURE_COLUMNS, FusedLogisticModel, artifact_fingerprint
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Versioned model artifacts on disk:
+#
+#   models/
+#     v1/skill_model.pkl, scaler.pkl, difficulty_encoder.pkl, metadata.json,
+#        model.npz (fused weights exported from the pickles)
+#        rf_model.pkl, forest/*.npy (optional RandomForest and its compiled
+#        node arrays)
+#     v2/...
+#     active.json   {"active": "v2", "history": ["v1", "v2"]}
+#
+# Serving holds one immutable ModelBundle at a time. Activating a version
+# loads, validates and warms the new bundle first, then swaps a single
+# reference, so in-flight requests finish on the bundle they started with.
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+# How often a worker re-reads active.json to follow activations made by
+# other workers
+MODEL_REFRESH_SECONDS = float(os.getenv("MODEL_REFRESH_SECONDS", "2"))
+# "npz" serves from model.npz and never imports joblib/sklearn;
+# "pickle" rebuilds the fused model from the sklearn pickles
+MODEL_ARTIFACT_FORMAT = os.getenv("MODEL_ARTIFACT_FORMAT", "npz")
+# "logistic" serves the fused LogisticRegression; "forest" serves the
+# version's RandomForest through the compiled engine in forest.py
+MODEL_TYPE = os.getenv("MODEL_TYPE", "logistic")
+
+ARTIFACT_FILES = {
+    "model": "skill_model.pkl",
+    "scaler": "scaler.pkl",
+    "difficulty_encoder": "difficulty_encoder.pkl",
+}
+
+NPZ_FILE = "model.npz"
+FOREST_FILE = "rf_model.pkl"
+FOREST_DIR = "forest"
+
+MODEL_TYPES = ("logistic", "forest")
+
+# Registered as the first version when the registry is empty
+BOOTSTRAP_ARTIFACTS = ("skill_model.pkl", "scaler.pkl", "difficulty_encoder.pkl", "rf_model.pkl")
+
+DIFFICULTY_LEVELS = {"easy", "medium", "hard"}
+
+
+class ModelBundle:
+
+    def __init__(self, version, model, model_type, fingerprint, metadata):
+        self.version = version
+        self.model = model
+        self.model_type = model_type
+        self.fingerprint = fingerprint
+        self.metadata = metadata
+
+
+# Rebuild the fused model from the sklearn pickles in a directory.
+# joblib (and with it sklearn) is only imported on this path.
+def load_pickled_model(directory, version):
+    import joblib
+
+    paths = [os.path.join(directory, name) for name in ARTIFACT_FILES.values()]
+    model = joblib.load(paths[0])
+    scaler = joblib.load(paths[1])
+    difficulty_encoder = joblib.load(paths[2])
+
+    if getattr(model, "coef_", None) is None or model.coef_.shape[1] != len(FEATURE_COLUMNS):
+        raise ValueError(f"Model {version} does not take {len(FEATURE_COLUMNS)} features")
+    if getattr(scaler, "n_features_in_", len(FEATURE_COLUMNS)) != len(FEATURE_COLUMNS):
+        raise ValueError(f"Scaler {version} does not take {len(FEATURE_COLUMNS)} features")
+
+    return FusedLogisticModel.from_pipeline(model, scaler, difficulty_encoder), paths
+
+
+# Write model.npz next to the pickles of a version
+def export_npz(directory, version):
+    fused, _ = load_pickled_model(directory, version)
+    fused.save_npz(os.path.join(directory, NPZ_FILE))
+    return fused
+
+
+def load_logistic_model(directory, version):
+    if MODEL_ARTIFACT_FORMAT == "npz":
+        npz_path = os.path.join(directory, NPZ_FILE)
+        if not os.path.exists(npz_path):
+            export_npz(directory, version)
+        fused = FusedLogisticModel.load_npz(npz_path)
+        paths = [npz_path]
+    else:
+        fused, paths = load_pickled_model(directory, version)
+
+    if fused.weights.shape[0] != len(FEATURE_COLUMNS):
+        raise ValueError(f"Model {version} does not take {len(FEATURE_COLUMNS)} features")
+    return fused, paths
+
+
+# Write forest/ (flat node arrays) from the RandomForest pickle of a version
+def compile_forest(directory, version):
+    import joblib
+
+    forest_path = os.path.join(directory, FOREST_FILE)
+    if not os.path.exists(forest_path):
+        raise ValueError(f"Model {version} has no {FOREST_FILE}")
+    forest = joblib.load(forest_path)
+    difficulty_encoder = joblib.load(os.path.join(directory, ARTIFACT_FILES["difficulty_encoder"]))
+    if getattr(forest, "estimators_", None) is None:
+        raise ValueError(f"{FOREST_FILE} of {version} is not a fitted RandomForestClassifier")
+
+    compiled = CompiledForest.from_sklearn(forest, difficulty_encoder)
+    compiled.save(os.path.join(directory, FOREST_DIR))
+    return compiled
+
+
+# The compiled arrays are memory-mapped, so workers serving the same
+# version share one page-cache copy
+def load_forest_model(directory, version):
+    forest_dir = os.path.join(directory, FOREST_DIR)
+    if not os.path.exists(os.path.join(forest_dir, "forest.json")):
+        compile_forest(directory, version)
+    forest = CompiledForest.load(forest_dir)
+
+    if forest.n_features != len(FEATURE_COLUMNS):
+        raise ValueError(f"Forest {version} does not take {len(FEATURE_COLUMNS)} features")
+    return forest, CompiledForest.artifact_paths(forest_dir)
+
+
+# Load a version, check it fits the serving schema and run a synthetic
+# warm-up batch. Raises ValueError for unusable artifacts.
+def load_bundle(directory, version, model_type=None):
+    model_type = model_type or MODEL_TYPE
+    if model_type == "forest":
+        model, paths = load_forest_model(directory, version)
+    elif model_type == "logistic":
+        model, paths = load_logistic_model(directory, version)
+    else:
+        raise ValueError(f"Unknown model type {model_type}")
+
+    if not DIFFICULTY_LEVELS.issubset(set(model.difficulty_classes)):
+        raise ValueError(f"Difficulty encoder {version} is missing levels")
+
+    # Warm up and sanity check on synthetic inputs
+    rng = np.random.default_rng(0)
+    sample = rng.integers(0, 101, size=(64, len(FEATURE_COLUMNS))).astype(np.float64)
+    sample[:, FEATURE_COLUMNS.index("difficulty_level")] = rng.integers(0, 3, size=64)
+    predictions = model.predict_matrix(sample)
+    if not set(predictions).issubset(set(model.classes)):
+        raise ValueError(f"Model {version} produced unknown classes")
+    model.predict_one(70, 75, 30, 2, "medium", 80, 75)
+
+    metadata_path = os.path.join(directory, "metadata.json")
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+
+    return ModelBundle(version, model, model_type, artifact_fingerprint(paths), metadata)
+
+
+class ModelRegistry:
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+        self.active = None
+        self._lock = threading.Lock()
+        self._state_mtime = None
+        self._failed_mtime = None
+        self._watcher_pid = None
+
+    @property
+    def state_path(self):
+        return os.path.join(self.root, "active.json")
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        found = [
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, ARTIFACT_FILES["model"]))
+        ]
+        return sorted(found, key=lambda name: (len(name), name))
+
+    def read_state(self):
+        if not os.path.exists(self.state_path):
+            return {"active": None, "history": []}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _write_state(self, state):
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    # Copy a set of artifacts into the registry as a new version. A
+    # RandomForest pickle is optional and is compiled on registration.
+    def register(self, model_path, scaler_path, encoder_path, version=None, note=None,
+                 forest_path=None):
+        os.makedirs(self.root, exist_ok=True)
+        if version is None:
+            version = f"v{len(self.versions()) + 1}"
+        directory = self.version_dir(version)
+        if os.path.exists(directory):
+            raise ValueError(f"Version {version} already exists")
+
+        os.makedirs(directory)
+        sources = [model_path, scaler_path, encoder_path]
+        for source, name in zip(sources, ARTIFACT_FILES.values()):
+            shutil.copyfile(source, os.path.join(directory, name))
+        if forest_path is not None:
+            shutil.copyfile(forest_path, os.path.join(directory, FOREST_FILE))
+
+        with open(os.path.join(directory, "metadata.json"), "w") as f:
+            json.dump({
+                "version": version,
+                "registered_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "note": note,
+                "model_types": ["logistic", "forest"] if forest_path else ["logistic"],
+            }, f, indent=2)
+
+        # Refuse to keep artifacts that cannot be served
+        try:
+            export_npz(directory, version)
+            load_bundle(directory, version, "logistic")
+            if forest_path is not None:
+                compile_forest(directory, version)
+                load_bundle(directory, version, "forest")
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return version
+
+    # Load the active version, registering the given artifacts as the
+    # first version when the registry is empty. The forest pickle is
+    # included when it exists.
+    def bootstrap(self, model_path, scaler_path, encoder_path, forest_path=None):
+        with self._lock:
+            if not self.versions():
+                if forest_path is not None and not os.path.exists(forest_path):
+                    forest_path = None
+                version = self.register(model_path, scaler_path, encoder_path,
+                                        note="Bootstrapped from the repository artifacts",
+                                        forest_path=forest_path)
+                self._write_state({"active": version, "history": [version]})
+
+            state = self.read_state()
+            version = state["active"] or self.versions()[-1]
+            self.active = load_bundle(self.version_dir(version), version)
+            self._state_mtime = os.path.getmtime(self.state_path) \
+                if os.path.exists(self.state_path) else None
+        return self.active
+
+    # Load, validate and warm a version, then swap it in
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version {version}")
+
+        bundle = load_bundle(self.version_dir(version), version)
+
+        with self._lock:
+            state = self.read_state()
+            history = [v for v in state["history"] if v != version] + [version]
+            self._write_state({"active": version, "history": history})
+            self._state_mtime = os.path.getmtime(self.state_path)
+            self.active = bundle
+        return bundle
+
+    # Re-activate the version that was active before the current one
+    def rollback(self):
+        state = self.read_state()
+        if len(state["history"]) < 2:
+            raise ValueError("No previous version to roll back to")
+
+        previous = state["history"][-2]
+        bundle = load_bundle(self.version_dir(previous), previous)
+
+        with self._lock:
+            self._write_state({"active": previous, "history": state["history"][:-1]})
+            self._state_mtime = os.path.getmtime(self.state_path)
+            self.active = bundle
+        return bundle
+
+    # The bundle to serve with. Never loads anything itself: a watcher
+    # thread follows activations written by other worker processes and
+    # swaps the new bundle in once it is ready.
+    def current(self):
+        if self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return self.active
+
+    # Started lazily so that workers forked by serve.py each get their own
+    # thread (threads do not survive fork)
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="model-registry-watcher",
+                         daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(MODEL_REFRESH_SECONDS)
+            try:
+                mtime = os.path.getmtime(self.state_path)
+            except OSError:
+                continue
+            if mtime in (self._state_mtime, self._failed_mtime):
+                continue
+            try:
+                self._reload_from_state(mtime)
+            except Exception:
+                # Keep serving the previous bundle; retried when the state
+                # file changes again
+                self._failed_mtime = mtime
+                logger.exception("Could not load the newly activated model version; "
+                                 "still serving %s", self.active.version if self.active else None)
+
+    def _reload_from_state(self, mtime):
+        version = self.read_state()["active"]
+        bundle = None
+        if self.active is None or version != self.active.version:
+            bundle = load_bundle(self.version_dir(version), version)
+        with self._lock:
+            if mtime == self._state_mtime:
+                return
+            if bundle is not None:
+                self.active = bundle
+            self._state_mtime = mtime
+
+    def describe(self):
+        state = self.read_state()
+        versions = []
+        for version in self.versions():
+            metadata_path = os.path.join(self.version_dir(version), "metadata.json")
+            metadata = {"version": version}
+            if os.path.exists(metadata_path):
+                with open(metadata_path) as f:
+                    metadata.update(json.load(f))
+            versions.append(metadata)
+
+        return {
+            "active": self.active.version if self.active else state["active"],
+            "model_type": MODEL_TYPE,
+            "history": state["history"],
+            "versions": versions,
+        }
+
+
+# Registry bootstrapped by serve.py before it forks workers. Workers adopt
+# it instead of loading the active version again, and only the parent
+# ever registers the bootstrap version.
+preloaded = None
+
+
+def preload():
+    global preloaded
+    registry = ModelRegistry()
+    registry.bootstrap(*BOOTSTRAP_ARTIFACTS)
+    preloaded = registry
+    return registry
+
+
+# Command line: python model_registry.py list | register | activate | rollback
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    register_parser = subparsers.add_parser("register")
+    register_parser.add_argument("--model", default="skill_model.pkl")
+    register_parser.add_argument("--scaler", default="scaler.pkl")
+    register_parser.add_argument("--encoder", default="difficulty_encoder.pkl")
+    register_parser.add_argument("--forest", help="RandomForest pickle to compile and ship")
+    register_parser.add_argument("--version")
+    register_parser.add_argument("--note")
+    register_parser.add_argument("--activate", action="store_true")
+    activate_parser = subparsers.add_parser("activate")
+    activate_parser.add_argument("version")
+    subparsers.add_parser("rollback")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+
+    if args.command == "list":
+        print(json.dumps(registry.describe(), indent=2))
+    elif args.command == "register":
+        version = registry.register(args.model, args.scaler, args.encoder,
+                                    args.version, args.note, args.forest)
+        print(f"Registered {version}")
+        if args.activate:
+            registry.activate(version)
+            print(f"Activated {version}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    elif args.command == "rollback":
+        print(f"Rolled back to {registry.rollback().version}")
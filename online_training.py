@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import os
+import time
+from operator import itemgetter
+
+import joblib
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from compact_schema import DIFFICULTY_CODES, SKILL_CODES
+from db import open_connection, pool
+from inference import FEATURE_COLUMNS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Incremental retraining from production data.
+#
+# A running StandardScaler and an SGDClassifier (logistic loss) are updated
+# with partial_fit on chunks streamed from SQLite by id cursor, so each run
+# only reads rows added since the last checkpoint and memory stays at one
+# chunk no matter how large the table grows. Two sources:
+#
+#   labels       prediction_labels joined to predictions (ground truth)
+#   predictions  stored predictions with their predicted skill
+#                (self-training; adapts the scaler to production inputs)
+#
+# Labels live in the application database. The predictions they refer to
+# are read from wherever the storage backend keeps them: the application
+# database or every shard, and the Parquet archive for archived rows.
+#
+# The estimator and both cursors are written together to one checkpoint
+# file after every chunk. Publishing registers the checkpoint as a normal
+# model version, which serving picks up through the registry.
+#
+#     python online_training.py update --seed-data test_data.csv --publish --activate
+#     python online_training.py status
+
+ONLINE_CHECKPOINT_DIR = os.getenv("ONLINE_CHECKPOINT_DIR", "online")
+ONLINE_CHUNK_ROWS = int(os.getenv("ONLINE_CHUNK_ROWS", "5000"))
+
+# Sorted the way LabelEncoder and the classifier order them
+SKILL_CLASSES = np.array(sorted(SKILL_CODES))
+DIFFICULTY_LEVELS = sorted(DIFFICULTY_CODES)
+
+FEATURE_SQL = ", ".join(FEATURE_COLUMNS)
+
+LABELS_QUERY = """
+    SELECT id, prediction_id, actual_skill
+    FROM prediction_labels
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+PREDICTIONS_QUERY = f"""
+    SELECT id, {FEATURE_SQL}, predicted_skill
+    FROM predictions
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+FEATURES_QUERY = f"""
+    SELECT id, {FEATURE_SQL}
+    FROM predictions
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+SOURCES = ("labels", "predictions")
+
+
+def new_state():
+    return {
+        "cursors": {source: 0 for source in SOURCES},
+        "rows_seen": 0,
+        "rows_since_publish": 0,
+        "updates": 0,
+        "published_version": None,
+        "updated_at": None,
+    }
+
+
+class OnlineTrainer:
+
+    def __init__(self, checkpoint_dir: str = ONLINE_CHECKPOINT_DIR):
+        self.checkpoint_dir = checkpoint_dir
+        self.difficulty_encoder = LabelEncoder().fit(DIFFICULTY_LEVELS)
+        self._difficulty_codes = {
+            level: float(code)
+            for code, level in enumerate(self.difficulty_encoder.classes_)
+        }
+
+        if os.path.exists(self.checkpoint_path):
+            checkpoint = joblib.load(self.checkpoint_path)
+            self.scaler = checkpoint["scaler"]
+            self.model = checkpoint["model"]
+            self.state = checkpoint["state"]
+        else:
+            self.scaler = StandardScaler()
+            self.model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+            self.state = new_state()
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.checkpoint_dir, "checkpoint.pkl")
+
+    @property
+    def fitted(self):
+        return hasattr(self.model, "coef_")
+
+    # Estimator and cursors are replaced together, so a crash never leaves
+    # a model that has seen rows its cursor says are still pending
+    def save(self):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.state["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_path = self.checkpoint_path + ".tmp"
+        joblib.dump({"scaler": self.scaler, "model": self.model, "state": self.state}, temp_path)
+        os.replace(temp_path, self.checkpoint_path)
+
+    # Turn (difficulty as text, other features, label) rows into arrays,
+    # skipping rows with unknown difficulty levels, labels or missing values
+    def to_arrays(self, rows):
+        difficulty_index = FEATURE_COLUMNS.index("difficulty_level")
+        X = np.empty((len(rows), len(FEATURE_COLUMNS)), dtype=np.float64)
+        y = np.empty(len(rows), dtype=object)
+        kept = 0
+        for features, label in rows:
+            code = self._difficulty_codes.get(features[difficulty_index])
+            if code is None or label not in SKILL_CLASSES or None in features:
+                continue
+            X[kept] = features[:difficulty_index] + (code,) + features[difficulty_index + 1:]
+            y[kept] = label
+            kept += 1
+        return X[:kept], y[:kept]
+
+    def partial_fit(self, X, y):
+        if len(y) == 0:
+            return
+        self.scaler.partial_fit(X)
+        self.model.partial_fit(self.scaler.transform(X), y, classes=SKILL_CLASSES)
+        self.state["rows_seen"] += len(y)
+        self.state["rows_since_publish"] += len(y)
+        self.state["updates"] += 1
+
+    # Initial fit from a CSV or Parquet file for a fresh checkpoint
+    def seed(self, paths, epochs=5, chunk_rows=ONLINE_CHUNK_ROWS):
+        from train import LABEL_COLUMN, iter_chunks
+
+        for _ in range(epochs):
+            for path in paths:
+                for chunk in iter_chunks(path, chunk_rows):
+                    chunk = chunk.dropna()
+                    rows = zip(
+                        chunk[FEATURE_COLUMNS].itertuples(index=False, name=None),
+                        chunk[LABEL_COLUMN].astype(str),
+                    )
+                    self.partial_fit(*self.to_arrays(list(rows)))
+        self.save()
+
+    # (features, actual skill) of a chunk of labels, looking each labelled
+    # prediction up in the hot databases and then in the archive
+    @staticmethod
+    def _labelled_rows(connections, cold, labels):
+        ids = [prediction_id for _, prediction_id, _ in labels]
+        features = {}
+        for conn in connections:
+            for row in conn.execute(FEATURES_QUERY, (json.dumps(ids),)):
+                features[row[0]] = row[1:]
+        missing = [prediction_id for prediction_id in ids if prediction_id not in features]
+        for prediction_id, row in cold.rows_by_id(missing, FEATURE_COLUMNS).items():
+            features[prediction_id] = tuple(row[column] for column in FEATURE_COLUMNS)
+
+        rows = [(features[prediction_id], skill)
+                for _, prediction_id, skill in labels if prediction_id in features]
+        if len(rows) < len(labels):
+            logger.warning("Skipped %d labels whose predictions are in no database or archive",
+                           len(labels) - len(rows))
+        return rows
+
+    # The next chunk_rows stored predictions after the cursor, over every
+    # hot database and the archive, in id order
+    @staticmethod
+    def _prediction_rows(connections, cold, cursor, chunk_rows):
+        rows = []
+        for conn in connections:
+            rows.extend(conn.execute(PREDICTIONS_QUERY, (cursor, chunk_rows)).fetchall())
+        for row in cold.history(None, chunk_rows, low=cursor, oldest=True):
+            rows.append((row["id"], *(row[column] for column in FEATURE_COLUMNS),
+                         row["predicted_skill"]))
+        rows.sort(key=itemgetter(0))
+        return rows[:chunk_rows]
+
+    # Stream rows added to a source since its cursor and learn from them
+    # one chunk at a time. Reads through backend, by default the one
+    # STORAGE_BACKEND configures. Returns the number of rows learned.
+    def update(self, source="labels", chunk_rows=ONLINE_CHUNK_ROWS, backend=None):
+        import storage
+
+        if backend is None:
+            backend = storage.open_backend(pool)
+        databases = storage.prediction_pools(backend)
+        learned = 0
+        # Private connections keep a long catch-up off the request pools
+        labels_conn = open_connection(pool.path)
+        connections = [open_connection(database.path) for database in databases]
+        try:
+            while True:
+                cursor = self.state["cursors"][source]
+                if source == "labels":
+                    batch = labels_conn.execute(LABELS_QUERY, (cursor, chunk_rows)).fetchall()
+                    rows = self._labelled_rows(connections, backend.cold, batch)
+                else:
+                    batch = self._prediction_rows(connections, backend.cold, cursor, chunk_rows)
+                    rows = [(row[1:-1], row[-1]) for row in batch]
+                if not batch:
+                    if cursor == 0:
+                        where = pool.path if source == "labels" else \
+                            ", ".join(database.path for database in databases) + " or the archive"
+                        logger.warning("No %s rows to learn from in %s", source, where)
+                    break
+                X, y = self.to_arrays(rows)
+                self.partial_fit(X, y)
+                learned += len(y)
+                self.state["cursors"][source] = batch[-1][0]
+                self.save()
+                if len(batch) < chunk_rows:
+                    break
+        finally:
+            labels_conn.close()
+            for conn in connections:
+                conn.close()
+        return learned
+
+    # Register the current checkpoint as a model version
+    def publish(self, registry, activate=False):
+        if not self.fitted:
+            raise ValueError("Nothing to publish, the model has not seen any rows")
+
+        publish_dir = os.path.join(self.checkpoint_dir, "publish")
+        os.makedirs(publish_dir, exist_ok=True)
+        paths = [os.path.join(publish_dir, name)
+                 for name in ("skill_model.pkl", "scaler.pkl", "difficulty_encoder.pkl")]
+        joblib.dump(self.model, paths[0])
+        joblib.dump(self.scaler, paths[1])
+        joblib.dump(self.difficulty_encoder, paths[2])
+
+        version = registry.register(
+            *paths, note=f"online_training.py after {self.state['rows_seen']} rows"
+        )
+        if activate:
+            registry.activate(version)
+
+        self.state["published_version"] = version
+        self.state["rows_since_publish"] = 0
+        self.save()
+        return version
+
+
+# Command line: python online_training.py update | status
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally retrain from stored predictions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update")
+    update_parser.add_argument("--source", choices=SOURCES, default="labels")
+    update_parser.add_argument("--chunk-rows", type=int, default=ONLINE_CHUNK_ROWS)
+    update_parser.add_argument("--seed-data", nargs="+",
+                               help="CSV/Parquet files to fit first when no checkpoint exists")
+    update_parser.add_argument("--seed-epochs", type=int, default=5)
+    update_parser.add_argument("--publish", action="store_true",
+                               help="Register the updated model as a new version")
+    update_parser.add_argument("--min-rows", type=int, default=1,
+                               help="Only publish after at least this many new rows")
+    update_parser.add_argument("--activate", action="store_true")
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    trainer = OnlineTrainer()
+
+    if args.command == "status":
+        print(json.dumps({"fitted": trainer.fitted, **trainer.state}, indent=2))
+    else:
+        if not trainer.fitted and args.seed_data:
+            trainer.seed(args.seed_data, args.seed_epochs, args.chunk_rows)
+            print(f"Seeded from {', '.join(args.seed_data)}")
+
+        started = time.perf_counter()
+        learned = trainer.update(args.source, args.chunk_rows)
+        print(f"Learned from {learned} {args.source} rows in "
+              f"{time.perf_counter() - started:.2f} s (total {trainer.state['rows_seen']})")
+
+        if args.publish and trainer.state["rows_since_publish"] >= args.min_rows:
+            from model_registry import ModelRegistry
+
+            version = trainer.publish(ModelRegistry(), args.activate)
+            print(f"Published {version}" + (" and activated it" if args.activate else ""))
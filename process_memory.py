@@ -0,0 +1,126 @@
+import os
+
+# Per-process memory of the serving processes, read from Linux /proc.
+#
+# RSS counts every resident page a process maps, so summing RSS over
+# workers counts shared pages (preloaded libraries, memory-mapped model
+# arrays) once per worker. PSS splits each shared page evenly between the
+# processes mapping it; summed over workers it is their real footprint.
+
+FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_clean_bytes",
+    "Shared_Dirty": "shared_dirty_bytes",
+    "Private_Clean": "private_clean_bytes",
+    "Private_Dirty": "private_dirty_bytes",
+    "Swap": "swap_bytes",
+}
+
+# Helper processes multiprocessing starts next to uvicorn's workers
+HELPER_MARKERS = (b"resource_tracker", b"forkserver")
+
+AVAILABLE = os.path.exists("/proc/self/smaps_rollup") or os.path.exists("/proc/self/smaps")
+
+
+# Memory of one process in bytes, or None when it cannot be read.
+# smaps_rollup (Linux 4.14+) is one pre-summed record; older kernels list
+# every mapping in smaps.
+def read_memory(pid):
+    usage = dict.fromkeys(FIELDS.values(), 0)
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            with open(f"/proc/{pid}/{name}") as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    if key in FIELDS:
+                        usage[FIELDS[key]] += int(rest.split()[0]) * 1024
+            return usage
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return None
+    return None
+
+
+def parent_pid(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            return int(f.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def command_line(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def child_pids(pid):
+    return [
+        int(name) for name in os.listdir("/proc")
+        if name.isdigit() and parent_pid(int(name)) == pid
+    ]
+
+
+# Worker processes of a supervisor: its children, minus multiprocessing
+# helpers
+def worker_pids(supervisor):
+    workers = []
+    for pid in child_pids(supervisor):
+        line = command_line(pid)
+        if line is not None and not any(marker in line for marker in HELPER_MARKERS):
+            workers.append(pid)
+    return sorted(workers)
+
+
+# The supervisor of this worker when it runs as one of several workers
+# (serve.py or uvicorn --workers), else None. A supervisor is a Python
+# process; a shell that started several servers is not one.
+def current_supervisor():
+    supervisor = os.getppid()
+    line = command_line(supervisor) or b""
+    if b"python" not in os.path.basename(line.split(b"\0")[0]):
+        return None
+    return supervisor if os.getpid() in worker_pids(supervisor) else None
+
+
+def memory_report(supervisor=None, workers=None):
+    if supervisor is None and workers is None:
+        supervisor = current_supervisor()
+    if workers is None:
+        workers = worker_pids(supervisor) if supervisor is not None else [os.getpid()]
+
+    processes = []
+    roles = ([(supervisor, "supervisor")] if supervisor is not None else []) \
+        + [(pid, "worker") for pid in workers]
+    for pid, role in roles:
+        usage = read_memory(pid)
+        if usage is not None:
+            processes.append({"pid": pid, "role": role, **usage})
+
+    worker_usage = [p for p in processes if p["role"] == "worker"]
+    return {
+        "workers": len(worker_usage),
+        "processes": processes,
+        "total_rss_bytes": sum(p["rss_bytes"] for p in processes),
+        "total_pss_bytes": sum(p["pss_bytes"] for p in processes),
+        "worker_pss_bytes": sum(p["pss_bytes"] for p in worker_usage),
+    }
+
+
+def render_report(report):
+    lines = [f"{'pid':>8} {'role':<10} {'rss MiB':>9} {'pss MiB':>9} "
+             f"{'shared MiB':>11} {'private MiB':>12}"]
+    for p in report["processes"]:
+        shared = p["shared_clean_bytes"] + p["shared_dirty_bytes"]
+        private = p["private_clean_bytes"] + p["private_dirty_bytes"]
+        lines.append(f"{p['pid']:>8} {p['role']:<10} {p['rss_bytes'] / 2**20:9.1f} "
+                     f"{p['pss_bytes'] / 2**20:9.1f} {shared / 2**20:11.1f} {private / 2**20:12.1f}")
+    lines.append(f"{'total':>8} {'':<10} {report['total_rss_bytes'] / 2**20:9.1f} "
+                 f"{report['total_pss_bytes'] / 2**20:9.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,176 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# On-demand profiling of the running server, driven by POST /admin/profile.
+#
+# "sample": a background thread snapshots every thread's Python stack
+#   (sys._current_frames) every few milliseconds for a bounded window and
+#   counts identical stacks. The result is collapsed-stack text that
+#   flamegraph.pl, speedscope or inferno render directly. The cost is
+#   paid by the sampler thread only.
+# "cprofile": for the window, a sampled fraction of the blocking calls
+#   requests hand to serving.run_db / run_inference run under cProfile,
+#   one at a time, and their stats are merged. The result is a pstats dump (open it with
+#   pstats or snakeviz) or the top functions as text.
+#
+# Only one profile runs at a time, and windows are capped at
+# PROFILE_MAX_SECONDS.
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Leaf frames of threads that are waiting rather than working: idle
+# executor workers, the event loop's poll and pooled connection waits
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+_session = threading.Lock()
+
+
+def frame_label(code):
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_name}"
+
+
+# Root-first ';'-joined stack for one frame
+def collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def is_idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+
+    # Sample every other thread until the window ends; returns stack counts
+    def run(self, seconds: float):
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = Counter()
+        deadline = time.perf_counter() + seconds
+
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_thread:
+                    continue
+                if not self.include_idle and is_idle(frame):
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                thread_name = names.get(ident, str(ident)).split("_")[0]
+                stacks[f"{thread_name};{collapse(frame)}"] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        return stacks
+
+
+def render_collapsed(stacks):
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# cProfile for a random fraction of calls, merged across threads. From
+# Python 3.12 only one profiler can be active per process, so a sampled
+# call that overlaps a profiled one runs unprofiled.
+class CallProfiler:
+
+    def __init__(self):
+        self.active = False
+        self.fraction = 1.0
+        self.calls = 0
+        self.profiled = 0
+        self.skipped = 0
+        self._stats = None
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+
+    def start(self, fraction: float):
+        with self._lock:
+            self.fraction = fraction
+            self.calls = 0
+            self.profiled = 0
+            self.skipped = 0
+            self._stats = None
+            self.active = True
+
+    def stop(self):
+        with self._lock:
+            self.active = False
+            stats, self._stats = self._stats, None
+        return stats
+
+    def call(self, fn, *args):
+        self.calls += 1
+        if not self.active or random.random() >= self.fraction:
+            return fn(*args)
+        if not self._profiling.acquire(blocking=False):
+            self.skipped += 1
+            return fn(*args)
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args)
+        finally:
+            profile.create_stats()
+            self._profiling.release()
+            with self._lock:
+                if self.active:
+                    self.profiled += 1
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profile)
+                    else:
+                        self._stats.add(profile)
+
+
+call_profiler = CallProfiler()
+
+
+# Binary dump readable by pstats.Stats(path) and snakeviz
+def dump_pstats(stats):
+    return marshal.dumps(stats.stats)
+
+
+def render_pstats_text(stats, limit=50):
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.sort_stats("cumulative").print_stats(limit)
+    return buffer.getvalue()
+
+
+def try_begin():
+    return _session.acquire(blocking=False)
+
+
+def end():
+    _session.release()
@@ -0,0 +1,147 @@
+import numpy as np
+
+from compact_schema import LOCAL_TIME_SQL, SKILL_CODES
+
+# Progress series for charts: numeric skill values per prediction or per
+# day/week/month bucket, aggregated in SQL and optionally downsampled with
+# Largest-Triangle-Three-Buckets (LTTB), which keeps peaks and troughs that
+# plain striding would drop.
+
+SKILL_VALUES = {"Beginner": 1, "Intermediate": 2, "Advanced": 3}
+
+# Stored skill codes are the chart values; any other code has no value
+SKILL_VALUE_SQL = (
+    "CASE WHEN skill IN ("
+    + ", ".join(str(SKILL_CODES[skill]) for skill in SKILL_VALUES)
+    + ") THEN skill END"
+)
+
+# Local bucket start date for each prediction. Weeks start on Monday.
+BUCKET_SQL = {
+    "day": "date(created_at, 'unixepoch', 'localtime')",
+    "week": "date(created_at, 'unixepoch', 'localtime', 'weekday 0', '-6 days')",
+    "month": "date(created_at, 'unixepoch', 'localtime', 'start of month')",
+}
+
+
+# Local midnight (epoch seconds) of each prediction's day. Bucketing a
+# day's predictions at its midnight gives the same buckets as bucketing
+# them one by one.
+DAY_SQL = "CAST(strftime('%s', date(created_at, 'unixepoch', 'localtime'), 'utc') AS INTEGER)"
+
+
+# Returns (dates, epoch seconds, skill values, predictions per point) for
+# one students.id (None for a name with no predictions). Without a bucket
+# every prediction is a point and counts are all 1. mode picks the most
+# frequent level in a bucket, ties going to the higher level.
+def get_progress_series(conn, student_id, bucket=None, agg="mean"):
+    if bucket is None:
+        rows = conn.execute(f"""
+            SELECT {LOCAL_TIME_SQL.format("created_at")}, created_at, {SKILL_VALUE_SQL}, 1
+            FROM predictions_compact
+            WHERE student_id = ?
+            ORDER BY created_at, id
+        """, (student_id,)).fetchall()
+        return _series(rows)
+    return _bucketed_series(conn, """
+        SELECT created_at, skill, 1 AS n FROM predictions_compact WHERE student_id = ?
+    """, (student_id,), bucket, agg)
+
+
+# One student's (local midnight, skill code, predictions) per day and skill
+def get_progress_days(conn, student_id):
+    return conn.execute(f"""
+        SELECT {DAY_SQL}, skill, COUNT(*)
+        FROM predictions_compact
+        WHERE student_id = ?
+        GROUP BY 1, 2
+    """, (student_id,)).fetchall()
+
+
+# The bucketed series of a progress_points (created_at, skill, n) table,
+# each row standing for n predictions with that skill code at that time
+def get_points_series(conn, bucket, agg="mean"):
+    return _bucketed_series(conn, "SELECT created_at, skill, n FROM progress_points", (),
+                            bucket, agg)
+
+
+def _bucketed_series(conn, points, params, bucket, agg):
+    if agg == "mean":
+        rows = conn.execute(f"""
+            WITH points AS ({points})
+            SELECT {BUCKET_SQL[bucket]} AS bucket,
+                   CAST(strftime('%s', {BUCKET_SQL[bucket]}) AS INTEGER),
+                   SUM({SKILL_VALUE_SQL} * n) * 1.0
+                       / SUM(CASE WHEN {SKILL_VALUE_SQL} IS NOT NULL THEN n END),
+                   SUM(n)
+            FROM points
+            GROUP BY bucket
+            ORDER BY bucket
+        """, params).fetchall()
+    else:
+        rows = conn.execute(f"""
+            WITH points AS ({points}),
+            counts AS (
+                SELECT {BUCKET_SQL[bucket]} AS bucket,
+                       {SKILL_VALUE_SQL} AS skill_value,
+                       SUM(n) AS n
+                FROM points
+                GROUP BY bucket, skill_value
+            ),
+            ranked AS (
+                SELECT bucket, skill_value,
+                       SUM(n) OVER (PARTITION BY bucket) AS total,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY bucket ORDER BY n DESC, skill_value DESC
+                       ) AS rank
+                FROM counts
+            )
+            SELECT bucket, CAST(strftime('%s', bucket) AS INTEGER), skill_value, total
+            FROM ranked
+            WHERE rank = 1
+            ORDER BY bucket
+        """, params).fetchall()
+    return _series(rows)
+
+
+def _series(rows):
+    # Rows with an unknown skill label have no numeric value
+    rows = [row for row in rows if row[2] is not None]
+    dates = [row[0] for row in rows]
+    x = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    y = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    counts = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+    return dates, x, y, counts
+
+
+# Indexes of at most max_points points chosen by LTTB. The first and last
+# points are always kept; each bucket in between keeps the point forming
+# the largest triangle with the previously kept point and the next
+# bucket's average. max_points must be at least 3.
+def lttb(x, y, max_points):
+    n = len(x)
+    if max_points >= n:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
@@ -0,0 +1,189 @@
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pre-fork multi-worker server, the memory-friendly alternative to
+# uvicorn main:app --workers N (which spawns fresh interpreters that each
+# import every library and load the model again).
+#
+# The parent binds the listening socket, imports the libraries and project
+# modules, loads the active model version and freezes the garbage
+# collector, then forks the workers. Each worker imports main and serves
+# on the shared socket. Imported code and the loaded bundle stay shared
+# copy-on-write pages, and the compiled forest arrays are memory-mapped, so
+# every worker reads the same page-cache copy.
+#
+# main itself is only imported after the fork: it opens SQLite connections
+# and may start the write-behind thread, neither of which survive a fork.
+#
+#     python serve.py --workers 4 --port 8000
+#     kill -USR1 <parent pid>     # print per-worker RSS / PSS
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+# 0 forks without preloading, for comparison
+SERVE_PRELOAD = os.getenv("SERVE_PRELOAD", "1") != "0"
+
+# Imported by the parent so workers share them instead of each importing
+# its own copy. Everything main imports, minus main.
+PRELOAD_MODULES = (
+    "numpy",
+    "fastapi",
+    "fastapi.responses",
+    "pydantic",
+    "starlette.middleware",
+    "db",
+    "compact_schema",
+    "migrations",
+    "summaries",
+    "archive",
+    "storage",
+    "export",
+    "inference",
+    "forest",
+    "model_registry",
+    "serving",
+    "write_behind",
+    "auth",
+    "metrics",
+    "profiler",
+    "progress",
+    "process_memory",
+)
+
+# A worker exiting sooner than this after starting is treated as a crash
+# loop and not restarted
+MIN_WORKER_SECONDS = 5.0
+
+
+def preload():
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    import model_registry
+    model_registry.preload()
+
+    # Objects created so far are never collected; keeping the collector
+    # away from them stops it dirtying (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+
+
+def bind(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, args):
+    config = uvicorn.Config("main:app", host=args.host, port=args.port,
+                            log_level=args.log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            # uvicorn installs its own SIGINT / SIGTERM handlers; a
+            # report request sent to the whole group must not kill workers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            code = 0
+            try:
+                run_worker(self.sock, self.args)
+            except BaseException:
+                code = 1
+                traceback.print_exc()
+            finally:
+                # Never fall back into the parent's code
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(self, signum=None, frame=None):
+        import process_memory
+        if not process_memory.AVAILABLE:
+            print("Memory reporting needs Linux /proc", file=sys.stderr)
+            return
+        report = process_memory.memory_report(os.getpid(), sorted(self.workers))
+        print(process_memory.render_report(report), file=sys.stderr, flush=True)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.report)
+
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f"Supervisor {os.getpid()} serving on {self.args.host}:{self.args.port} "
+              f"with {self.args.workers} workers (preload {'on' if self.args.preload else 'off'})",
+              file=sys.stderr, flush=True)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            if time.monotonic() - started < MIN_WORKER_SECONDS:
+                print(f"Worker {pid} exited during startup; shutting down", file=sys.stderr)
+                self.stop(None, None)
+                continue
+            print(f"Worker {pid} exited with status {status}; restarting", file=sys.stderr)
+            self.spawn()
+
+
+# Command line: python serve.py [--workers N] [--no-preload]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve main:app with pre-forked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=SERVE_PRELOAD)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    # Workers must sign sessions with one key. Without a configured secret
+    # they share a random one, so logins end when the server restarts.
+    if not os.getenv("SESSION_SECRET"):
+        import secrets
+        os.environ["SESSION_SECRET"] = secrets.token_hex(32)
+        print("SESSION_SECRET is not set; sessions will not survive a restart",
+              file=sys.stderr)
+
+    sock = bind(args.host, args.port)
+    if args.preload:
+        preload()
+    Supervisor(sock, args).run()
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from profiler import call_profiler
+
+load_dotenv()
+
+# "threadpool": blocking work runs in FastAPI's shared default threadpool.
+# "async": database calls and model inference each get their own bounded
+# executor, so slow SQLite I/O cannot starve inference and vice versa.
+SERVING_MODE = os.getenv("SERVING_MODE", "threadpool")
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+# 0 runs inference inline on the event loop (it is a few microseconds)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+db_executor = None
+inference_executor = None
+
+if SERVING_MODE == "async":
+    db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+    if INFERENCE_WORKERS > 0:
+        inference_executor = ThreadPoolExecutor(
+            max_workers=INFERENCE_WORKERS, thread_name_prefix="inference"
+        )
+elif SERVING_MODE != "threadpool":
+    raise ValueError(f"Unknown SERVING_MODE {SERVING_MODE!r}, use 'threadpool' or 'async'")
+
+
+# Run a blocking database call without blocking the event loop
+async def run_db(fn, *args):
+    # While a cProfile window is open, route calls through the profiler
+    if call_profiler.active:
+        fn, args = call_profiler.call, (fn, *args)
+    if db_executor is None:
+        return await run_in_threadpool(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(db_executor, partial(fn, *args))
+
+
+# Run model inference without blocking the event loop
+async def run_inference(fn, *args):
+    if call_profiler.active:
+        fn, args = call_profiler.call, (fn, *args)
+    if SERVING_MODE == "async" and inference_executor is None:
+        return fn(*args)
+    if inference_executor is None:
+        return await run_in_threadpool(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(
+        inference_executor, partial(fn, *args)
+    )
+
+
+def shutdown():
+    for executor in (db_executor, inference_executor):
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,981 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from dotenv import load_dotenv
+
+import archive
+import export
+import progress
+import summaries
+from compact_schema import (
+    DECODED_COLUMNS_SQL,
+    DECODED_FROM_SQL,
+    DIFFICULTY_CODES,
+    LOCAL_TIME_SQL,
+    NEXT_ID_SQL,
+    SKILL_CODES,
+    CodeTable,
+    create_compact_schema,
+    local_time,
+)
+from db import DB_NAME, DB_POOL_SIZE, ConnectionPool
+
+load_dotenv()
+
+# Storage backends for predictions. main.py reads and writes predictions
+# only through one of these; students, sessions and labels stay in the
+# application database.
+#
+# "sqlite"   every prediction in the application database (DB_NAME)
+# "sharded"  predictions spread over several SQLite files by a hash of the
+#            student name, so writes for different students take
+#            different write locks. One student's rows all live in one
+#            shard: per-student reads touch one file, global reads query
+#            every shard in parallel and merge.
+#
+# Whichever backend is configured, open_backend wraps it in
+# ArchivedStorage, which adds the rows archive.py has moved to Parquet.
+#
+# The shard files are recorded in the application database's
+# storage_shards table. The first sharded start creates DB_SHARDS of them
+# next to DB_NAME; change the count (or move an existing single database
+# into shards) with
+#     python storage.py rebalance --shards 8
+# while the servers are stopped.
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+DB_SHARDS = int(os.getenv("DB_SHARDS", "4"))
+# Threads per process querying shards in parallel
+STORAGE_FANOUT_WORKERS = int(os.getenv("STORAGE_FANOUT_WORKERS", "8"))
+REBALANCE_BATCH_STUDENTS = 500
+
+# Sharded ids are (epoch milliseconds * ID_SEQUENCE + sequence) *
+# MAX_SHARDS + shard index, so they are unique across shards, survive
+# rebalancing unchanged and sort in time order across shards. A shard
+# hands out at most ID_SEQUENCE ids per millisecond and waits for the next
+# one when they are used up, so its ids never run ahead of the clock and
+# rows written later to any shard get higher ids.
+MAX_SHARDS = 64
+ID_SEQUENCE = 4096
+
+HISTORY_COLUMNS = [
+    "id",
+    "name",
+    "marks",
+    "accuracy",
+    "time_taken",
+    "attempts",
+    "difficulty_level",
+    "topic_coverage",
+    "consistency_score",
+    "predicted_skill",
+    "created_at",
+    "model_version",
+]
+
+# Summary tables whose rows add up across shards, with their key column count
+ADDITIVE_SUMMARIES = {
+    "summary_skill": 1,
+    "summary_difficulty_skill": 2,
+    "summary_month_skill": 2,
+    "summary_skill_consistency": 2,
+}
+
+SHARD_STUDENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL
+    )
+"""
+
+
+# Keyset conditions for before_id / after_id paging. Pages are always
+# returned newest first; after_id pages are read oldest first from the
+# index and reversed.
+def keyset_clause(before_id: int = None, after_id: int = None):
+    if after_id is not None:
+        return "p.id > ?", [after_id], "ASC"
+    if before_id is not None:
+        return "p.id < ?", [before_id], "DESC"
+    return None, [], "DESC"
+
+
+# Merge history pages (each newest first) into one. An after_id page is
+# the oldest rows past the cursor, so it keeps the merged tail.
+def merge_pages(pages, limit, after_id=None):
+    merged = list(heapq.merge(*pages, key=itemgetter("id"), reverse=True))
+    if limit < 0:
+        return merged
+    if after_id is not None:
+        return merged[max(0, len(merged) - limit):]
+    return merged[:limit]
+
+
+# Predictions in one SQLite database with the compact schema
+class SQLiteStorage:
+
+    # id_slot is the shard index when this database is a shard
+    def __init__(self, pool, id_slot=None):
+        self.pool = pool
+        self.id_slot = id_slot
+        self.students = CodeTable("students", "username", "id")
+        self.difficulty_levels = CodeTable("difficulty_levels", "label", "code", DIFFICULTY_CODES)
+        self.skill_levels = CodeTable("skill_levels", "label", "code", SKILL_CODES)
+
+    def _next_ids(self, conn, count):
+        first = conn.execute(NEXT_ID_SQL).fetchone()[0]
+        if self.id_slot is None:
+            return range(first, first + count)
+
+        step = ID_SEQUENCE * MAX_SHARDS
+        ids = []
+        while len(ids) < count:
+            now = int(time.time() * 1000)
+            start = max(first, now * step)
+            start += (self.id_slot - start) % MAX_SHARDS
+            # This millisecond's remaining ids, none once first is past it
+            available = max(0, ((now + 1) * step - start + MAX_SHARDS - 1) // MAX_SHARDS)
+            if not available:
+                time.sleep(0.0005)
+                continue
+            taken = min(count - len(ids), available)
+            ids.extend(range(start, start + taken * MAX_SHARDS, MAX_SHARDS))
+            first = ids[-1] + 1
+        return ids
+
+    # rows are (name, marks, accuracy, time_taken, attempts,
+    # difficulty_level, topic_coverage, consistency_score,
+    # predicted_skill, created_at epoch, model_version)
+    def _store(self, conn, ids, rows, verb="INSERT"):
+        codes = (
+            self.students.resolve(conn, [row[0] for row in rows]),
+            self.difficulty_levels.resolve(conn, [row[5] for row in rows]),
+            self.skill_levels.resolve(conn, [row[8] for row in rows]),
+        )
+        student_ids, difficulty_codes, skill_codes = codes
+        conn.executemany(f"""
+            {verb} INTO predictions_compact (
+                student_id,
+                created_at,
+                id,
+                marks,
+                accuracy,
+                time_taken,
+                attempts,
+                difficulty,
+                topic_coverage,
+                consistency_score,
+                skill,
+                model_version
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (student_ids[row[0]], row[9], prediction_id, row[1], row[2], row[3], row[4],
+             difficulty_codes[row[5]], row[6], row[7], skill_codes[row[8]], row[10])
+            for prediction_id, row in zip(ids, rows)
+        ])
+        return codes
+
+    # Cached codes are only remembered once the transaction has committed
+    def _remember(self, codes):
+        for table, resolved in zip((self.students, self.difficulty_levels, self.skill_levels),
+                                   codes):
+            table.remember(resolved)
+
+    # Insert rows in one transaction, keeping the summary tables in step.
+    # Ids are allocated under the write lock.
+    def insert_predictions(self, rows):
+        with self.pool.write_transaction() as conn:
+            codes = self._store(conn, self._next_ids(conn, len(rows)), rows)
+            local_times = {epoch: local_time(epoch) for epoch in {row[9] for row in rows}}
+            summaries.record_predictions(
+                conn,
+                [(row[0], row[5], row[7], row[8], local_times[row[9]]) for row in rows]
+            )
+        self._remember(codes)
+
+    # Rows moved in from another database keep their ids; existing ids are
+    # skipped so an interrupted move can be repeated. Summaries are left
+    # to a rebuild once the move is done.
+    def import_predictions(self, ids, rows):
+        with self.pool.write_transaction() as conn:
+            codes = self._store(conn, ids, rows, "INSERT OR IGNORE")
+        self._remember(codes)
+
+    def history(self, name: str = None, limit: int = 50,
+                before_id: int = None, after_id: int = None):
+        conditions = []
+        params = []
+
+        keyset, keyset_params, direction = keyset_clause(before_id, after_id)
+        if keyset:
+            conditions.append(keyset)
+            params.extend(keyset_params)
+
+        with self.pool.connection() as conn:
+            if name:
+                student_id = self.students.lookup(conn, name)
+                if student_id is None:
+                    return []
+                conditions.append("p.student_id = ?")
+                params.append(student_id)
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            # Decoded columns come back in HISTORY_COLUMNS order
+            rows = conn.execute(f"""
+                SELECT {DECODED_COLUMNS_SQL}
+                FROM {DECODED_FROM_SQL}
+                {where}
+                ORDER BY p.id {direction}
+                LIMIT ?
+            """, (*params, limit)).fetchall()
+
+        if direction == "ASC":
+            rows.reverse()
+
+        return [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
+
+    def user_progress(self, name: str, limit: int = None,
+                      before_id: int = None, after_id: int = None):
+        conditions = ["student_id = ?"]
+        params = []
+        direction = "ASC"
+
+        # Cursor rows are located by id, then compared on (created_at, id),
+        # which is the student's clustered key order
+        if after_id is not None:
+            conditions.append(
+                "(created_at, id) > (SELECT created_at, id FROM predictions_compact WHERE id = ?)"
+            )
+            params.append(after_id)
+        elif before_id is not None:
+            conditions.append(
+                "(created_at, id) < (SELECT created_at, id FROM predictions_compact WHERE id = ?)"
+            )
+            params.append(before_id)
+            direction = "DESC"
+
+        with self.pool.connection() as conn:
+            student_id = self.students.lookup(conn, name)
+            if student_id is None:
+                return []
+
+            rows = conn.execute(f"""
+                SELECT
+                    id,
+                    {LOCAL_TIME_SQL.format("created_at")},
+                    skill
+                FROM predictions_compact
+                WHERE {" AND ".join(conditions)}
+                ORDER BY created_at {direction}, id {direction}
+                LIMIT ?
+            """, (student_id, *params, -1 if limit is None else limit)).fetchall()
+
+            skill_label = self.skill_levels.label
+            progress_rows = [
+                {"id": row[0], "date": row[1], "skill": skill_label(conn, row[2])}
+                for row in rows
+            ]
+
+        if direction == "DESC":
+            progress_rows.reverse()
+
+        return progress_rows
+
+    # Every (created_at, id, skill label) of one student, oldest first
+    def progress_rows(self, name: str):
+        with self.pool.connection() as conn:
+            student_id = self.students.lookup(conn, name)
+            if student_id is None:
+                return []
+            rows = conn.execute("""
+                SELECT created_at, id, skill FROM predictions_compact
+                WHERE student_id = ?
+                ORDER BY created_at, id
+            """, (student_id,)).fetchall()
+            skill_label = self.skill_levels.label
+            return [(row[0], row[1], skill_label(conn, row[2])) for row in rows]
+
+    def progress_series(self, name: str, bucket: str = None, agg: str = "mean"):
+        with self.pool.connection() as conn:
+            student_id = self.students.lookup(conn, name)
+            return progress.get_progress_series(conn, student_id, bucket, agg)
+
+    def progress_days(self, name: str):
+        with self.pool.connection() as conn:
+            student_id = self.students.lookup(conn, name)
+            if student_id is None:
+                return []
+            return progress.get_progress_days(conn, student_id)
+
+    def prediction_exists(self, prediction_id: int):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM predictions_compact WHERE id = ?",
+                                (prediction_id,)).fetchone() is not None
+
+    def skill_counts(self):
+        with self.pool.connection() as conn:
+            return summaries.get_skill_counts(conn)
+
+    def kpis(self):
+        with self.pool.connection() as conn:
+            return summaries.get_kpis(conn)
+
+    def difficulty_skill_counts(self):
+        with self.pool.connection() as conn:
+            return summaries.get_difficulty_skill_counts(conn)
+
+    def monthly_counts(self):
+        with self.pool.connection() as conn:
+            return summaries.get_monthly_counts(conn)
+
+    def leaderboard(self, limit: int = 5):
+        with self.pool.connection() as conn:
+            return summaries.get_leaderboard(conn, limit)
+
+    # Every analytics section of the admin dashboard from one snapshot
+    def dashboard(self, leaderboard_limit: int = 5):
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                return summaries.get_dashboard(conn, leaderboard_limit)
+            finally:
+                conn.rollback()
+
+    # Raw summary rows and the student count, for merging across shards
+    def summary_snapshot(self, tables, leaderboard_limit=None):
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                snapshot = {
+                    table: conn.execute(f"SELECT * FROM {table}").fetchall()
+                    for table in tables
+                }
+                snapshot["students"] = conn.execute(
+                    "SELECT COUNT(*) FROM summary_student"
+                ).fetchone()[0]
+                if leaderboard_limit is not None:
+                    snapshot["leaderboard"] = summaries.leaderboard_rows(conn, leaderboard_limit)
+            finally:
+                conn.rollback()
+        return snapshot
+
+    # Batches of export rows in id order. Raises ValueError for bad dates
+    # before anything is read.
+    def export_batches(self, name: str = None, start_date: str = None, end_date: str = None):
+        where, params = export.build_filters(name, start_date, end_date)
+        return export.iter_row_batches(where, params, path=self.pool.path)
+
+    def close(self):
+        self.pool.close()
+
+
+# Jump consistent hash (Lamping and Veach): going from n to n + 1 buckets
+# moves only 1 / (n + 1) of the keys, all of them into the new bucket
+def jump_hash(key, buckets):
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_index(name, shards):
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "little"), shards)
+
+
+def shard_path(index, database=DB_NAME):
+    root, extension = os.path.splitext(database)
+    return f"{root}.shard{index}{extension or '.db'}"
+
+
+def create_shard_schema(conn):
+    conn.execute(SHARD_STUDENTS_TABLE)
+    create_compact_schema(conn)
+    summaries.create_summary_tables(conn)
+    archive.create_archive_files(conn)
+
+
+# Open a shard's pool, creating its schema on first use. Concurrent
+# workers starting together create it once.
+def open_shard(path, size=DB_POOL_SIZE):
+    pool = ConnectionPool(path, size)
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            create_shard_schema(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return pool
+
+
+# Some shards of a sharded insert committed and others did not; rows are
+# the ones that were not written, so a retry does not duplicate the rest
+class PartialInsertError(RuntimeError):
+
+    def __init__(self, rows, cause):
+        super().__init__(f"{len(rows)} rows on failed shards were not written: {cause}")
+        self.rows = rows
+
+
+# Predictions hash-sharded over several SQLite files, each one a
+# SQLiteStorage. Writes to different shards run in parallel; a batch
+# spanning shards commits per shard, not atomically.
+class ShardedStorage:
+
+    def __init__(self, paths, pool_size=DB_POOL_SIZE):
+        self.paths = list(paths)
+        self.shards = [
+            SQLiteStorage(open_shard(path, pool_size), id_slot=index)
+            for index, path in enumerate(self.paths)
+        ]
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def shard(self, name):
+        return self.shards[shard_index(name, len(self.shards))]
+
+    # Call fn on every shard (or the given ones) at once and return the
+    # results in shard order. sqlite3 releases the GIL while a query runs,
+    # so the shards' queries overlap.
+    def _fan_out(self, fn, shards=None):
+        shards = self.shards if shards is None else shards
+        if len(shards) == 1:
+            return [fn(shards[0])]
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=min(STORAGE_FANOUT_WORKERS, len(self.shards)),
+                    thread_name_prefix="shard"
+                )
+        return list(self._executor.map(fn, shards))
+
+    def insert_predictions(self, rows):
+        groups = {}
+        for row in rows:
+            groups.setdefault(shard_index(row[0], len(self.shards)), []).append(row)
+
+        def insert(shard):
+            try:
+                shard.insert_predictions(groups[shard.id_slot])
+            except Exception as error:
+                return error
+
+        errors = self._fan_out(insert, [self.shards[index] for index in groups])
+        failed = [(index, error) for index, error in zip(groups, errors) if error is not None]
+        if len(failed) == len(groups):
+            raise failed[0][1]
+        if failed:
+            unwritten = [row for index, _ in failed for row in groups[index]]
+            raise PartialInsertError(unwritten, failed[0][1]) from failed[0][1]
+
+    def history(self, name: str = None, limit: int = 50,
+                before_id: int = None, after_id: int = None):
+        if name:
+            return self.shard(name).history(name, limit, before_id, after_id)
+
+        # k-way merge of each shard's page
+        pages = self._fan_out(lambda shard: shard.history(None, limit, before_id, after_id))
+        return merge_pages(pages, limit, after_id)
+
+    def user_progress(self, name: str, limit: int = None,
+                      before_id: int = None, after_id: int = None):
+        return self.shard(name).user_progress(name, limit, before_id, after_id)
+
+    def progress_rows(self, name: str):
+        return self.shard(name).progress_rows(name)
+
+    def progress_series(self, name: str, bucket: str = None, agg: str = "mean"):
+        return self.shard(name).progress_series(name, bucket, agg)
+
+    def progress_days(self, name: str):
+        return self.shard(name).progress_days(name)
+
+    def prediction_exists(self, prediction_id: int):
+        if prediction_id % MAX_SHARDS < len(self.shards):
+            shard = self.shards[prediction_id % MAX_SHARDS]
+            if shard.prediction_exists(prediction_id):
+                return True
+        # Rows keep their id when rebalancing moves them
+        return any(self._fan_out(lambda shard: shard.prediction_exists(prediction_id)))
+
+    # Per-shard summary rows added up into an in-memory database with the
+    # summary schema, so the summaries module's readers work unchanged
+    def _merged_summaries(self, tables, leaderboard_limit=None):
+        snapshots = self._fan_out(lambda shard: shard.summary_snapshot(tables, leaderboard_limit))
+
+        conn = sqlite3.connect(":memory:")
+        summaries.create_summary_tables(conn)
+        for table in tables:
+            keys = ADDITIVE_SUMMARIES[table]
+            totals = {}
+            for snapshot in snapshots:
+                for row in snapshot[table]:
+                    values = totals.setdefault(row[:keys], [0] * (len(row) - keys))
+                    for i, value in enumerate(row[keys:]):
+                        values[i] += value
+            if totals:
+                rows = [(*key, *values) for key, values in totals.items()]
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(rows[0]))})", rows
+                )
+
+        students = sum(snapshot["students"] for snapshot in snapshots)
+        leaderboard = None
+        if leaderboard_limit is not None:
+            # Students are disjoint across shards, so the overall top rows
+            # are among each shard's top rows
+            leaderboard = sorted(
+                (row for snapshot in snapshots for row in snapshot["leaderboard"]),
+                key=lambda row: (-row[1], row[0])
+            )[:leaderboard_limit]
+        return conn, students, leaderboard
+
+    def skill_counts(self):
+        conn, _, _ = self._merged_summaries(["summary_skill"])
+        return summaries.get_skill_counts(conn)
+
+    def kpis(self):
+        conn, students, _ = self._merged_summaries(["summary_skill"])
+        return {**summaries.get_kpis(conn), "total_students": students}
+
+    def difficulty_skill_counts(self):
+        conn, _, _ = self._merged_summaries(["summary_difficulty_skill"])
+        return summaries.get_difficulty_skill_counts(conn)
+
+    def monthly_counts(self):
+        conn, _, _ = self._merged_summaries(["summary_month_skill"])
+        return summaries.get_monthly_counts(conn)
+
+    def leaderboard(self, limit: int = 5):
+        _, _, rows = self._merged_summaries([], limit)
+        return summaries.format_leaderboard(rows)
+
+    def dashboard(self, leaderboard_limit: int = 5):
+        conn, students, rows = self._merged_summaries(list(ADDITIVE_SUMMARIES), leaderboard_limit)
+        dashboard = summaries.get_dashboard(conn, leaderboard_limit)
+        dashboard["kpis"]["total_students"] = students
+        dashboard["leaderboard"] = summaries.format_leaderboard(rows)
+        return dashboard
+
+    # Every shard's export merged back into id order
+    def export_batches(self, name: str = None, start_date: str = None, end_date: str = None):
+        if name:
+            return self.shard(name).export_batches(name, start_date, end_date)
+        sources = [shard.export_batches(None, start_date, end_date) for shard in self.shards]
+        return _rebatch(heapq.merge(*(_rows(batches) for batches in sources),
+                                    key=itemgetter(0)))
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        for shard in self.shards:
+            shard.close()
+
+
+def _rows(batches):
+    for batch in batches:
+        yield from batch
+
+
+def _rebatch(rows, batch_size=export.EXPORT_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Hot predictions in a backend together with the rows archive.py has moved
+# to Parquet. Reads and exports that can reach archived rows merge both;
+# writes and analytics (the summaries still count archived rows) go
+# straight to the backend. Hot rows are read before the manifest, so a row
+# the archive job moves meanwhile is seen at least once, and rows seen in
+# both are kept once.
+class ArchivedStorage:
+
+    def __init__(self, backend, pool, directory=archive.ARCHIVE_DIR):
+        self.backend = backend
+        pools = [pool] + [other for other in prediction_pools(backend) if other is not pool]
+        self.cold = archive.ColdStore(pools, directory)
+
+    def insert_predictions(self, rows):
+        self.backend.insert_predictions(rows)
+
+    def history(self, name: str = None, limit: int = 50,
+                before_id: int = None, after_id: int = None):
+        hot = self.backend.history(name, limit, before_id, after_id)
+        if limit == 0:
+            return hot
+
+        # Archived rows are only read where they could still make the page:
+        # past the cursor, and inside the hot page once that is full
+        if after_id is not None:
+            low, high = after_id, None
+            if 0 < limit <= len(hot):
+                high = hot[0]["id"]
+        else:
+            low, high = None, before_id
+            if 0 < limit <= len(hot):
+                low = hot[-1]["id"]
+
+        cold = self.cold.history(name, limit, low, high, oldest=after_id is not None)
+        if not cold:
+            return hot
+        seen = {row["id"] for row in hot}
+        return merge_pages([hot, [row for row in cold if row["id"] not in seen]], limit, after_id)
+
+    # Whether archive files can hold any of the student's rows: none when
+    # their bucket has no files or its aggregates show none of theirs
+    def _has_archived(self, name):
+        bucket = archive.student_bucket(name)
+        if not self.cold.files(bucket):
+            return False
+        return not self.cold.progress_recorded(bucket) or bool(self.cold.progress_days(name))
+
+    # A student's hot and archived (created_at, id, skill) rows, oldest first
+    def _progress_rows(self, name):
+        hot = self.backend.progress_rows(name)
+        rows = {row[1]: row for row in self.cold.progress_rows(name)}
+        rows.update((row[1], row) for row in hot)
+        return sorted(rows.values(), key=itemgetter(0, 1))
+
+    # A student's hot (day, skill code, predictions) and archived (day,
+    # skill label, predictions) counts, or None while some file of their
+    # bucket is not counted yet. Counts cannot drop rows seen twice, so
+    # they are read again if an archive batch committed in their bucket
+    # since its files were listed.
+    def _progress_days(self, name, files):
+        bucket = archive.student_bucket(name)
+        if not self.cold.progress_recorded(bucket):
+            return None
+        while True:
+            cold = self.cold.progress_days(name)
+            hot = self.backend.progress_days(name)
+            current = self.cold.files(bucket)
+            if current == files:
+                return hot, cold
+            files = current
+
+    def user_progress(self, name: str, limit: int = None,
+                      before_id: int = None, after_id: int = None):
+        hot = self.backend.user_progress(name, limit, before_id, after_id)
+        if not self._has_archived(name):
+            return hot
+        rows = self._progress_rows(name)
+
+        # Same cursor semantics as the SQL: rows after or before the cursor
+        # row in (created_at, id) order, nothing for an unknown cursor
+        cursor = after_id if after_id is not None else before_id
+        if cursor is not None:
+            position = next((i for i, row in enumerate(rows) if row[1] == cursor), None)
+            if position is None:
+                return []
+            rows = rows[position + 1:] if after_id is not None else rows[:position]
+
+        if limit is not None and limit >= 0:
+            # A before_id page is the rows just before the cursor
+            if after_id is None and before_id is not None:
+                rows = rows[max(0, len(rows) - limit):]
+            else:
+                rows = rows[:limit]
+        return [{"id": row[1], "date": local_time(row[0]), "skill": row[2]} for row in rows]
+
+    def progress_series(self, name: str, bucket: str = None, agg: str = "mean"):
+        files = self.cold.files(archive.student_bucket(name))
+        if not files:
+            return self.backend.progress_series(name, bucket, agg)
+
+        # Buckets from the per-day counts, which archived months have in
+        # archive_progress, so no archive file is opened
+        days = self._progress_days(name, files) if bucket is not None else None
+        if days is not None:
+            hot, cold = days
+            conn = sqlite3.connect(":memory:")
+            try:
+                conn.execute("CREATE TABLE progress_points "
+                             "(created_at INTEGER, skill INTEGER, n INTEGER)")
+                conn.executemany("INSERT INTO progress_points VALUES (?, ?, ?)", hot)
+                conn.executemany("INSERT INTO progress_points VALUES (?, ?, ?)",
+                                 [(day, SKILL_CODES.get(skill), n) for day, skill, n in cold])
+                return progress.get_points_series(conn, bucket, agg)
+            finally:
+                conn.close()
+
+        # Without a bucket every prediction is a point, and files not yet
+        # counted are read
+        series = self.backend.progress_series(name, bucket, agg)
+        if not self._has_archived(name):
+            return series
+        rows = self._progress_rows(name)
+
+        # The student's rows in an in-memory predictions_compact, so the
+        # progress module's SQL runs unchanged
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE TABLE predictions_compact "
+                         "(student_id INTEGER, created_at INTEGER, id INTEGER, skill INTEGER)")
+            conn.executemany("INSERT INTO predictions_compact VALUES (1, ?, ?, ?)",
+                             [(row[0], row[1], SKILL_CODES.get(row[2])) for row in rows])
+            return progress.get_progress_series(conn, 1, bucket, agg)
+        finally:
+            conn.close()
+
+    def prediction_exists(self, prediction_id: int):
+        return self.backend.prediction_exists(prediction_id) or self.cold.contains(prediction_id)
+
+    def skill_counts(self):
+        return self.backend.skill_counts()
+
+    def kpis(self):
+        return self.backend.kpis()
+
+    def difficulty_skill_counts(self):
+        return self.backend.difficulty_skill_counts()
+
+    def monthly_counts(self):
+        return self.backend.monthly_counts()
+
+    def leaderboard(self, limit: int = 5):
+        return self.backend.leaderboard(limit)
+
+    def dashboard(self, leaderboard_limit: int = 5):
+        return self.backend.dashboard(leaderboard_limit)
+
+    # Hot and archived rows merged in id order. Date errors are raised
+    # here, before the response starts.
+    def export_batches(self, name: str = None, start_date: str = None, end_date: str = None):
+        hot = self.backend.export_batches(name, start_date, end_date)
+        return _rebatch(self._export_rows(_rows(hot), name, *export.epoch_range(start_date,
+                                                                                end_date)))
+
+    def _export_rows(self, hot, name, start, end):
+        # The first hot row starts every read before the manifest is read
+        first = next(hot, None)
+        if first is not None:
+            hot = itertools.chain([first], hot)
+        previous = None
+        for row in heapq.merge(hot, self.cold.export_rows(name, start, end), key=itemgetter(0)):
+            if row[0] != previous:
+                yield row
+            previous = row[0]
+
+    def close(self):
+        self.backend.close()
+
+
+# The databases a backend keeps hot predictions in
+def prediction_pools(backend):
+    if isinstance(backend, ArchivedStorage):
+        backend = backend.backend
+    if isinstance(backend, ShardedStorage):
+        return [shard.pool for shard in backend.shards]
+    return [backend.pool]
+
+
+def read_layout(conn):
+    return [path for _, path in conn.execute(
+        "SELECT shard, path FROM storage_shards ORDER BY shard"
+    ).fetchall()]
+
+
+def write_layout(conn, paths):
+    conn.execute("DELETE FROM storage_shards")
+    conn.executemany("INSERT INTO storage_shards (shard, path) VALUES (?, ?)",
+                     list(enumerate(paths)))
+
+
+# The backend STORAGE_BACKEND selects, over the application database
+# pool, with archived predictions included
+def open_backend(pool, backend=STORAGE_BACKEND):
+    with pool.connection() as conn:
+        layout = read_layout(conn)
+
+    if backend == "sqlite":
+        if layout:
+            raise RuntimeError(f"Predictions are sharded over {len(layout)} files; "
+                               "set STORAGE_BACKEND=sharded")
+        return ArchivedStorage(SQLiteStorage(pool), pool)
+
+    if backend == "sharded":
+        if not layout:
+            with pool.write_transaction() as conn:
+                layout = read_layout(conn)
+                if not layout:
+                    if conn.execute("SELECT 1 FROM predictions_compact LIMIT 1").fetchone():
+                        raise RuntimeError("The database already holds predictions; move them "
+                                           "into shards with python storage.py rebalance")
+                    layout = [shard_path(index, pool.path) for index in range(DB_SHARDS)]
+                    write_layout(conn, layout)
+        return ArchivedStorage(ShardedStorage(layout), pool)
+
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, use 'sqlite' or 'sharded'")
+
+
+# Move every student whose shard changes into its new shard, then record
+# the new layout. Run with the servers stopped. Rows are copied before
+# they are deleted, so an interrupted run loses nothing and can simply be
+# repeated. Returns the number of rows moved.
+def rebalance(pool, shards, batch_students=REBALANCE_BATCH_STUDENTS, report=print):
+    if not 1 <= shards <= MAX_SHARDS:
+        raise ValueError(f"shards must be between 1 and {MAX_SHARDS}")
+
+    with pool.connection() as conn:
+        sources = read_layout(conn) or [pool.path]
+    targets = [shard_path(index, pool.path) for index in range(shards)]
+
+    # One store per file, however its path is spelled
+    stores = {os.path.abspath(pool.path): SQLiteStorage(pool)}
+    for index, path in enumerate(targets):
+        stores[os.path.abspath(path)] = SQLiteStorage(open_shard(path), id_slot=index)
+
+    def store(path):
+        key = os.path.abspath(path)
+        if key not in stores:
+            stores[key] = SQLiteStorage(open_shard(path))
+        return stores[key]
+
+    moved = 0
+    touched = set()
+    for source_path in sources:
+        source = store(source_path)
+
+        with source.pool.connection() as conn:
+            students = conn.execute("""
+                SELECT id, username FROM students s
+                WHERE EXISTS (SELECT 1 FROM predictions_compact p WHERE p.student_id = s.id)
+            """).fetchall()
+
+        leaving = {}
+        for student_id, name in students:
+            target = targets[shard_index(name, shards)]
+            if store(target) is not source:
+                leaving.setdefault(target, []).append(student_id)
+
+        for target, student_ids in leaving.items():
+            for start in range(0, len(student_ids), batch_students):
+                batch = student_ids[start:start + batch_students]
+                placeholders = ", ".join("?" * len(batch))
+                with source.pool.connection() as conn:
+                    rows = conn.execute(f"""
+                        SELECT p.id, s.username, p.marks, p.accuracy, p.time_taken, p.attempts,
+                               d.label, p.topic_coverage, p.consistency_score, k.label,
+                               p.created_at, p.model_version
+                        FROM {DECODED_FROM_SQL}
+                        WHERE p.student_id IN ({placeholders})
+                        ORDER BY p.id
+                    """, batch).fetchall()
+                store(target).import_predictions([row[0] for row in rows],
+                                                  [row[1:] for row in rows])
+                with source.pool.transaction() as conn:
+                    conn.execute(f"DELETE FROM predictions_compact WHERE student_id IN ({placeholders})",
+                                 batch)
+                moved += len(rows)
+            touched.update((source, store(target)))
+        report(f"{source_path}: {len(students)} students, "
+               f"{sum(len(ids) for ids in leaving.values())} moved")
+
+    # Archived rows count in the summaries of their student's shard,
+    # which may have changed for students with no hot rows left, so with
+    # an archive every database is rebuilt
+    cold = archive.ColdStore([opened.pool for opened in stores.values()])
+    archived = bool(cold.files())
+    if archived:
+        touched.update(stores.values())
+    slots = {os.path.abspath(path): index for index, path in enumerate(targets)}
+    for changed in touched:
+        slot = slots.get(os.path.abspath(changed.pool.path))
+        cold_rows = None
+        if archived:
+            cold_rows = cold.summary_rows(lambda name: shard_index(name, shards) == slot)
+        with changed.pool.write_transaction() as conn:
+            summaries.rebuild_summaries(conn, cold_rows)
+
+    kept = {os.path.abspath(path) for path in targets + [pool.path]}
+    retired = [path for path in sources if os.path.abspath(path) not in kept]
+
+    # Retired databases' archive manifests and progress counts move to the
+    # application database
+    for path in retired:
+        with store(path).pool.connection() as conn:
+            entries = conn.execute("SELECT * FROM archive_files").fetchall()
+            counts = {(name, day, skill): count for name, day, skill, count in conn.execute("""
+                SELECT s.username, a.day, k.label, a.prediction_count
+                FROM archive_progress a
+                JOIN students s ON s.id = a.student_id
+                LEFT JOIN skill_levels k ON k.code = a.skill
+            """)}
+        if entries:
+            with pool.write_transaction() as conn:
+                conn.executemany(f"INSERT OR REPLACE INTO archive_files "
+                                 f"VALUES ({', '.join('?' * len(entries[0]))})", entries)
+                archive.add_progress(conn, counts)
+            with store(path).pool.write_transaction() as conn:
+                conn.execute("DELETE FROM archive_files")
+                conn.execute("DELETE FROM archive_progress")
+
+    with pool.write_transaction() as conn:
+        write_layout(conn, targets)
+
+    if retired:
+        report(f"No longer used and now empty: {', '.join(retired)}")
+    for opened in stores.values():
+        if opened.pool is not pool:
+            opened.close()
+    return moved
+
+
+def shard_counts(pool):
+    with pool.connection() as conn:
+        layout = read_layout(conn)
+    counts = []
+    for path in layout or [pool.path]:
+        conn = sqlite3.connect(path)
+        try:
+            counts.append((path, conn.execute("SELECT COUNT(*) FROM predictions_compact").fetchone()[0]))
+        finally:
+            conn.close()
+    return counts
+
+
+# Command line: python storage.py status | rebalance --shards N
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or rebalance prediction shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status")
+    rebalance_parser = subparsers.add_parser("rebalance")
+    rebalance_parser.add_argument("--shards", type=int, required=True)
+    rebalance_parser.add_argument("--batch-students", type=int, default=REBALANCE_BATCH_STUDENTS)
+    args = parser.parse_args()
+
+    from db import pool
+    from migrations import migrate
+
+    # The application database must exist; the server creates it
+    if not os.path.exists(pool.path):
+        parser.error(f"{pool.path} does not exist; start the server once first")
+    migrate()
+    if args.command == "rebalance":
+        started = time.perf_counter()
+        moved = rebalance(pool, args.shards, args.batch_students)
+        print(f"Moved {moved} rows in {time.perf_counter() - started:.1f} s; "
+              f"set STORAGE_BACKEND=sharded to serve from {args.shards} shards")
+    for path, rows in shard_counts(pool):
+        print(f"{rows:>12}  {path}")
@@ -0,0 +1,376 @@
+import sys
+from collections import defaultdict
+
+from db import pool
+
+# Summary tables kept up to date by every insert into predictions, in the
+# same transaction, so analytics read a handful of rows instead of
+# grouping the whole predictions table.
+
+SUMMARY_TABLES = {
+    "summary_skill": """
+        CREATE TABLE IF NOT EXISTS summary_skill (
+            predicted_skill TEXT PRIMARY KEY,
+            prediction_count INTEGER NOT NULL,
+            consistency_sum INTEGER NOT NULL
+        )
+    """,
+    "summary_difficulty_skill": """
+        CREATE TABLE IF NOT EXISTS summary_difficulty_skill (
+            difficulty_level TEXT NOT NULL,
+            predicted_skill TEXT NOT NULL,
+            prediction_count INTEGER NOT NULL,
+            PRIMARY KEY (difficulty_level, predicted_skill)
+        )
+    """,
+    "summary_month_skill": """
+        CREATE TABLE IF NOT EXISTS summary_month_skill (
+            month TEXT NOT NULL,
+            predicted_skill TEXT NOT NULL,
+            prediction_count INTEGER NOT NULL,
+            PRIMARY KEY (month, predicted_skill)
+        )
+    """,
+    "summary_skill_consistency": """
+        CREATE TABLE IF NOT EXISTS summary_skill_consistency (
+            predicted_skill TEXT NOT NULL,
+            consistency_score INTEGER NOT NULL,
+            prediction_count INTEGER NOT NULL,
+            PRIMARY KEY (predicted_skill, consistency_score)
+        )
+    """,
+    "summary_student": """
+        CREATE TABLE IF NOT EXISTS summary_student (
+            name TEXT PRIMARY KEY,
+            prediction_count INTEGER NOT NULL,
+            consistency_sum INTEGER NOT NULL
+        )
+    """,
+}
+
+# The same aggregates computed from scratch over predictions
+REBUILD_QUERIES = {
+    "summary_skill": """
+        SELECT predicted_skill, COUNT(*), COALESCE(SUM(consistency_score), 0)
+        FROM predictions
+        GROUP BY predicted_skill
+    """,
+    "summary_difficulty_skill": """
+        SELECT difficulty_level, predicted_skill, COUNT(*)
+        FROM predictions
+        GROUP BY difficulty_level, predicted_skill
+    """,
+    "summary_month_skill": """
+        SELECT substr(created_at, 1, 7), predicted_skill, COUNT(*)
+        FROM predictions
+        GROUP BY substr(created_at, 1, 7), predicted_skill
+    """,
+    "summary_skill_consistency": """
+        SELECT predicted_skill, COALESCE(consistency_score, 0), COUNT(*)
+        FROM predictions
+        GROUP BY predicted_skill, COALESCE(consistency_score, 0)
+    """,
+    "summary_student": """
+        SELECT name, COUNT(*), COALESCE(SUM(consistency_score), 0)
+        FROM predictions
+        GROUP BY name
+    """,
+}
+
+
+def create_summary_tables(conn):
+    for ddl in SUMMARY_TABLES.values():
+        conn.execute(ddl)
+
+
+# Fold a batch of new prediction rows into the summaries.
+# rows are (name, difficulty_level, consistency_score, predicted_skill, created_at)
+def record_predictions(conn, rows):
+    skill = defaultdict(lambda: [0, 0])
+    difficulty_skill = defaultdict(int)
+    month_skill = defaultdict(int)
+    skill_consistency = defaultdict(int)
+    student = defaultdict(lambda: [0, 0])
+
+    for name, difficulty_level, consistency_score, predicted_skill, created_at in rows:
+        consistency_score = consistency_score or 0
+        skill[predicted_skill][0] += 1
+        skill[predicted_skill][1] += consistency_score
+        difficulty_skill[(difficulty_level, predicted_skill)] += 1
+        month_skill[(created_at[:7], predicted_skill)] += 1
+        skill_consistency[(predicted_skill, consistency_score)] += 1
+        student[name][0] += 1
+        student[name][1] += consistency_score
+
+    conn.executemany("""
+        INSERT INTO summary_skill (predicted_skill, prediction_count, consistency_sum)
+        VALUES (?, ?, ?)
+        ON CONFLICT (predicted_skill) DO UPDATE SET
+            prediction_count = prediction_count + excluded.prediction_count,
+            consistency_sum = consistency_sum + excluded.consistency_sum
+    """, [(key, count, total) for key, (count, total) in skill.items()])
+
+    conn.executemany("""
+        INSERT INTO summary_difficulty_skill (difficulty_level, predicted_skill, prediction_count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (difficulty_level, predicted_skill) DO UPDATE SET
+            prediction_count = prediction_count + excluded.prediction_count
+    """, [(*key, count) for key, count in difficulty_skill.items()])
+
+    conn.executemany("""
+        INSERT INTO summary_month_skill (month, predicted_skill, prediction_count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (month, predicted_skill) DO UPDATE SET
+            prediction_count = prediction_count + excluded.prediction_count
+    """, [(*key, count) for key, count in month_skill.items()])
+
+    conn.executemany("""
+        INSERT INTO summary_skill_consistency (predicted_skill, consistency_score, prediction_count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (predicted_skill, consistency_score) DO UPDATE SET
+            prediction_count = prediction_count + excluded.prediction_count
+    """, [(*key, count) for key, count in skill_consistency.items()])
+
+    conn.executemany("""
+        INSERT INTO summary_student (name, prediction_count, consistency_sum)
+        VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET
+            prediction_count = prediction_count + excluded.prediction_count,
+            consistency_sum = consistency_sum + excluded.consistency_sum
+    """, [(key, count, total) for key, (count, total) in student.items()])
+
+
+# Key column count of each summary table; the remaining columns add up
+SUMMARY_KEYS = {
+    "summary_skill": 1,
+    "summary_difficulty_skill": 2,
+    "summary_month_skill": 2,
+    "summary_skill_consistency": 2,
+    "summary_student": 1,
+}
+
+
+# A table's rows recomputed from predictions, plus extra rows of the same
+# shape (archived predictions, which the predictions table no longer has)
+def expected_rows(conn, table, extra=None):
+    rows = conn.execute(REBUILD_QUERIES[table]).fetchall()
+    if not extra or not extra.get(table):
+        return rows
+    keys = SUMMARY_KEYS[table]
+    totals = {}
+    for row in rows + list(extra[table]):
+        values = totals.setdefault(tuple(row[:keys]), [0] * (len(row) - keys))
+        for i, value in enumerate(row[keys:]):
+            values[i] += value
+    return [(*key, *values) for key, values in totals.items()]
+
+
+# Recompute every summary table from the predictions table (and extra
+# rows, see expected_rows)
+def rebuild_summaries(conn, extra=None):
+    for table in REBUILD_QUERIES:
+        conn.execute(f"DELETE FROM {table}")
+        rows = expected_rows(conn, table, extra)
+        if rows:
+            placeholders = ", ".join("?" * len(rows[0]))
+            conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+# Compare stored summaries with a fresh recomputation.
+# Returns a list of table names that disagree. Call inside a transaction
+# so every query sees the same snapshot.
+def verify_summaries(conn, extra=None):
+    mismatched = []
+    for table in REBUILD_QUERIES:
+        expected = sorted(expected_rows(conn, table, extra), key=repr)
+        stored = sorted(conn.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+        if expected != stored:
+            mismatched.append(table)
+    return mismatched
+
+
+# Each database whose summary tables count predictions, with the summary
+# rows of the predictions archived from it: the application database, or
+# every shard when sharded (archived students go to the shard they hash to)
+def summary_databases(backend):
+    import storage
+
+    databases = storage.prediction_pools(backend)
+    sharded = isinstance(backend.backend, storage.ShardedStorage)
+    for index, database in enumerate(databases):
+        keep = None
+        if sharded:
+            keep = lambda name, index=index: storage.shard_index(name, len(databases)) == index
+        yield database, backend.cold.summary_rows(keep)
+
+
+def get_skill_counts(conn):
+    rows = conn.execute("""
+        SELECT predicted_skill, prediction_count FROM summary_skill
+    """).fetchall()
+    return {skill: count for skill, count in rows}
+
+
+def get_difficulty_skill_counts(conn):
+    rows = conn.execute("""
+        SELECT difficulty_level, predicted_skill, prediction_count
+        FROM summary_difficulty_skill
+    """).fetchall()
+
+    crosstab = {}
+    for difficulty_level, predicted_skill, count in rows:
+        crosstab.setdefault(difficulty_level, {})[predicted_skill] = count
+    return crosstab
+
+
+def get_monthly_counts(conn):
+    rows = conn.execute("""
+        SELECT month, predicted_skill, prediction_count
+        FROM summary_month_skill
+        ORDER BY month
+    """).fetchall()
+
+    monthly = {}
+    for month, predicted_skill, count in rows:
+        entry = monthly.setdefault(month, {"month": month, "total": 0, "skills": {}})
+        entry["total"] += count
+        entry["skills"][predicted_skill] = count
+    return list(monthly.values())
+
+
+def get_kpis(conn):
+    predictions, consistency_sum = conn.execute("""
+        SELECT COALESCE(SUM(prediction_count), 0), COALESCE(SUM(consistency_sum), 0)
+        FROM summary_skill
+    """).fetchone()
+    students = conn.execute("SELECT COUNT(*) FROM summary_student").fetchone()[0]
+
+    return {
+        "total_predictions": predictions,
+        "total_students": students,
+        "avg_consistency": round(consistency_sum / predictions, 2) if predictions else None
+    }
+
+
+# Quantile of a value histogram, using the same linear interpolation as
+# numpy.quantile. values must be sorted ascending.
+def histogram_quantile(values, counts, total, q):
+    position = q * (total - 1)
+    lower_rank = int(position)
+    upper_rank = min(lower_rank + 1, total - 1)
+
+    lower = upper = None
+    seen = 0
+    for value, count in zip(values, counts):
+        seen += count
+        if lower is None and lower_rank < seen:
+            lower = value
+        if upper_rank < seen:
+            upper = value
+            break
+
+    return lower + (upper - lower) * (position - lower_rank)
+
+
+# Box plot statistics of consistency score per predicted skill
+def get_consistency_box_stats(conn):
+    rows = conn.execute("""
+        SELECT predicted_skill, consistency_score, prediction_count
+        FROM summary_skill_consistency
+        ORDER BY predicted_skill, consistency_score
+    """).fetchall()
+
+    histograms = {}
+    for predicted_skill, consistency_score, count in rows:
+        values, counts = histograms.setdefault(predicted_skill, ([], []))
+        values.append(consistency_score)
+        counts.append(count)
+
+    stats = {}
+    for predicted_skill, (values, counts) in histograms.items():
+        total = sum(counts)
+        stats[predicted_skill] = {
+            "count": total,
+            "min": values[0],
+            "q1": histogram_quantile(values, counts, total, 0.25),
+            "median": histogram_quantile(values, counts, total, 0.5),
+            "q3": histogram_quantile(values, counts, total, 0.75),
+            "max": values[-1],
+            "mean": round(sum(v * c for v, c in zip(values, counts)) / total, 2)
+        }
+    return stats
+
+
+# (name, average consistency) of the top students, best first
+def leaderboard_rows(conn, limit: int = 5):
+    return conn.execute("""
+        SELECT name, CAST(consistency_sum AS REAL) / prediction_count AS avg_consistency
+        FROM summary_student
+        ORDER BY avg_consistency DESC, name
+        LIMIT ?
+    """, (limit,)).fetchall()
+
+
+def format_leaderboard(rows):
+    return [{"name": name, "avg_consistency": round(avg, 2)} for name, avg in rows]
+
+
+def get_leaderboard(conn, limit: int = 5):
+    return format_leaderboard(leaderboard_rows(conn, limit))
+
+
+# Every analytics section of the admin dashboard. Call inside a
+# transaction so every section comes from the same snapshot.
+def get_dashboard(conn, leaderboard_limit: int = 5):
+    return {
+        "kpis": get_kpis(conn),
+        "skill_distribution": get_skill_counts(conn),
+        "difficulty_vs_skill": get_difficulty_skill_counts(conn),
+        "consistency_by_skill": get_consistency_box_stats(conn),
+        "leaderboard": get_leaderboard(conn, leaderboard_limit),
+        "monthly_trend": get_monthly_counts(conn)
+    }
+
+
+# Command line: python summaries.py rebuild | verify
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command not in ("rebuild", "verify"):
+        print("Usage: python summaries.py [rebuild|verify]")
+        sys.exit(2)
+
+    import storage
+
+    backend = storage.open_backend(pool)
+
+    if command == "rebuild":
+        for database, archived in summary_databases(backend):
+            with database.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rebuild_summaries(conn, archived)
+                    mismatched = verify_summaries(conn, archived)
+                    if mismatched:
+                        raise RuntimeError(f"Rebuilt summaries disagree: {mismatched}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            print(f"Summaries rebuilt and verified: {database.path}")
+
+    elif command == "verify":
+        out_of_date = False
+        for database, archived in summary_databases(backend):
+            with database.connection() as conn:
+                conn.execute("BEGIN")
+                try:
+                    mismatched = verify_summaries(conn, archived)
+                finally:
+                    conn.rollback()
+            if mismatched:
+                out_of_date = True
+                print(f"Out of date in {database.path}: {', '.join(mismatched)}")
+            else:
+                print(f"Summaries match the predictions table: {database.path}")
+        if out_of_date:
+            sys.exit(1)
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from inference import FEATURE_COLUMNS
+
+# Training pipeline that replaces main_predictor.ipynb.
+#
+# Inputs are read in chunks (CSV via pandas, Parquet via pyarrow) and only
+# the seven feature columns plus the label are kept, as a float64 matrix
+# and small integer codes. Cross-validation and the hyperparameter grid run
+# across all cores through GridSearchCV(n_jobs=...); joblib memory-maps the
+# training matrix into the workers instead of copying it.
+#
+#     python train.py --data test_data.csv --output-dir artifacts/
+#     python train.py --data history/*.parquet --folds 5 --n-jobs -1 --register
+
+LABEL_COLUMN = "skill_level"
+TRAINING_CHUNK_ROWS = int(os.getenv("TRAINING_CHUNK_ROWS", "250000"))
+
+LOGISTIC_GRID = {
+    "model__C": [0.01, 0.1, 1.0, 10.0],
+    "model__class_weight": [None, "balanced"],
+}
+
+RANDOM_FOREST_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [8, 12],
+    "min_samples_leaf": [1, 5],
+}
+
+
+def iter_chunks(path, chunk_rows):
+    columns = FEATURE_COLUMNS + [LABEL_COLUMN]
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+
+# Map string values to integer codes, growing the vocabulary as new
+# values appear in later chunks
+def encode_chunk(values, vocabulary):
+    for value in pd.unique(values):
+        vocabulary.setdefault(value, len(vocabulary))
+    return values.map(vocabulary).to_numpy(np.int16)
+
+
+# Read every input in chunks into (X, y, difficulty_encoder). Rows with a
+# missing feature or label are dropped and counted.
+def load_training_data(paths, chunk_rows=TRAINING_CHUNK_ROWS):
+    numeric_columns = [c for c in FEATURE_COLUMNS if c != "difficulty_level"]
+    difficulty_index = FEATURE_COLUMNS.index("difficulty_level")
+
+    features, difficulty_codes, label_codes = [], [], []
+    difficulty_vocabulary, label_vocabulary = {}, {}
+    dropped = 0
+
+    for path in paths:
+        for chunk in iter_chunks(path, chunk_rows):
+            complete = chunk.dropna()
+            dropped += len(chunk) - len(complete)
+            if complete.empty:
+                continue
+            matrix = np.empty((len(complete), len(FEATURE_COLUMNS)), dtype=np.float64)
+            for column in numeric_columns:
+                matrix[:, FEATURE_COLUMNS.index(column)] = complete[column].to_numpy(np.float64)
+            features.append(matrix)
+            difficulty_codes.append(encode_chunk(
+                complete["difficulty_level"].astype(str).str.strip().str.lower(),
+                difficulty_vocabulary,
+            ))
+            label_codes.append(encode_chunk(complete[LABEL_COLUMN].astype(str), label_vocabulary))
+
+    if not features:
+        raise ValueError("No complete training rows found")
+
+    X = np.concatenate(features)
+    del features
+
+    # Same encoding a LabelEncoder fitted on all rows would give
+    difficulty_encoder = LabelEncoder().fit(list(difficulty_vocabulary))
+    remap = np.empty(len(difficulty_vocabulary), dtype=np.float64)
+    for value, code in difficulty_vocabulary.items():
+        remap[code] = difficulty_encoder.transform([value])[0]
+    X[:, difficulty_index] = remap[np.concatenate(difficulty_codes)]
+
+    labels = np.empty(len(label_vocabulary), dtype=object)
+    for value, code in label_vocabulary.items():
+        labels[code] = value
+    y = labels[np.concatenate(label_codes)]
+
+    return X, y, difficulty_encoder, dropped
+
+
+def search(estimator, grid, X, y, folds, n_jobs, seed):
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    grid_search = GridSearchCV(estimator, grid, cv=cv, n_jobs=n_jobs,
+                               scoring="accuracy", refit=True)
+    started = time.perf_counter()
+    grid_search.fit(X, y)
+    elapsed = time.perf_counter() - started
+
+    results = grid_search.cv_results_
+    candidates = [
+        {
+            "params": {k.replace("model__", ""): v for k, v in params.items()},
+            "mean_accuracy": round(float(mean), 4),
+            "std_accuracy": round(float(std), 4),
+            "mean_fit_seconds": round(float(fit_time), 3),
+        }
+        for params, mean, std, fit_time in zip(
+            results["params"], results["mean_test_score"],
+            results["std_test_score"], results["mean_fit_time"],
+        )
+    ]
+    candidates.sort(key=lambda c: -c["mean_accuracy"])
+    return grid_search.best_estimator_, candidates, elapsed
+
+
+def evaluate(model, X, y):
+    predictions = model.predict(X)
+    labels = sorted(set(y))
+    return {
+        "accuracy": round(float(accuracy_score(y, predictions)), 4),
+        "labels": labels,
+        "confusion_matrix": confusion_matrix(y, predictions, labels=labels).tolist(),
+        "per_class": {
+            label: {k: round(float(v), 4) for k, v in scores.items()}
+            for label, scores in classification_report(
+                y, predictions, labels=labels, output_dict=True, zero_division=0
+            ).items()
+            if label in labels
+        },
+    }
+
+
+def train(paths, output_dir, folds=5, n_jobs=-1, test_size=0.25, seed=42,
+          random_forest=False, chunk_rows=TRAINING_CHUNK_ROWS):
+    started = time.perf_counter()
+    X, y, difficulty_encoder, dropped = load_training_data(paths, chunk_rows)
+    load_seconds = time.perf_counter() - started
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y
+    )
+
+    pipeline = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", LogisticRegression(max_iter=1000)),
+    ])
+    best, candidates, search_seconds = search(
+        pipeline, LOGISTIC_GRID, X_train, y_train, folds, n_jobs, seed
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    artifacts = {
+        "model": os.path.join(output_dir, "skill_model.pkl"),
+        "scaler": os.path.join(output_dir, "scaler.pkl"),
+        "difficulty_encoder": os.path.join(output_dir, "difficulty_encoder.pkl"),
+    }
+    joblib.dump(best.named_steps["model"], artifacts["model"])
+    joblib.dump(best.named_steps["scaler"], artifacts["scaler"])
+    joblib.dump(difficulty_encoder, artifacts["difficulty_encoder"])
+
+    report = {
+        "trained_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "inputs": list(paths),
+        "rows": int(len(y)),
+        "dropped_rows": int(dropped),
+        "train_rows": int(len(y_train)),
+        "test_rows": int(len(y_test)),
+        "folds": folds,
+        "n_jobs": n_jobs,
+        "features": FEATURE_COLUMNS,
+        "difficulty_classes": [str(c) for c in difficulty_encoder.classes_],
+        "logistic_regression": {
+            "best_params": candidates[0]["params"],
+            "cv": candidates,
+            "test": evaluate(best, X_test, y_test),
+        },
+        "timings": {
+            "load_seconds": round(load_seconds, 3),
+            "logistic_search_seconds": round(search_seconds, 3),
+        },
+    }
+
+    # The notebook also fitted a random forest for comparison. It is saved
+    # alongside and served when main.py runs with MODEL_TYPE=forest
+    if random_forest:
+        forest, forest_candidates, forest_seconds = search(
+            RandomForestClassifier(random_state=seed), RANDOM_FOREST_GRID,
+            X_train, y_train, folds, n_jobs, seed
+        )
+        artifacts["random_forest"] = os.path.join(output_dir, "rf_model.pkl")
+        joblib.dump(forest, artifacts["random_forest"])
+        report["random_forest"] = {
+            "best_params": forest_candidates[0]["params"],
+            "cv": forest_candidates,
+            "test": evaluate(forest, X_test, y_test),
+        }
+        report["timings"]["random_forest_search_seconds"] = round(forest_seconds, 3)
+
+    report["timings"]["total_seconds"] = round(time.perf_counter() - started, 3)
+    report["artifacts"] = artifacts
+
+    with open(os.path.join(output_dir, "metrics.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+# Command line: python train.py --data FILE [FILE ...] [--register]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the skill model from CSV or Parquet data")
+    parser.add_argument("--data", nargs="+", default=["test_data.csv"])
+    parser.add_argument("--output-dir", default="artifacts")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--test-size", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=TRAINING_CHUNK_ROWS)
+    parser.add_argument("--random-forest", action="store_true",
+                        help="Also grid-search a random forest and save rf_model.pkl")
+    parser.add_argument("--register", action="store_true",
+                        help="Register the trained artifacts as a new model version")
+    parser.add_argument("--activate", action="store_true",
+                        help="Activate the registered version")
+    args = parser.parse_args()
+
+    report = train(args.data, args.output_dir, args.folds, args.n_jobs, args.test_size,
+                   args.seed, args.random_forest, args.chunk_rows)
+
+    logistic = report["logistic_regression"]
+    print(f"Rows: {report['rows']} ({report['dropped_rows']} dropped)")
+    print(f"Best logistic params: {logistic['best_params']}")
+    print(f"CV accuracy: {logistic['cv'][0]['mean_accuracy']}  "
+          f"test accuracy: {logistic['test']['accuracy']}")
+    if "random_forest" in report:
+        forest = report["random_forest"]
+        print(f"Best random forest params: {forest['best_params']}")
+        print(f"CV accuracy: {forest['cv'][0]['mean_accuracy']}  "
+              f"test accuracy: {forest['test']['accuracy']}")
+    print(f"Total: {report['timings']['total_seconds']} s, "
+          f"report at {os.path.join(args.output_dir, 'metrics.json')}")
+
+    if args.register or args.activate:
+        from model_registry import ModelRegistry
+
+        registry = ModelRegistry()
+        artifacts = report["artifacts"]
+        version = registry.register(
+            artifacts["model"], artifacts["scaler"], artifacts["difficulty_encoder"],
+            forest_path=artifacts.get("random_forest"),
+            note=f"train.py on {', '.join(args.data)}: "
+                 f"test accuracy {logistic['test']['accuracy']}",
+        )
+        print(f"Registered {version}")
+        if args.activate:
+            registry.activate(version)
+            print(f"Activated {version}")
@@ -0,0 +1,138 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from storage import PartialInsertError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "sync": /predict commits its row before responding (durable).
+# "write_behind": rows are queued in memory and group-committed by a
+# background thread; a crash can lose up to WRITE_QUEUE_SIZE rows.
+PERSISTENCE_MODE = os.getenv("PERSISTENCE_MODE", "sync")
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "10000"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_FLUSH_MS = int(os.getenv("WRITE_FLUSH_MS", "50"))
+WRITE_RETRIES = 5
+
+if PERSISTENCE_MODE not in ("sync", "write_behind"):
+    raise ValueError(
+        f"Unknown PERSISTENCE_MODE {PERSISTENCE_MODE!r}, use 'sync' or 'write_behind'"
+    )
+
+
+# Bounded in-process queue of prediction rows flushed to SQLite in
+# batches of up to batch_size rows, or whatever arrived within
+# flush_ms of the first queued row.
+class WriteBehindWriter:
+
+    def __init__(self, flush, max_rows: int = WRITE_QUEUE_SIZE,
+                 batch_size: int = WRITE_BATCH_SIZE, flush_ms: int = WRITE_FLUSH_MS):
+        self._flush = flush
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.pending_rows = 0
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.flush_errors = 0
+        self.dropped_rows = 0
+        self.rejected_rows = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="write-behind", daemon=True
+            )
+            self._thread.start()
+
+    # Queue rows without blocking. Returns False when the queue is full or
+    # shutting down, and the caller should write synchronously instead.
+    def offer(self, rows) -> bool:
+        with self._lock:
+            if self._stopping.is_set() or self.pending_rows + len(rows) > self.max_rows:
+                self.rejected_rows += len(rows)
+                return False
+            self.pending_rows += len(rows)
+        self._queue.put(rows)
+        return True
+
+    def _next_batch(self):
+        try:
+            batch = list(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return None
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.extend(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                if self._stopping.is_set() and self._queue.empty():
+                    return
+                continue
+            self._write(batch)
+
+    def _write(self, batch):
+        rows = batch
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                self._flush(rows)
+                self.flushed_rows += len(rows)
+                self.flushed_batches += 1
+                break
+            except Exception as error:
+                self.flush_errors += 1
+                logger.exception("Write-behind flush of %d rows failed (attempt %d)",
+                                 len(rows), attempt)
+                # Sharded flushes commit shard by shard; only the rows of
+                # the failed shards are retried
+                if isinstance(error, PartialInsertError):
+                    self.flushed_rows += len(rows) - len(error.rows)
+                    rows = error.rows
+                time.sleep(0.1 * attempt)
+        else:
+            self.dropped_rows += len(rows)
+            logger.error("Dropped %d prediction rows after %d failed flushes",
+                         len(rows), WRITE_RETRIES)
+
+        with self._lock:
+            self.pending_rows -= len(batch)
+
+    # Stop accepting rows and wait until everything queued is written
+    def stop(self, timeout: float = None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "mode": PERSISTENCE_MODE,
+            "queue_depth": self.pending_rows,
+            "queue_capacity": self.max_rows,
+            "flushed_rows": self.flushed_rows,
+            "flushed_batches": self.flushed_batches,
+            "flush_errors": self.flush_errors,
+            "rejected_rows": self.rejected_rows,
+            "dropped_rows": self.dropped_rows,
+        }